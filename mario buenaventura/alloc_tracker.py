@@ -0,0 +1,293 @@
+"""
+Medición de asignaciones de memoria por frame, por fase y por línea de código.
+
+AllocationTracker es un FrameProfiler (se instala como game.profiler, y F3 sigue
+funcionando) que además, en cada fase del frame, suma con tracemalloc cuántos bytes se
+asignaron (vivan o no al terminarla) y con los callbacks de gc cuánto duraron las
+recolecciones. Medir hace el juego varias veces más lento: solo para diagnosticar.
+
+Uso (desde la carpeta del juego):
+    python alloc_tracker.py [--frames N] [--warmup N] [--budget BYTES] [--throwaway N]
+    python alloc_tracker.py --check
+la primera juega una partida sin pantalla, muestra el informe y termina con error si la
+partida, ya en régimen estable, asigna más de --budget bytes por frame (--throwaway hace que
+la fase de colisiones cree y tire N objetos por frame). La segunda comprueba que el
+presupuesto detecta esos objetos de usar y tirar.
+"""
+import argparse
+import gc
+import linecache
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+import pygame
+import profiler
+from constants import *
+from profiler import PROFILE_PHASES, FrameProfiler
+
+# Lo que asigna la propia medición (y el historial del perfilador) no cuenta
+IGNORED_FILES = frozenset((tracemalloc.__file__, linecache.__file__, profiler.__file__))
+
+
+class AllocationTracker(FrameProfiler):
+    """
+    Perfilador de frames que además mide lo que asigna cada fase.
+    Durante el frame sigue cada línea de Python con sys.settrace y le apunta lo que subió el
+    pico de tracemalloc desde la línea anterior, así que también cuenta lo que se crea y se
+    libera dentro de la fase. Es una cota inferior: lo que se crea y se libera varias veces
+    dentro de una misma línea (un bucle en C, por ejemplo) cuenta una vez, por su pico.
+    :param export_path: Como en FrameProfiler.
+    :param history: Como en FrameProfiler.
+    """
+    def __init__(self, export_path=None, history=PROFILE_HISTORY):
+        super().__init__(export_path, history)
+        self.frames = 0
+        self.bytes_per_frame = []                # Bytes asignados en cada frame
+        self.phases = defaultdict(int)           # fase -> bytes asignados
+        self.lines = defaultdict(int)            # (fase, archivo, línea) -> bytes asignados
+        self.phase_lines = defaultdict(int)      # (archivo, línea) -> bytes en la fase en curso
+        self.gc_pauses = defaultdict(list)       # fase -> duraciones (ms) de las recolecciones
+        self.gc_generations = [0, 0, 0]
+        self.pending_pauses = []
+        self.gc_start = None
+        self.frame_bytes = 0
+        self.where = None # (archivo, línea) que se está ejecutando; None si no se mide
+        self.mark = 0     # Memoria en uso al pasar por la línea anterior
+        self.tracer = self.on_line # Un solo método ligado: crear uno en cada evento también asignaría
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        gc.callbacks.append(self.on_gc)
+
+    def on_gc(self, phase, info):
+        """Callback de gc: mide cada recolección (se asigna a la fase en curso al cerrarla)."""
+        if phase == "start":
+            self.gc_start = time.perf_counter()
+        elif self.gc_start is not None:
+            self.pending_pauses.append((time.perf_counter() - self.gc_start) * 1000)
+            self.gc_generations[info["generation"]] += 1
+            self.gc_start = None
+
+    def on_line(self, frame, event, arg):
+        """
+        Función de traza (sys.settrace): apunta a la línea anterior lo que subió el pico de
+        memoria desde que empezó y pasa a la siguiente. Lo que asigna ella misma queda antes
+        de reset_peak() y no cuenta.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        grown = peak - self.mark
+        if event == "call":
+            grown -= sys.getsizeof(frame) # El objeto frame solo existe porque hay traza
+        if grown > 0 and self.where is not None:
+            self.phase_lines[self.where] += grown
+        if event == "return":
+            frame = frame.f_back # Lo que quede de la línea que llamó
+        if frame is None or frame.f_code.co_filename in IGNORED_FILES or frame.f_code in IGNORED_CODE:
+            self.where = None
+            tracer = None
+        else:
+            self.where = (frame.f_code.co_filename, frame.f_lineno)
+            tracer = self.tracer
+        self.mark = current
+        del current, peak, grown, frame
+        tracemalloc.reset_peak()
+        return tracer
+
+    def begin_frame(self):
+        self.frame_bytes = 0
+        self.phase_lines.clear()
+        super().begin_frame()
+        self.where = None
+        self.mark = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        sys.settrace(self.tracer)
+
+    def lap(self, name):
+        sys.settrace(None) # Lo que se llame desde aquí (on_gc, por ejemplo) no se mide
+        super().lap(name)
+        size = 0
+        for (filename, lineno), line_size in self.phase_lines.items():
+            self.lines[name, filename, lineno] += line_size
+            size += line_size
+        self.phase_lines.clear()
+        self.phases[name] += size
+        self.frame_bytes += size
+        if self.pending_pauses:
+            self.gc_pauses[name].extend(self.pending_pauses)
+            self.pending_pauses = []
+        self.last = time.perf_counter() # Lo que tarda medir no cuenta para la fase siguiente
+        sys.settrace(self.tracer)
+
+    def end_frame(self):
+        sys.settrace(None)
+        super().end_frame()
+        self.frames += 1
+        self.bytes_per_frame.append(self.frame_bytes)
+
+    def reset(self):
+        """Olvida lo medido hasta ahora (por ejemplo, tras los frames de calentamiento)."""
+        self.frames = 0
+        self.bytes_per_frame = []
+        self.phases.clear()
+        self.lines.clear()
+        self.gc_pauses.clear()
+        self.gc_generations = [0, 0, 0]
+
+    def bytes_average(self):
+        """Bytes asignados por frame, de media."""
+        return sum(self.bytes_per_frame) / self.frames if self.frames else 0.0
+
+    def close(self):
+        sys.settrace(None)
+        super().close()
+        if self.on_gc in gc.callbacks:
+            gc.callbacks.remove(self.on_gc)
+        tracemalloc.stop()
+
+    def report(self, top=10):
+        """Muestra las asignaciones por frame, por fase y las líneas que más asignan."""
+        frames = max(self.frames, 1)
+        print(f"Frames: {self.frames} | asignado por frame: media {self.bytes_average() / 1024:.2f} KiB, "
+              f"mediana {statistics.median(self.bytes_per_frame or [0]) / 1024:.2f} KiB, "
+              f"máximo {max(self.bytes_per_frame or [0]) / 1024:.2f} KiB")
+        for name in PROFILE_PHASES:
+            if name not in self.phases and name not in self.gc_pauses:
+                continue
+            pauses = self.gc_pauses.get(name, [])
+            gc_text = (f" | gc {len(pauses)} veces, {sum(pauses):.2f} ms (máx. {max(pauses):.2f} ms)"
+                       if pauses else "")
+            print(f"{name:>15}: {self.phases.get(name, 0) / frames / 1024:8.2f} KiB asignados{gc_text}")
+        print(f"Recolecciones por generación: {self.gc_generations}")
+        print("Líneas que más asignan (bytes por frame):")
+        lines = sorted(self.lines.items(), key=lambda item: item[1], reverse=True)[:top]
+        for (name, filename, lineno), size in lines:
+            source = linecache.getline(filename, lineno).strip()
+            print(f"  {size / frames:9.0f} B | {name:>15} | {os.path.basename(filename)}:{lineno}  {source[:60]}")
+
+
+# Ni los métodos del propio AllocationTracker (el resto de este archivo sí se mide)
+IGNORED_CODE = frozenset(method.__code__ for method in vars(AllocationTracker).values() if hasattr(method, "__code__"))
+
+
+def play_frame(game, tracker, frame_input):
+    """Un frame completo sin pantalla (entrada, lógica y dibujo), medido por fases."""
+    tracker.begin_frame()
+    running = game.apply_input(frame_input)
+    tracker.lap("eventos")
+    game.update()
+    game.draw()
+    tracker.lap("dibujo")
+    tracker.end_frame()
+    return running
+
+
+def measure_gameplay(frames=300, warmup=120, seed=0, throwaway=0):
+    """
+    Juega una partida sin pantalla con un AllocationTracker como perfilador. Los primeros
+    warmup frames (pools, cachés, textos del marcador) no cuentan.
+    :param throwaway: Objetos que la fase de colisiones crea y tira en cada frame (0: ninguno).
+    :return: El AllocationTracker, ya cerrado, con lo medido.
+    """
+    from game import Game
+    from inputs import FrameInput
+
+    game = Game(headless=True, seed=seed)
+    game.asset_loader.wait()
+    if throwaway:
+        handle_collisions = game.handle_collisions
+
+        def wasteful_collisions():
+            for i in range(throwaway):
+                junk = [i]
+            handle_collisions()
+        game.handle_collisions = wasteful_collisions
+    tracker = AllocationTracker()
+    game.profiler = tracker
+    rng = random.Random(seed)
+    play_frame(game, tracker, FrameInput(events=[(True, pygame.K_SPACE)]))
+    for frame in range(warmup + frames):
+        if frame == warmup:
+            tracker.reset()
+        if game.game_over:
+            events = [(True, pygame.K_r)]
+        else:
+            # Correr y saltar de vez en cuando para recoger objetos y pisar goombas
+            events = [(True, pygame.K_UP)] if frame % 45 == 0 else []
+        held = [pygame.K_RIGHT] if rng.random() < 0.5 else [pygame.K_LEFT]
+        play_frame(game, tracker, FrameInput(held, events))
+    tracker.close()
+    return tracker
+
+
+def assert_allocation_budget(budget, frames=300, warmup=120, seed=0, throwaway=0):
+    """
+    Falla (AssertionError) si una partida en régimen estable asigna de media más de budget
+    bytes por frame. Pensado para pruebas automáticas y para la integración continua.
+    :param throwaway: Como en measure_gameplay.
+    :return: El AllocationTracker con lo medido.
+    """
+    tracker = measure_gameplay(frames, warmup, seed, throwaway)
+    average = tracker.bytes_average()
+    assert average <= budget, (f"{average:.0f} bytes asignados por frame superan el presupuesto de {budget} "
+                               f"(ver AllocationTracker.report())")
+    return tracker
+
+
+def check_throwaway_detected(throwaway=500, frames=120, warmup=60, seed=0, margin=1.25):
+    """
+    Comprueba que assert_allocation_budget ve los objetos de usar y tirar: con el presupuesto
+    en lo que asigna la partida normal más margin, la partida normal tiene que pasar y la que
+    crea throwaway objetos por frame en la fase de colisiones tiene que fallar.
+    :return: True si las dos cosas se cumplen.
+    """
+    budget = measure_gameplay(frames, warmup, seed).bytes_average() * margin
+    try:
+        assert_allocation_budget(budget, frames, warmup, seed)
+    except AssertionError as error:
+        print(f"La partida normal no cabe en su propio presupuesto: {error}")
+        return False
+    try:
+        tracker = assert_allocation_budget(budget, frames, warmup, seed, throwaway)
+    except AssertionError as error:
+        print(f"Con {throwaway} objetos de usar y tirar por frame: {error}")
+        return True
+    print(f"Con {throwaway} objetos de usar y tirar por frame no se superó el presupuesto de {budget:.0f} "
+          f"bytes ({tracker.bytes_average():.0f} por frame)")
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asignaciones de memoria por frame de una partida sin pantalla")
+    parser.add_argument("--frames", type=int, default=300, help="Frames medidos")
+    parser.add_argument("--warmup", type=int, default=120, help="Frames iniciales que no se miden")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de la partida")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Bytes asignados por frame permitidos; si se superan, termina con error")
+    parser.add_argument("--throwaway", type=int, default=0,
+                        help="Objetos que la fase de colisiones crea y tira en cada frame")
+    parser.add_argument("--top", type=int, default=10, help="Líneas que se muestran")
+    parser.add_argument("--check", action="store_true",
+                        help="Comprueba que el presupuesto detecta los objetos de usar y tirar")
+    args = parser.parse_args()
+
+    if args.check:
+        ok = check_throwaway_detected(args.throwaway or 500, seed=args.seed)
+        print("Detección de objetos de usar y tirar: " + ("OK" if ok else "FALLO"))
+        pygame.quit()
+        raise SystemExit(0 if ok else 1)
+
+    tracker = measure_gameplay(args.frames, args.warmup, args.seed, args.throwaway)
+    tracker.report(args.top)
+    ok = args.budget is None or tracker.bytes_average() <= args.budget
+    if args.budget is not None:
+        print(f"Presupuesto de {args.budget:.0f} bytes por frame: " + ("OK" if ok else "SUPERADO"))
+    pygame.quit()
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
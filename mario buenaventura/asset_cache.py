@@ -0,0 +1,182 @@
+"""
+Caché binaria de imágenes (atlas).
+
+Guarda todas las imágenes del juego ya convertidas y escaladas, en píxeles RGBA sin
+comprimir, en un único archivo con un índice. Al arrancar, el juego mapea el archivo en
+memoria y crea las superficies directamente desde esos bytes, sin decodificar PNG.
+Si alguna imagen de origen o tamaño cambió, el atlas se considera viejo y el juego vuelve
+a cargar los PNG.
+
+Uso (desde la carpeta del juego):
+    python asset_cache.py build   # Genera el atlas a partir de los PNG
+    python asset_cache.py bench   # Compara el tiempo de carga PNG contra el atlas
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import pygame
+from constants import *
+
+ATLAS_PATH = os.path.join("assets", "cache", "atlas.bin")
+ATLAS_MAGIC = b"MBATLAS1"
+ATLAS_ALIGN = 16 # Cada imagen empieza en un múltiplo de 16 bytes
+
+
+def atlas_signature():
+    """Valores del código que cambian el contenido del atlas (rutas, tamaños, pantalla)."""
+    return json.dumps({
+        "paths": IMG_PATHS,
+        "screen": [SCREEN_WIDTH, SCREEN_HEIGHT, GROUND_LEVEL_OFFSET],
+        "sizes": [GOOMBA_SIZE, MUSHROOM_SIZE, COIN_SIZE, STAR_SIZE, PLAYER_NORMAL_SIZE, PLAYER_DUCK_SIZE],
+    }, sort_keys=True)
+
+
+def source_stamps(base_dir):
+    """Fecha de modificación y tamaño de cada imagen de origen (None si no existe)."""
+    stamps = {}
+    for key, path in IMG_PATHS.items():
+        full_path = os.path.join(base_dir, path)
+        if os.path.exists(full_path):
+            stat = os.stat(full_path)
+            stamps[key] = [stat.st_mtime_ns, stat.st_size]
+        else:
+            stamps[key] = None
+    return stamps
+
+
+def build_atlas(imgs, atlas_path=ATLAS_PATH, base_dir=None):
+    """
+    Escribe el atlas con las superficies ya preparadas del juego.
+    :param imgs: Diccionario de superficies (Game.imgs).
+    :return: Tamaño del archivo en bytes.
+    """
+    base_dir = base_dir or os.getcwd()
+    entries = {}
+    blobs = []
+    offset = 0
+    for key, surface in imgs.items():
+        data = pygame.image.tostring(surface, "RGBA")
+        padding = -len(data) % ATLAS_ALIGN
+        has_alpha = bool(surface.get_flags() & pygame.SRCALPHA)
+        entries[key] = [offset, surface.get_width(), surface.get_height(), has_alpha]
+        blobs.append(data + b"\0" * padding)
+        offset += len(data) + padding
+
+    index = json.dumps({
+        "signature": atlas_signature(),
+        "sources": source_stamps(base_dir),
+        "entries": entries,
+    }).encode("utf-8")
+    header = ATLAS_MAGIC + struct.pack("<I", len(index)) + index
+    header += b"\0" * (-len(header) % ATLAS_ALIGN)
+
+    full_path = os.path.join(base_dir, atlas_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    # Se escribe aparte y se reemplaza de golpe: otro proceso nunca lee un atlas a medias
+    temp_path = f"{full_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(temp_path, full_path)
+    return len(header) + offset
+
+
+def read_atlas(atlas_path=ATLAS_PATH, base_dir=None):
+    """
+    Lee las superficies del atlas mapeándolo en memoria, sin convertirlas.
+    No toca la pantalla, así que puede llamarse desde el hilo de carga.
+    :return: Diccionario {clave: (superficie RGBA, tiene_alfa)}, o None si el atlas no
+             existe, está dañado o ya no corresponde a las imágenes de origen.
+    """
+    base_dir = base_dir or os.getcwd()
+    full_path = os.path.join(base_dir, atlas_path)
+    if not os.path.exists(full_path):
+        return None
+
+    with open(full_path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # Archivo vacío
+            return None
+
+    try:
+        if mapped[:len(ATLAS_MAGIC)] != ATLAS_MAGIC:
+            return None
+        index_start = len(ATLAS_MAGIC) + 4
+        (index_length,) = struct.unpack_from("<I", mapped, len(ATLAS_MAGIC))
+        index = json.loads(mapped[index_start:index_start + index_length].decode("utf-8"))
+        if index["signature"] != atlas_signature() or index["sources"] != source_stamps(base_dir):
+            return None
+        data_start = index_start + index_length
+        data_start += -data_start % ATLAS_ALIGN
+
+        view = memoryview(mapped)
+        imgs = {}
+        for key, (offset, width, height, has_alpha) in index["entries"].items():
+            start = data_start + offset
+            pixels = view[start:start + width * height * 4]
+            # copy() saca los píxeles del mapa antes de cerrarlo
+            imgs[key] = (pygame.image.frombuffer(pixels, (width, height), "RGBA").copy(), has_alpha)
+            del pixels
+        del view
+        return imgs
+    except (ValueError, KeyError, struct.error):
+        return None
+    finally:
+        mapped.close()
+
+
+def convert_surface(surface, has_alpha):
+    """Pasa una superficie del atlas al formato de la pantalla (si ya hay pantalla)."""
+    if pygame.display.get_surface() is None:
+        return surface
+    return surface.convert_alpha() if has_alpha else surface.convert()
+
+
+def load_atlas(atlas_path=ATLAS_PATH, base_dir=None):
+    """
+    Carga las superficies del atlas ya en el formato de la pantalla.
+    :return: Diccionario de superficies, o None si el atlas no sirve (ver read_atlas).
+    """
+    raw = read_atlas(atlas_path, base_dir)
+    if raw is None:
+        return None
+    return {key: convert_surface(surface, has_alpha) for key, (surface, has_alpha) in raw.items()}
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    from game import Game
+
+    if command == "build":
+        game = Game(headless=True, use_atlas=False)
+        size = build_atlas(game.imgs)
+        print(f"Atlas escrito en {ATLAS_PATH} ({size / 1024:.0f} KiB, {len(game.imgs)} imágenes)")
+    elif command == "bench":
+        game = Game(headless=True, use_atlas=False)
+        if load_atlas() is None:
+            build_atlas(game.imgs)
+        rounds = 10
+        timings = {}
+        for source in ("png", "atlas"):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                game.imgs = {}
+                game.load_images(use_atlas=(source == "atlas"))
+            timings[source] = (time.perf_counter() - start) / rounds * 1000
+        print(f"Carga desde PNG:   {timings['png']:8.2f} ms")
+        print(f"Carga desde atlas: {timings['atlas']:8.2f} ms")
+        print(f"Diferencia:        {timings['png'] - timings['atlas']:8.2f} ms "
+              f"({timings['png'] / timings['atlas']:.1f}x más rápido)")
+    else:
+        print(__doc__)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
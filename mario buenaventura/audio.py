@@ -0,0 +1,148 @@
+import os
+import time
+from array import array
+
+import pygame
+from constants import *
+
+# Notas (frecuencia en Hz, duración en ms) de cada efecto, para sintetizarlo si falta su archivo
+SYNTH_EFFECTS = {
+    "moneda": ((988, 60), (1319, 180)),
+    "pisoton": ((220, 40), (110, 60)),
+    "crecer": ((392, 50), (523, 50), (659, 50), (784, 80)),
+    "vida": ((659, 60), (784, 60), (1319, 60), (1047, 60), (1175, 60), (1568, 100)),
+    "estrella": ((523, 40), (659, 40), (784, 40), (1047, 80)),
+    "dano": ((440, 60), (330, 60), (220, 120)),
+    "muerte": ((494, 100), (698, 100), (698, 100), (659, 100), (587, 100), (523, 200)),
+}
+# Al robar un canal, un efecto solo quita el sitio a otro de prioridad igual o menor
+SFX_PRIORITY = {"moneda": 0, "pisoton": 1, "crecer": 2, "vida": 2, "estrella": 2, "dano": 3, "muerte": 4}
+
+
+def ensure_mixer():
+    """
+    Inicia el mezclador de sonido la primera vez que hace falta.
+    Abrir el dispositivo de audio es de lo más lento del arranque, así que no se hace
+    si no hay nada que reproducir. El búfer es de MIXER_BUFFER muestras para que los
+    efectos suenen casi en el mismo frame en que se piden.
+    :return: True si el audio está disponible.
+    """
+    if pygame.mixer.get_init():
+        return True
+    try:
+        pygame.mixer.init(MIXER_FREQUENCY, -16, 2, MIXER_BUFFER) # Inicializa el módulo de mezcla de sonido
+        return True
+    except pygame.error as e:
+        print(f"Advertencia: No se pudo iniciar el audio: {e}")
+        return False
+
+
+def synthesize(notes, volume=0.2):
+    """Efecto de onda cuadrada, con una caída en cada nota, en el formato del mezclador (16 bits)."""
+    frequency, _, channels = pygame.mixer.get_init()
+    amplitude = 32767 * volume
+    samples = array("h")
+    for note, ms in notes:
+        count = int(frequency * ms / 1000)
+        half_period = frequency / note / 2
+        samples.extend(int(amplitude * (1 - i / count) * (1 if int(i / half_period) % 2 == 0 else -1))
+                       for i in range(count))
+    if channels > 1:
+        samples = array("h", (sample for sample in samples for _ in range(channels)))
+    return pygame.mixer.Sound(buffer=samples.tobytes())
+
+
+def decode_effects():
+    """
+    Decodifica todos los efectos en memoria, para no leer nada del disco al reproducirlos.
+    Lee cada uno de SFX_PATHS o, si no existe, lo sintetiza. Necesita el mezclador iniciado;
+    es seguro en el hilo de carga.
+    :return: Diccionario nombre -> pygame.mixer.Sound.
+    """
+    sounds = {}
+    for name, path in SFX_PATHS.items():
+        if os.path.exists(path):
+            try:
+                sounds[name] = pygame.mixer.Sound(path)
+                continue
+            except pygame.error as e:
+                print(f"Advertencia: No se pudo cargar el efecto {path}: {e}")
+        sounds[name] = synthesize(SYNTH_EFFECTS[name])
+    return sounds
+
+
+class SoundEffects:
+    """
+    Reproduce efectos ya decodificados por un grupo fijo de canales reservados del mezclador
+    (la música va aparte, por pygame.mixer.music). Si todos están ocupados, el efecto nuevo
+    se queda con el canal del que lleva más tiempo sonando entre los de prioridad igual o
+    menor; si todos son más importantes, se descarta. play() no espera a nada: el mezclador
+    suena en su propio hilo y el efecto entra en el siguiente bloque de MIXER_BUFFER muestras.
+    Hasta que attach() recibe los sonidos (y siempre en modo headless), play() no hace nada.
+    :param channels: Canales reservados para efectos.
+    """
+    def __init__(self, channels=SFX_CHANNELS):
+        self.channel_count = channels
+        self.sounds = {}
+        self.channels = []
+        self.playing = [] # (prioridad, inicio) del último efecto de cada canal
+        self.next_channel = 0
+        self.played = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self):
+        return bool(self.channels)
+
+    def attach(self, sounds):
+        """Empieza a usar los efectos decodificados y reserva sus canales (en el hilo principal)."""
+        if pygame.mixer.get_num_channels() < self.channel_count:
+            pygame.mixer.set_num_channels(self.channel_count)
+        pygame.mixer.set_reserved(self.channel_count)
+        self.sounds = sounds
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+        self.playing = [(-1, 0.0)] * self.channel_count
+
+    def play(self, name):
+        """
+        Reproduce un efecto ya.
+        :return: El canal usado, o None si no se reprodujo.
+        """
+        if not self.channels:
+            return None
+        sound = self.sounds.get(name)
+        if sound is None:
+            return None
+        priority = SFX_PRIORITY.get(name, 0)
+        count = len(self.channels)
+
+        # Un canal libre, empezando por el siguiente al último usado
+        for offset in range(count):
+            index = (self.next_channel + offset) % count
+            if not self.channels[index].get_busy():
+                break
+        else:
+            # Robo de voz: el más antiguo entre los de prioridad igual o menor
+            candidates = [i for i in range(count) if self.playing[i][0] <= priority]
+            if not candidates:
+                self.dropped += 1
+                return None
+            index = min(candidates, key=lambda i: self.playing[i][1])
+            self.stolen += 1
+
+        channel = self.channels[index]
+        channel.play(sound) # En un canal ocupado, corta lo que sonaba
+        self.playing[index] = (priority, time.perf_counter())
+        self.next_channel = (index + 1) % count
+        self.played += 1
+        return channel
+
+    def stats(self):
+        frequency = pygame.mixer.get_init()[0] if pygame.mixer.get_init() else MIXER_FREQUENCY
+        return {
+            "played": self.played,
+            "stolen": self.stolen,
+            "dropped": self.dropped,
+            "buffer_ms": MIXER_BUFFER / frequency * 1000,
+        }
@@ -0,0 +1,204 @@
+"""
+Partidas headless en paralelo para ajustar la dificultad.
+
+Reparte partidas entre procesos (uno por núcleo). Cada partida usa su propia semilla, sus
+valores de los parámetros de dificultad (Game.tuning) y una política de entrada aleatoria o
+guionizada. Al final reúne puntos, tiempo de supervivencia, monedas y muertes de cada una en
+una tabla CSV y muestra la media de cada combinación de parámetros.
+
+Uso (desde la carpeta del juego):
+    python batch.py --sessions 50 --goomba-speed 2 3 4 --gravity 0.4 0.5 --out resultados.csv
+"""
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from pygame.locals import K_LEFT, K_RIGHT, K_UP, K_DOWN, K_LSHIFT, K_SPACE
+
+from constants import *
+from inputs import FrameInput
+
+RESULT_FIELDS = ("seed", "policy", "goomba_speed", "gravity", "max_goombas", "spawn_interval", "goomba_interval",
+                 "puntos", "supervivencia_s", "monedas", "muertes", "game_over", "ticks")
+
+
+class ScriptedPolicy:
+    """Recorre la pantalla a izquierda y derecha y salta a intervalos fijos (siempre igual)."""
+    def __init__(self, seed):
+        self.right = FrameInput(held=[K_RIGHT])
+        self.left = FrameInput(held=[K_LEFT])
+        self.jump = {side: FrameInput(held=side.held, events=[(True, K_UP)]) for side in (self.right, self.left)}
+        self.release = {side: FrameInput(held=side.held, events=[(False, K_UP)]) for side in (self.right, self.left)}
+
+    def __call__(self, tick):
+        side = self.right if tick % 200 < 100 else self.left
+        if tick % 50 == 0:
+            return self.jump[side]
+        if tick % 50 == 10:
+            return self.release[side]
+        return side
+
+
+class RandomPolicy:
+    """
+    Jugador aleatorio: cada cierto tiempo cambia de dirección, corre, se agacha o salta.
+    La semilla de la política es la de la partida, así que cada partida se puede repetir.
+    """
+    def __init__(self, seed):
+        self.rng = random.Random(seed ^ 0x5EED)
+        self.held = frozenset()
+        self.holding = FrameInput()
+        self.until = 0
+
+    def __call__(self, tick):
+        if tick < self.until:
+            return self.holding
+        events = []
+        direction = self.rng.choice((K_RIGHT, K_RIGHT, K_LEFT, None))
+        held = {direction} if direction else set()
+        if self.rng.random() < 0.3:
+            held.add(K_LSHIFT)
+        if self.rng.random() < 0.05:
+            held.add(K_DOWN)
+        for key in sorted(self.held - held):
+            events.append((False, key))
+        for key in sorted(held - self.held):
+            events.append((True, key))
+        if self.rng.random() < 0.5:
+            events += [(True, K_UP), (False, K_UP)]
+        self.held = frozenset(held)
+        self.holding = FrameInput(self.held)
+        self.until = tick + self.rng.randint(10, 60)
+        return FrameInput(self.held, events)
+
+
+POLICIES = {"scripted": ScriptedPolicy, "random": RandomPolicy}
+
+
+def run_session(session):
+    """
+    Juega una partida headless completa (hasta game over o max_ticks).
+    :param session: Diccionario con seed, policy, max_ticks y tuning.
+    :return: Fila de resultados (ver RESULT_FIELDS).
+    """
+    from game import Game
+
+    game = Game(headless=True, seed=session["seed"], tuning=session["tuning"])
+    policy = POLICIES[session["policy"]](session["seed"])
+    game.step(FrameInput(events=[(True, K_SPACE)]))
+    player = game.current_player
+    deaths = 0
+    lives = player.vidas
+    tick = 0
+    while tick < session["max_ticks"] and game.game_running:
+        game.step(policy(tick))
+        tick += 1
+        if player.vidas < lives:
+            deaths += lives - player.vidas
+        lives = player.vidas
+
+    tuning = session["tuning"]
+    return {
+        "seed": session["seed"],
+        "policy": session["policy"],
+        "goomba_speed": tuning.get("goomba_speed", game.goomba_speed),
+        "gravity": tuning.get("gravity", game.gravity),
+        "max_goombas": tuning.get("max_goombas", game.max_goombas),
+        "spawn_interval": "-".join(map(str, game.spawn_interval)),
+        "goomba_interval": "-".join(map(str, game.goomba_interval)),
+        "puntos": player.puntos,
+        "supervivencia_s": round(tick * SIMULATION_STEP_MS / 1000, 2),
+        "monedas": player.monedas,
+        "muertes": deaths,
+        "game_over": game.game_over,
+        "ticks": tick,
+    }
+
+
+def init_worker():
+    # Cada proceso abre su propia pantalla ficticia (ver Game(headless=True))
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+
+
+def build_sessions(args):
+    """Una partida por cada combinación de parámetros y cada semilla."""
+    def interval(text):
+        low, high = text.split("-")
+        return (int(low), int(high))
+
+    grid = itertools.product(args.goomba_speed, args.gravity, args.max_goombas,
+                             [interval(text) for text in args.spawn_interval],
+                             [interval(text) for text in args.goomba_interval])
+    sessions = []
+    for goomba_speed, gravity, max_goombas, spawn_interval, goomba_interval in grid:
+        tuning = {"goomba_speed": goomba_speed, "gravity": gravity, "max_goombas": max_goombas,
+                  "spawn_interval": spawn_interval, "goomba_interval": goomba_interval}
+        for i in range(args.sessions):
+            sessions.append({"seed": args.seed + i, "policy": args.policy,
+                             "max_ticks": args.max_ticks, "tuning": tuning})
+    return sessions
+
+
+def summarize(rows):
+    """Imprime la media de cada combinación de parámetros."""
+    groups = {}
+    for row in rows:
+        key = tuple(row[field] for field in RESULT_FIELDS[2:7])
+        groups.setdefault(key, []).append(row)
+
+    print(f"{'velocidad':>9} {'gravedad':>8} {'goombas':>7} {'objetos':>11} {'enemigos':>11} |"
+          f" {'puntos':>8} {'superv. s':>9} {'monedas':>7} {'muertes':>7} {'game over':>9}")
+    for key, group in sorted(groups.items()):
+        n = len(group)
+        print(f"{key[0]:>9} {key[1]:>8} {key[2]:>7} {key[3]:>11} {key[4]:>11} |"
+              f" {sum(r['puntos'] for r in group) / n:8.0f}"
+              f" {sum(r['supervivencia_s'] for r in group) / n:9.1f}"
+              f" {sum(r['monedas'] for r in group) / n:7.1f}"
+              f" {sum(r['muertes'] for r in group) / n:7.2f}"
+              f" {sum(r['game_over'] for r in group) / n:8.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partidas headless en paralelo para ajustar la dificultad")
+    parser.add_argument("--sessions", type=int, default=20, help="Partidas (semillas) por combinación de parámetros")
+    parser.add_argument("--seed", type=int, default=0, help="Primera semilla")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random", help="Entrada de las partidas")
+    parser.add_argument("--max-ticks", type=int, default=60 * 300, help="Ticks máximos por partida (60 por segundo)")
+    parser.add_argument("--goomba-speed", type=float, nargs="+", default=[GOOMBA_SPEED])
+    parser.add_argument("--gravity", type=float, nargs="+", default=[GRAVITY])
+    parser.add_argument("--max-goombas", type=int, nargs="+", default=[2])
+    parser.add_argument("--spawn-interval", nargs="+", default=["%d-%d" % SPAWN_INTERVAL_MS],
+                        help="Espera entre objetos en ms, como MIN-MAX")
+    parser.add_argument("--goomba-interval", nargs="+", default=["%d-%d" % GOOMBA_INTERVAL_MS],
+                        help="Espera entre goombas en ms, como MIN-MAX")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--out", default="resultados.csv", help="Tabla CSV con una fila por partida")
+    args = parser.parse_args()
+
+    sessions = build_sessions(args)
+    print(f"{len(sessions)} partidas en {args.workers} procesos...")
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers, initializer=init_worker) as pool:
+        # Bloques pequeños: las partidas duran distinto según cuándo llega el game over
+        rows = list(pool.imap_unordered(run_session, sessions, chunksize=max(1, len(sessions) // (args.workers * 8))))
+    elapsed = time.perf_counter() - start
+    rows.sort(key=lambda row: tuple(str(row[field]) for field in RESULT_FIELDS[2:7]) + (row["seed"],))
+
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    ticks = sum(row["ticks"] for row in rows)
+    print(f"Listo en {elapsed:.1f} s ({ticks / elapsed:.0f} ticks/s en total). Resultados en {args.out}")
+    summarize(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
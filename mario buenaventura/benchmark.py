@@ -0,0 +1,456 @@
+"""
+Pruebas de rendimiento del juego.
+
+Uso (desde la carpeta del juego):
+    python benchmark.py sprites
+    python benchmark.py entities [--counts 10 100 1000 10000] [--players N] [--entity-store] [--save-baseline]
+    python benchmark.py pools [--frames N]
+    python benchmark.py level [--frames N]
+    python benchmark.py timers [--counts 10 100 1000 10000]
+    python benchmark.py memory [--counts 100000]
+    python benchmark.py audio [--frames N] [--rate 60]
+    python benchmark.py render [--counts 100] [--window-size 1600 1200]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+import character
+from constants import *
+from character import Goomba, Jugador
+from powerup import Hongo, Moneda, Estrella
+from game import Game
+from inputs import FrameInput
+from level import Level
+from render import RENDERERS
+from game_clock import GameClock
+from scheduler import Scheduler
+from audio import SFX_PRIORITY, SoundEffects, decode_effects, ensure_mixer
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# Límites de la prueba de audio: play() no debe comerse una parte apreciable del frame y,
+# aun robando voces, casi ningún pedido debe quedarse sin sonar
+AUDIO_PLAY_P99_MS = 2.0
+AUDIO_MAX_DROP_RATE = 0.05
+FRAME_BUDGET_S = 1 / 60
+
+
+def bench_sprites(frames):
+    """Mide el coste de set_current_animation_frame y cuenta transformaciones por frame."""
+    game = Game(headless=True)
+    game.start_game()
+    player = game.current_player
+
+    # Recorre todas las poses y tamaños para calentar cualquier camino pendiente
+    poses = []
+    for tamaño in ("normal", "grande"):
+        for direccion in ("right", "left"):
+            for is_moving, is_ducking, grounded in ((False, False, True), (True, False, True),
+                                                    (False, True, True), (False, False, False)):
+                poses.append((tamaño, direccion, is_moving, is_ducking, grounded))
+
+    before = dict(character.transform_stats)
+    start = time.perf_counter()
+    for i in range(frames):
+        player.tamaño, player.direccion, player.is_moving, player.is_ducking, player.grounded = poses[i % len(poses)]
+        player.set_current_animation_frame()
+    elapsed = time.perf_counter() - start
+
+    scales = character.transform_stats["scale"] - before["scale"]
+    flips = character.transform_stats["flip"] - before["flip"]
+    print(f"Frames: {frames}")
+    print(f"Tiempo medio por frame: {elapsed / frames * 1e6:.2f} us")
+    print(f"Escalados por frame: {scales / frames:.3f} ({scales} en total)")
+    print(f"Volteos por frame: {flips / frames:.3f} ({flips} en total)")
+    print(f"Frames en caché: {len(player.sprite_cache)}")
+    return scales + flips == 0
+
+
+def summarize(samples):
+    """Mediana, percentil 99 y frames por segundo de una lista de tiempos en segundos."""
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return {
+        "median_ms": median * 1000,
+        "p99_ms": p99 * 1000,
+        "fps": 1 / median if median > 0 else float("inf"),
+    }
+
+
+def make_entity(game, kind, x, rng):
+    """Crea (desde los pools del juego) una entidad de prueba del tipo indicado en la posición x."""
+    if kind == "enemigos_activos":
+        return game.spawn_entity(Goomba, 0, x, game.floor_y - GOOMBA_SIZE[1])
+    elif kind == "monedas_activas":
+        return game.spawn_entity(Moneda, 0, x, game.floor_y - rng.randint(50, 150))
+    tipo = rng.choice(["crecimiento", "vida"])
+    return game.spawn_entity(Hongo, 0, x, game.floor_y - MUSHROOM_SIZE[1],
+                             tipo=tipo, image=game.imgs["hongo_" + tipo])
+
+
+def fill_entities(game, count, rng):
+    """Rellena las listas de entidades hasta tener count en total, repartidas entre los tres tipos."""
+    for index, kind in enumerate(("enemigos_activos", "monedas_activas", "poderes_activos")):
+        target = count // 3 + (1 if index < count % 3 else 0)
+        entities = getattr(game, kind)
+        while len(entities) < target:
+            game.add_entity(kind, make_entity(game, kind, rng.randrange(0, SCREEN_WIDTH), rng))
+            entities = getattr(game, kind)
+
+
+def bench_entities(counts, frames, seed=0, players=1, entity_store=False):
+    """
+    Mide update() y draw() por separado con distintas cantidades de entidades.
+    Con players > 1 se añaden jugadores quietos repartidos por el suelo, que cuentan para las colisiones.
+    Antes de cada frame (fuera de la medición) se reponen las entidades eliminadas
+    por colisiones o por salir de la pantalla, para que la carga sea constante.
+    """
+    results = {}
+    for count in counts:
+        game = Game(headless=True, seed=seed, entity_store=entity_store)
+        game.start_game()
+        for index in range(1, players):
+            x = SCREEN_WIDTH * index // players
+            game.add_player(Jugador(index + 1, f"Mario {index + 1}", x, game.floor_y - PLAYER_NORMAL_SIZE[1]))
+        for player in game.players:
+            player.vidas = 10 ** 9 # Los jugadores no deben morir durante la prueba
+        rng = random.Random(seed)
+
+        update_times = []
+        draw_times = []
+        for _ in range(frames):
+            fill_entities(game, count, rng)
+            start = time.perf_counter()
+            game.update()
+            middle = time.perf_counter()
+            game.draw()
+            end = time.perf_counter()
+            update_times.append(middle - start)
+            draw_times.append(end - middle)
+
+        results[str(count)] = {
+            "update": summarize(update_times),
+            "draw": summarize(draw_times),
+            "frame": summarize([u + d for u, d in zip(update_times, draw_times)]),
+        }
+
+        row = results[str(count)]
+        print(f"{count:>6} entidades | "
+              f"update {row['update']['median_ms']:8.3f} ms (p99 {row['update']['p99_ms']:8.3f}) | "
+              f"draw {row['draw']['median_ms']:8.3f} ms (p99 {row['draw']['p99_ms']:8.3f}) | "
+              f"{row['frame']['fps']:9.1f} fps")
+    return results
+
+
+def bench_pools(frames, seed=0):
+    """Juega una partida larga sin pantalla y muestra cómo se usaron los pools de objetos."""
+    game = Game(headless=True, seed=seed)
+    game.max_total_goombas = 10 ** 9 # Goombas sin límite para que los pools trabajen
+    game.step(FrameInput(events=[(True, pygame.K_SPACE)]))
+
+    start = time.perf_counter()
+    for frame in range(frames):
+        if game.game_over:
+            game.step(FrameInput(events=[(True, pygame.K_r)]))
+        # Saltar de vez en cuando para pisar goombas y recoger objetos
+        events = [(True, pygame.K_UP)] if frame % 45 == 0 else []
+        game.step(FrameInput(events=events))
+    elapsed = time.perf_counter() - start
+
+    print(f"Frames: {frames} en {elapsed:.2f} s ({frames / elapsed:.0f} frames/s)")
+    for name, stats in game.pool_stats().items():
+        print(f"{name:>9}: tamaño {stats['size']:3} | en uso {stats['in_use']:3} | máximo {stats['high_water']:3} | "
+              f"pedidos {stats['acquired']:5} | aciertos {stats['hit_rate'] * 100:5.1f}%")
+    return True
+
+
+def bench_level(frames, lengths=(4, 400)):
+    """
+    Desplaza niveles de distinto largo (en pantallas) y mide el dibujo de las casillas.
+    Con los trozos en caché, el tiempo por frame y los trozos en memoria no deben crecer con el largo.
+    """
+    game = Game(headless=True)
+    screen = game.screen
+    columns_per_screen = SCREEN_WIDTH // TILE_SIZE
+    rows = SCREEN_HEIGHT // TILE_SIZE
+    resident = []
+    for length in lengths:
+        pattern = ["." * columns_per_screen] * (rows - 6) + [
+            "....?...B?B?B.......",
+            "....................",
+            "..............XX....",
+            ".......P.....XXX....",
+            "#" * columns_per_screen,
+            "#" * columns_per_screen,
+        ]
+        level = Level([row.ljust(columns_per_screen, ".") * length for row in pattern])
+        samples = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            level.scroll(OBJECT_SPEED * 4)
+            level.draw(screen)
+            samples.append(time.perf_counter() - start)
+        stats = summarize(samples)
+        level_stats = level.stats()
+        resident.append(level_stats["resident"])
+        print(f"{length:>4} pantallas ({level_stats['chunks']:5} trozos): dibujo {stats['median_ms']:6.3f} ms "
+              f"(p99 {stats['p99_ms']:6.3f}) | en caché {level_stats['resident']} | "
+              f"dibujados {level_stats['rendered']:5} | expulsados {level_stats['evicted']:5}")
+    return max(resident) <= LEVEL_CHUNK_CACHE
+
+
+def bench_timers(counts, frames):
+    """
+    Compara, con N temporizadores pendientes, revisarlos todos en cada frame con el Scheduler,
+    que solo mira los que vencen. En ambos casos vencen unos pocos por frame.
+    """
+    for count in counts:
+        clock = GameClock(step_ms=SIMULATION_STEP_MS, seed=0)
+        rng = random.Random(0)
+        fired = [0, 0]
+
+        def fire_polled():
+            fired[0] += 1
+
+        def fire_scheduled():
+            fired[1] += 1
+
+        # Sondeo: lista de (vence, callback), revisada entera en cada frame
+        polled = [[rng.randint(1, 600000), fire_polled] for _ in range(count)]
+        scheduler = Scheduler(clock)
+        for due, _ in polled:
+            scheduler.at(due, fire_scheduled)
+
+        poll_samples, heap_samples = [], []
+        for _ in range(frames):
+            clock.tick()
+            now = clock.now()
+            start = time.perf_counter()
+            for timer in polled:
+                if timer[0] and now >= timer[0]:
+                    timer[0] = 0
+                    timer[1]()
+            poll_samples.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            scheduler.run_due(now)
+            heap_samples.append(time.perf_counter() - start)
+
+        poll, heap = summarize(poll_samples), summarize(heap_samples)
+        print(f"{count:>6} temporizadores: sondeo {poll['median_ms']:8.4f} ms | "
+              f"montículo {heap['median_ms']:8.4f} ms | disparados {fired[1]} (sondeo {fired[0]})")
+        if fired[0] != fired[1]:
+            return False
+    return True
+
+
+def bench_memory(count):
+    """
+    Bytes por entidad con count entidades vivas de cada clase, medidos con tracemalloc.
+    Cada entidad se prepara como en los pools del juego (con su rect); la imagen es compartida.
+    """
+    image = pygame.Surface(MUSHROOM_SIZE)
+
+    def with_image(entity):
+        entity.set_image(image)
+        return entity
+
+    factories = {
+        "Goomba": lambda i: Goomba(i, i, 0),
+        "Hongo": lambda i: with_image(Hongo(i, i, 0, tipo="crecimiento")),
+        "Moneda": lambda i: with_image(Moneda(i, i, 0)),
+        "Estrella": lambda i: with_image(Estrella(i, i, 0)),
+    }
+    tracemalloc.start()
+    total = 0
+    for name, factory in factories.items():
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        entities = [factory(i) for i in range(count)]
+        elapsed = time.perf_counter() - start
+        used = tracemalloc.get_traced_memory()[0] - before - sys.getsizeof(entities)
+        total += used
+        print(f"{name:>9}: {used / count:6.1f} bytes por entidad | {used / 2 ** 20:6.1f} MiB para {count} | "
+              f"creación {elapsed / count * 1e6:5.2f} us")
+        del entities
+    tracemalloc.stop()
+    print(f"Total: {total / 2 ** 20:.1f} MiB para {count * len(factories)} entidades")
+    return True
+
+
+def bench_render(counts, frames, window_size, seed=0):
+    """
+    Compara el tiempo de draw() con cada renderizador de render.py, con count entidades en
+    pantalla y una ventana de window_size (direct siempre usa el tamaño lógico). Sin pantalla,
+    las texturas usan el renderizador por software de SDL.
+    """
+    os.environ.setdefault("SDL_RENDER_DRIVER", "software")
+    for count in counts:
+        for name in RENDERERS:
+            game = Game(headless=True, seed=seed, renderer=name, window_size=window_size)
+            game.start_game()
+            game.current_player.vidas = 10 ** 9
+            rng = random.Random(seed)
+            draw_times = []
+            for _ in range(frames):
+                fill_entities(game, count, rng)
+                game.update()
+                start = time.perf_counter()
+                game.draw()
+                draw_times.append(time.perf_counter() - start)
+            draw = summarize(draw_times)
+            uploads = f" | texturas subidas {game.renderer.uploads}" if hasattr(game.renderer, "uploads") else ""
+            print(f"{count:>6} entidades | {name:>7} | draw {draw['median_ms']:8.3f} ms "
+                  f"(p99 {draw['p99_ms']:8.3f}) | {draw['fps']:8.1f} fps{uploads}")
+            game.renderer.close()
+    return True
+
+
+def bench_audio(frames, rate):
+    """
+    Prueba de carga de los efectos: una partida sin pantalla a 60 frames por segundo reales que,
+    además de los sonidos de las colisiones, pide rate efectos por segundo. Mide lo que tarda
+    play() y cuántas voces se robaron o descartaron, y falla si el p99 de play() pasa de
+    AUDIO_PLAY_P99_MS, si se descarta más de AUDIO_MAX_DROP_RATE de los pedidos o si algún frame
+    pasa de 16,7 ms. Sin dispositivo de sonido se puede usar SDL_AUDIODRIVER=dummy.
+    """
+    if not ensure_mixer():
+        return False
+    start = time.perf_counter()
+    sounds = decode_effects()
+    decode_ms = (time.perf_counter() - start) * 1000
+    game = Game(headless=True, seed=0)
+    game.sfx = SoundEffects()
+    game.sfx.attach(sounds)
+    game.step(FrameInput(events=[(True, pygame.K_SPACE)]))
+
+    # Los efectos más comunes (monedas, pisotones) son también los menos prioritarios
+    names = list(sounds)
+    weights = [1 / (1 + SFX_PRIORITY.get(name, 0)) ** 2 for name in names]
+    rng = random.Random(0)
+    clock = pygame.time.Clock()
+    pending = 0.0
+    play_samples, frame_samples = [], []
+    for frame in range(frames):
+        if game.game_over:
+            game.step(FrameInput(events=[(True, pygame.K_r)]))
+        frame_start = time.perf_counter()
+        game.step(FrameInput(events=[(True, pygame.K_UP)] if frame % 45 == 0 else []))
+        pending += rate / 60
+        while pending >= 1:
+            pending -= 1
+            start = time.perf_counter()
+            game.sfx.play(rng.choices(names, weights)[0])
+            play_samples.append(time.perf_counter() - start)
+        frame_samples.append(time.perf_counter() - frame_start)
+        clock.tick(60)
+
+    stats = game.sfx.stats()
+    play, frame_time = summarize(play_samples), summarize(frame_samples)
+    print(f"Efectos decodificados: {len(sounds)} en {decode_ms:.1f} ms | "
+          f"{len(game.sfx.channels)} canales | búfer {MIXER_BUFFER} muestras ({stats['buffer_ms']:.1f} ms)")
+    print(f"Pedidos: {len(play_samples)} ({rate} por segundo) | reproducidos {stats['played']} | "
+          f"robados {stats['stolen']} | descartados {stats['dropped']}")
+    print(f"play(): mediana {play['median_ms'] * 1000:.1f} us | p99 {play['p99_ms'] * 1000:.1f} us | "
+          f"máximo {max(play_samples) * 1000:.1f} ms")
+    slow_frames = sum(1 for sample in frame_samples if sample > FRAME_BUDGET_S)
+    print(f"Frame (lógica + efectos): mediana {frame_time['median_ms']:.3f} ms | p99 {frame_time['p99_ms']:.3f} ms | "
+          f"por encima de 16,7 ms: {slow_frames}")
+
+    # Cada pedido (de la prueba o de las colisiones) acaba reproducido, robando una voz o no, o descartado
+    drop_rate = stats["dropped"] / max(stats["played"] + stats["dropped"], 1)
+    checks = [
+        (f"p99 de play() <= {AUDIO_PLAY_P99_MS} ms", play["p99_ms"] <= AUDIO_PLAY_P99_MS),
+        (f"descartados {drop_rate:.1%} <= {AUDIO_MAX_DROP_RATE:.0%}", drop_rate <= AUDIO_MAX_DROP_RATE),
+        ("ningún frame por encima de 16,7 ms", slow_frames == 0),
+    ]
+    for label, passed in checks:
+        print(f"{label}: " + ("OK" if passed else "FALLO"))
+    return all(passed for _, passed in checks)
+
+
+def compare_with_baseline(results, baseline, tolerance, min_delta_ms=0.05):
+    """
+    Compara las medianas con la línea base guardada.
+    Las diferencias menores que min_delta_ms se ignoran (ruido en mediciones muy pequeñas).
+    :return: Lista de regresiones (mensajes); vacía si todo está dentro de la tolerancia.
+    """
+    regressions = []
+    for count, phases in results.items():
+        if count not in baseline:
+            continue
+        for phase in ("update", "draw"):
+            current = phases[phase]["median_ms"]
+            reference = baseline[count][phase]["median_ms"]
+            if current > reference * tolerance and current - reference > min_delta_ms:
+                regressions.append(f"{count} entidades, {phase}: {current:.3f} ms > "
+                                   f"{reference:.3f} ms x {tolerance}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pruebas de rendimiento de Mario en Buenaventura")
+    parser.add_argument("suite", choices=["sprites", "entities", "pools", "level", "timers", "memory", "audio", "render"], help="Prueba a ejecutar")
+    parser.add_argument("--frames", type=int, default=None, help="Frames a simular")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="Cantidades de entidades (pruebas entities y memory) o de temporizadores (prueba timers)")
+    parser.add_argument("--players", type=int, default=1, help="Jugadores en la partida (prueba entities)")
+    parser.add_argument("--entity-store", action="store_true",
+                        help="Mueve las entidades con el EntityStore de NumPy (prueba entities)")
+    parser.add_argument("--window-size", type=int, nargs=2, default=[1600, 1200], metavar=("ANCHO", "ALTO"),
+                        help="Tamaño de la ventana (prueba render)")
+    parser.add_argument("--rate", type=int, default=60, help="Efectos por segundo (prueba audio)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Archivo de línea base")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda los resultados como línea base")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="Factor máximo sobre la mediana de la línea base antes de fallar")
+    args = parser.parse_args()
+
+    ok = True
+    if args.suite == "sprites":
+        ok = bench_sprites(args.frames or 10000)
+    elif args.suite == "pools":
+        ok = bench_pools(args.frames or 100000)
+    elif args.suite == "level":
+        ok = bench_level(args.frames or 5000)
+    elif args.suite == "timers":
+        ok = bench_timers(args.counts, args.frames or 2000)
+    elif args.suite == "memory":
+        ok = bench_memory(args.counts[0] if args.counts != parser.get_default("counts") else 100000)
+    elif args.suite == "render":
+        counts = args.counts if args.counts != parser.get_default("counts") else [10, 100, 1000]
+        ok = bench_render(counts, args.frames or 300, tuple(args.window_size))
+    elif args.suite == "audio":
+        ok = bench_audio(args.frames or 300, args.rate)
+    elif args.suite == "entities":
+        results = bench_entities(args.counts, args.frames or 200, players=args.players,
+                                 entity_store=args.entity_store)
+        if args.save_baseline:
+            with open(args.baseline, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Línea base guardada en {args.baseline}")
+        elif os.path.exists(args.baseline) and args.players == 1 and not args.entity_store:
+            with open(args.baseline) as f:
+                regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+            for regression in regressions:
+                print(f"REGRESIÓN: {regression}")
+            ok = not regressions
+            print("Comparación con la línea base: " + ("OK" if ok else "FALLO"))
+
+    pygame.quit()
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
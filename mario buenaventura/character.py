@@ -1,10 +1,37 @@
 import pygame
 from constants import * # Importa todas las constantes
 
+# Contador de transformaciones (escalados y volteos) hechas sobre imágenes de personajes.
+# En estado estable no debería crecer: los frames del jugador salen de su caché.
+transform_stats = {"scale": 0, "flip": 0}
+
+# Tamaños objetivo (de pie, agachado) para cada valor de Jugador.tamaño
+PLAYER_SIZES = {
+    "normal": (PLAYER_NORMAL_SIZE, PLAYER_DUCK_SIZE),
+    "grande": (PLAYER_BIG_SIZE, PLAYER_BIG_DUCK_SIZE),
+}
+
+
+def preparar_superficie(image_surface, target_size=None, flip_x=False):
+    """Escala y voltea una superficie, contando cada transformación en transform_stats."""
+    if target_size:
+        image_surface = pygame.transform.scale(image_surface, target_size)
+        transform_stats["scale"] += 1
+    if flip_x:
+        image_surface = pygame.transform.flip(image_surface, True, False)
+        transform_stats["flip"] += 1
+    return image_surface
+
+
 class Personaje:
-    def __init__(self, id, nombre, x, y, estado="Vivo"):
+    # Atributos fijos en __slots__: sin __dict__ por instancia, cada personaje ocupa mucho menos
+    # (importa con muchos enemigos vivos o muchas partidas headless en un mismo proceso)
+    __slots__ = ("id", "posicionX", "posicionY", "estado", "image", "rect", "grounded", "velocidadY",
+                 "is_jumping", "gravedad", "broadphase_handle", "store_slot", "serial")
+    nombre = "Personaje" # Cada clase comparte su nombre en vez de guardarlo en cada instancia
+
+    def __init__(self, id, x, y, estado="Vivo"):
         self.id = id
-        self.nombre = nombre
         self.posicionX = x
         self.posicionY = y
         self.estado = estado
@@ -12,6 +39,11 @@ class Personaje:
         self.rect = pygame.Rect(x, y, 1, 1) # Rect inicial, se ajustará al cargar la imagen
         self.grounded = True # True si el personaje está en el suelo
         self.velocidadY = 0 # Agregamos velocidadY para la gravedad
+        self.is_jumping = False # aplicar_gravedad() lo apaga al tocar el suelo
+        self.broadphase_handle = None # Handle en la rejilla de colisiones del juego
+        self.store_slot = None # Hueco en el EntityStore del juego, si se usa
+        self.serial = None # Identificador que le da Game.spawn_entity (ver net.py)
+        self.gravedad = GRAVITY # Aceleración de caída; el juego la cambia por objeto al ajustar la dificultad
 
     def mover(self, dx=0, dy=0):
         self.posicionX += dx
@@ -28,32 +60,29 @@ class Personaje:
         :param target_size: Una tupla (ancho, alto) para escalar la imagen. Si es None, no se escala.
         :param flip_x: Booleano, si True, la imagen se voltea horizontalmente.
         """
+        self.asignar_superficie(preparar_superficie(image_surface, target_size, flip_x))
+
+    def asignar_superficie(self, surface):
+        """
+        Asigna una superficie ya preparada (sin escalar ni voltear) y ajusta el rect
+        manteniendo la parte inferior del personaje en la misma posición Y.
+        """
         # Si el rect aún no se ha inicializado correctamente (e.g., al inicio del juego)
         # usamos self.posicionY como referencia.
         old_rect_bottom = self.rect.bottom if self.rect and self.rect.height > 1 else self.posicionY
 
-        if target_size:
-            scaled_image = pygame.transform.scale(image_surface, target_size)
-        else:
-            scaled_image = image_surface # Si no se especifica tamaño, usa la imagen tal cual
+        self.image = surface
 
-        if flip_x:
-            self.image = pygame.transform.flip(scaled_image, True, False)
-        else:
-            self.image = scaled_image
-        
-        # Crear un nuevo rect y ajustarlo para que la parte inferior esté donde estaba antes
-        new_rect = self.image.get_rect()
-        new_rect.x = self.posicionX
-        new_rect.bottom = old_rect_bottom # Mantiene la base del personaje en su lugar
-        
-        self.rect = new_rect
+        # Reutiliza el rect existente para no crear uno nuevo en cada frame
+        self.rect.size = surface.get_size()
+        self.rect.x = self.posicionX
+        self.rect.bottom = old_rect_bottom # Mantiene la base del personaje en su lugar
         self.posicionY = self.rect.y # Sincroniza posicionY con la nueva posición del rect
 
     def aplicar_gravedad(self):
         # Esta función es específica de personajes que pueden caer.
         if not self.grounded:
-            self.velocidadY += GRAVITY # Usa la constante GRAVITY
+            self.velocidadY += self.gravedad # Por defecto, la constante GRAVITY
             self.mover(dy=self.velocidadY)
             
             # Comprueba si ha tocado el suelo
@@ -67,8 +96,11 @@ class Personaje:
 
 
 class Enemigo(Personaje):
-    def __init__(self, id, nombre, x, y, velocidad_x, estado="Vivo"):
-        super().__init__(id, nombre, x, y, estado)
+    __slots__ = ("velocidad_x",)
+    nombre = "Enemigo"
+
+    def __init__(self, id, x, y, velocidad_x, estado="Vivo"):
+        super().__init__(id, x, y, estado)
         self.velocidad_x = velocidad_x
         self.grounded = False 
 
@@ -76,17 +108,46 @@ class Enemigo(Personaje):
         self.mover(dx=self.velocidad_x)
         self.aplicar_gravedad() 
 
+    def reset(self, id, x, y, velocidad_x, estado="Vivo"):
+        """Reinicia un enemigo reutilizado (de un pool) en una nueva posición sin crear objetos."""
+        self.id = id
+        self.posicionX = x
+        self.posicionY = y
+        self.estado = estado
+        self.velocidad_x = velocidad_x
+        self.velocidadY = 0
+        self.grounded = False
+        self.broadphase_handle = None
+        self.store_slot = None
+        self.rect.x = self.posicionX
+        self.rect.y = self.posicionY
+
 
 class Goomba(Enemigo):
+    __slots__ = ()
+    nombre = "Goomba"
+
     def __init__(self, id, x, y, velocidad_x=-GOOMBA_SPEED):
-        super().__init__(id, "Goomba", x, y, velocidad_x, "Vivo")
+        super().__init__(id, x, y, velocidad_x, "Vivo")
         self.rect = pygame.Rect(x, y, GOOMBA_SIZE[0], GOOMBA_SIZE[1])
 
+    def reset(self, id, x, y, velocidad_x=-GOOMBA_SPEED, estado="Vivo"):
+        super().reset(id, x, y, velocidad_x, estado)
+
 
 class Jugador(Personaje):
-    def __init__(self, id, nombre, x, y):
-        super().__init__(id, nombre, x, y, "Vivo")
+    # El nombre sí es propio de cada jugador (en red hay varios)
+    __slots__ = ("nombre", "clock", "scheduler", "is_ducking", "vidas", "monedas", "puntos", "tiempo", "dispara",
+                 "direccion", "tamaño", "inmune", "jump_key_held", "is_running", "is_moving",
+                 "current_frame_index", "last_frame_update", "run_timer", "images", "sprite_cache", "suelo_y")
+
+    def __init__(self, id, nombre, x, y, clock=None, scheduler=None):
+        super().__init__(id, x, y, "Vivo")
+        self.nombre = nombre
+        self.clock = clock # GameClock del juego; si es None se usa pygame.time.get_ticks()
+        self.scheduler = scheduler # Scheduler del juego para la animación; sin él se mira el reloj en cada frame
         self.is_ducking = False
+        self.suelo_y = SCREEN_HEIGHT - GROUND_LEVEL_OFFSET # Donde se apoya: el suelo o, con nivel, una casilla
         self.vidas = 3
         self.monedas = 0
         self.puntos = 0
@@ -95,7 +156,6 @@ class Jugador(Personaje):
         self.direccion = "right" 
         self.tamaño = "normal" # Este valor se usará para determinar el tamaño objetivo
         self.inmune = False
-        self.inmunidad_timer = None 
         self.is_jumping = False
         self.jump_key_held = False 
         self.is_running = False
@@ -103,7 +163,8 @@ class Jugador(Personaje):
 
         # Estado de animación
         self.current_frame_index = 0
-        self.last_frame_update = pygame.time.get_ticks()
+        self.last_frame_update = self.now()
+        self.run_timer = None # TimerHandle que avanza los frames de correr mientras se mueve
 
         # Almacenamiento de imágenes: ahora solo un set "base" de imágenes de Mario normal
         self.images = {
@@ -115,7 +176,14 @@ class Jugador(Personaje):
             "jump_left": None,  
             "duck": None 
         }
+
+        # Caché de frames ya escalados: (pose, frame, tamaño, dirección, agachado) -> Surface
+        self.sprite_cache = {}
         
+    def now(self):
+        """Tiempo actual en milisegundos según el reloj del juego."""
+        return self.clock.now() if self.clock else pygame.time.get_ticks()
+
     def load_player_images(self, imgs_dict):
         """
         Carga y prepara todas las imágenes base de Mario (normal).
@@ -137,71 +205,87 @@ class Jugador(Personaje):
 
         self.images["duck"] = imgs_dict["mario_agachado"] 
 
+        self.build_sprite_cache()
         self.set_current_animation_frame()
 
+    def build_sprite_cache(self):
+        """
+        Escala (y voltea cuando hace falta) todos los frames de Mario una sola vez,
+        para cada tamaño y dirección, en el formato de la pantalla.
+        Después, cambiar de frame es solo una búsqueda en el diccionario.
+        """
+        display_ready = pygame.display.get_surface() is not None
+        self.sprite_cache = {}
+        for tamaño, (target_size, target_duck_size) in PLAYER_SIZES.items():
+            for direccion in ("right", "left"):
+                frames = {
+                    ("idle", 0): (self.images["idle_" + direccion], target_size, False),
+                    ("jump", 0): (self.images["jump_" + direccion], target_size, False),
+                    ("duck", 0): (self.images["duck"], target_duck_size, direccion == "left"),
+                }
+                for index, image in enumerate(self.images["run_" + direccion]):
+                    frames[("run", index)] = (image, target_size, False)
+
+                for (pose, frame), (image, size, flip_x) in frames.items():
+                    surface = preparar_superficie(image, size, flip_x)
+                    if display_ready:
+                        surface = surface.convert_alpha()
+                    self.sprite_cache[(pose, frame, tamaño, direccion, pose == "duck")] = surface
+
+    def set_cached_frame(self, pose, frame=0):
+        """Asigna un frame de la caché según el tamaño y la dirección actuales, sin escalar."""
+        tamaño = self.tamaño if self.tamaño in PLAYER_SIZES else "normal"
+        self.asignar_superficie(self.sprite_cache[(pose, frame, tamaño, self.direccion, pose == "duck")])
+
 
     def set_current_animation_frame(self):
         """Determina y establece la imagen actual de Mario basándose en su estado y tamaño."""
-        current_time = pygame.time.get_ticks()
-        
-        # Determinar el tamaño objetivo según el atributo self.tamaño
-        if self.tamaño == "normal":
-            target_size = PLAYER_NORMAL_SIZE
-            target_duck_size = PLAYER_DUCK_SIZE
-        elif self.tamaño == "grande":
-            target_size = PLAYER_BIG_SIZE
-            # Ajustar el tamaño de agacharse para Mario Grande si es diferente
-            # Aquí, asumimos que se agacha a un tamaño similar al normal agachado,
-            # pero puedes definir PLAYER_BIG_DUCK_SIZE si lo necesitas.
-            target_duck_size = (PLAYER_BIG_SIZE[0], PLAYER_BIG_SIZE[1] * 0.7) # Ejemplo: 70% de la altura de Mario grande
-        else:
-            target_size = PLAYER_NORMAL_SIZE # Default
-            target_duck_size = PLAYER_DUCK_SIZE
-
-
-        # Guardar la parte inferior del rect antes de cualquier cambio para mantenerla
-        old_rect_bottom = self.rect.bottom
+        current_time = self.now()
+
+        # El frame de correr solo avanza mientras corre en el suelo
+        if self.run_timer is not None and not (self.is_moving and self.grounded and not self.is_ducking):
+            self.run_timer.cancel()
+            self.run_timer = None
 
         # 1. Lógica para agacharse (tiene prioridad)
         if self.is_ducking:
-            # Usar la imagen de agacharse y escalarla al tamaño de pato correspondiente
-            self.set_image(self.images["duck"], target_duck_size, flip_x=(self.direccion == "left"))
-            self.rect.bottom = SCREEN_HEIGHT - GROUND_LEVEL_OFFSET # Asegurar que esté en el suelo
+            # Usar la imagen de agacharse ya escalada al tamaño de pato correspondiente
+            self.set_cached_frame("duck")
+            self.rect.bottom = self.suelo_y # Asegurar que esté en el suelo
             self.posicionY = self.rect.y
             return 
 
         # 2. Lógica para salto/caída (tiene prioridad sobre correr/quieto si no está agachado)
         if not self.grounded: 
-            if self.direccion == "right":
-                self.set_image(self.images["jump_right"], target_size) # Usar la imagen de salto y escalarla
-            else:
-                self.set_image(self.images["jump_left"], target_size)  # Usar la imagen de salto y escalarla
+            self.set_cached_frame("jump")
             self.rect.topleft = (self.posicionX, self.posicionY)
             return 
 
         # 3. Lógica para correr/movimiento (solo si no está agachado o saltando/cayendo)
         if self.is_moving:
-            if current_time - self.last_frame_update > PLAYER_RUN_ANIMATION_SPEED:
-                self.current_frame_index = (self.current_frame_index + 1) % len(self.images["run_right"])
+            if self.scheduler is not None:
+                if self.run_timer is None:
+                    self.run_timer = self.scheduler.every(PLAYER_RUN_ANIMATION_SPEED, self.advance_run_frame)
+            elif current_time - self.last_frame_update > PLAYER_RUN_ANIMATION_SPEED:
+                self.advance_run_frame()
                 self.last_frame_update = current_time
 
-            if self.direccion == "right":
-                self.set_image(self.images["run_right"][self.current_frame_index], target_size) # Escalar la imagen de correr
-            else:
-                self.set_image(self.images["run_left"][self.current_frame_index], target_size)  # Escalar la imagen de correr
+            self.set_cached_frame("run", self.current_frame_index)
         else: # Quieto
             self.current_frame_index = 0 
-            if self.direccion == "right":
-                self.set_image(self.images["idle_right"], target_size) # Escalar la imagen de quieto
-            else:
-                self.set_image(self.images["idle_left"], target_size)  # Escalar la imagen de quieto
+            self.set_cached_frame("idle")
                 
         # Asegurarse de que la parte inferior del jugador esté siempre en el suelo si está grounded
         if self.grounded:
-            self.rect.bottom = SCREEN_HEIGHT - GROUND_LEVEL_OFFSET
+            self.rect.bottom = self.suelo_y
             self.posicionY = self.rect.y
 
 
+    def advance_run_frame(self):
+        """Pasa al siguiente frame de la animación de correr."""
+        self.current_frame_index = (self.current_frame_index + 1) % len(self.images["run_right"])
+        self.set_cached_frame("run", self.current_frame_index)
+
     def try_jump(self):
         """
         Intenta iniciar un salto o añadir un impulso si ya está en el aire.
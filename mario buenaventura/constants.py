@@ -20,9 +20,61 @@ JUMP_ACCELERATION_FACTOR = -0.5
 JUMP_CUT_FACTOR = 0.5 
 JUMP_AIR_IMPULSE_FACTOR = 0.7 
 
+# Física a paso fijo (Game.run). GRAVITY, PASO_X, GOOMBA_SPEED y las demás cantidades de
+# arriba son por paso y están ajustadas a 60 pasos por segundo: subir PHYSICS_HZ sin
+# reescalarlas aceleraría el juego y cambiaría la forma de los saltos. Las grabaciones, los
+# ajustes de batch.py y el servidor de red también cuentan en pasos de este tamaño.
+PHYSICS_HZ = 60
+MAX_PHYSICS_STEPS = 5     # Pasos como máximo por frame dibujado; si el equipo va más atrasado, el juego se ralentiza
+RENDER_FPS_LIMIT = 240    # Frames dibujados por segundo como máximo (0: sin límite)
+INTERPOLATION_MAX_PX = 50 # Saltos mayores entre dos pasos (objetos reciclados, vuelta del nivel) no se interpolan
+
 # Duraciones (en milisegundos)
 IMMUNITY_DURATION = 3000  # 3 segundos
 PLAYER_RUN_ANIMATION_SPEED = 100
+SIMULATION_STEP_MS = 1000 / PHYSICS_HZ # Duración de un tick simulado (PHYSICS_HZ ticks por segundo)
+SPAWN_INTERVAL_MS = (3000, 7000)  # Espera mínima y máxima entre objetos (hongos, monedas, estrellas)
+GOOMBA_INTERVAL_MS = (2000, 5000) # Espera mínima y máxima entre goombas
+
+# Colisiones: lado (en píxeles) de cada celda de la rejilla espacial
+SPATIAL_CELL_SIZE = 64
+# Jugadores a partir de los cuales se usa la rejilla. Mantenerla cuesta lo mismo que unas
+# 5 comprobaciones lineales por entidad y tick; con menos jugadores sale más barato recorrer las listas.
+BROADPHASE_MIN_PLAYERS = 5
+
+# Objetos creados de antemano en cada pool (hongos, monedas, estrellas, goombas)
+OBJECT_POOL_SIZE = 8
+
+# Frames que guarda el perfilador para el gráfico en pantalla (F3)
+PROFILE_HISTORY = 120
+
+# Niveles de casillas (level.py): tamaño de casilla, columnas por trozo y trozos en caché
+TILE_SIZE = 25
+LEVEL_CHUNK_TILES = 16
+LEVEL_CHUNK_CACHE = 6
+# Con nivel, la cámara avanza cuando el jugador pasa de esta x de la pantalla (y él se queda ahí)
+CAMERA_LEAD_X = SCREEN_WIDTH // 2
+
+# Sonido: con un búfer pequeño, un efecto empieza a sonar pocos milisegundos después de pedirlo
+MIXER_FREQUENCY = 44100
+MIXER_BUFFER = 256 # Muestras por bloque del mezclador: 256 / 44100 = 5,8 ms de latencia
+SFX_CHANNELS = 8   # Canales del mezclador reservados para efectos
+# Efectos de sonido; si falta el archivo, audio.py sintetiza uno parecido
+SFX_PATHS = {name: os.path.join("assets", "sound", f"{name}.wav")
+             for name in ("moneda", "pisoton", "crecer", "vida", "estrella", "dano", "muerte")}
+
+# Rebobinado (rewind.py): se guarda el estado de cada tick de los últimos REWIND_SECONDS
+REWIND_SECONDS = 10
+REWIND_BUFFER_BYTES = 1 << 20  # Memoria fija del anillo; si se llena, se rebobina menos tiempo
+REWIND_KEYFRAME_INTERVAL = 60  # Ticks entre estados completos; entre medias, solo diferencias
+
+# Multijugador en red (net.py)
+NET_PORT = 5555
+NET_SNAPSHOT_INTERVAL = 2   # Ticks entre instantáneas del servidor (30 por segundo)
+NET_INTERP_DELAY_MS = 100   # Retraso con el que el cliente dibuja a los demás, para interpolar entre instantáneas
+NET_INPUT_REDUNDANCY = 8    # Entradas sin confirmar que se reenvían en cada paquete (por si se pierden)
+NET_HISTORY = 64            # Ticks de instantáneas que se guardan como base de las diferencias
+NET_TIMEOUT_MS = 5000       # Silencio tras el que el servidor da por desconectado a un cliente
 
 # Colores (definiciones de colores RGB)
 SKY_BLUE = (135, 206, 235)
@@ -62,12 +114,22 @@ IMG_PATHS = {
     "goomba": os.path.join("assets", "goomba.png"),                         
 }
 
+# Imágenes que necesita el menú: el hilo de carga las decodifica primero
+MENU_ASSETS = ("fondo",)
+
+# Fuente del texto: si existe el archivo incluido se usa ese; si no, se busca por nombre
+FONT_NAME = "Arial"
+FONT_PATH = os.path.join("assets", "fonts", "Arial.ttf")
+
+# Presupuesto de arranque: milisegundos hasta el primer frame (ver startup.py)
+STARTUP_BUDGET_MS = 500
+
 # Escalado de imágenes (tamaños finales deseados para los objetos)
 PLAYER_NORMAL_SIZE = (40, 60)   
 PLAYER_DUCK_SIZE = (40, 40)     
 PLAYER_BIG_SIZE = (55, 80)      
-# Opcional: Define un tamaño específico para Mario Grande Agachado si lo quieres diferente
-# PLAYER_BIG_DUCK_SIZE = (55, 55)
+# Mario Grande agachado: 70% de la altura de Mario grande
+PLAYER_BIG_DUCK_SIZE = (PLAYER_BIG_SIZE[0], int(PLAYER_BIG_SIZE[1] * 0.7))
 GOOMBA_SIZE = (45, 45)          
 MUSHROOM_SIZE = (35, 35)        
 COIN_SIZE = (30, 30)            
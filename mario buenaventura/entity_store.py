@@ -0,0 +1,170 @@
+from constants import *
+
+try:
+    import numpy as np
+except ImportError: # NumPy es opcional: sin él, el juego actualiza cada objeto por separado
+    np = None
+
+# Listas del juego que puede guardar el almacén, con su código de tipo
+ENTITY_KINDS = ("poderes_activos", "monedas_activas", "enemigos_activos")
+
+
+def pygame_round(values):
+    """Redondea como pygame.Rect al asignar floats (mitades lejos del cero)."""
+    return np.trunc(values + np.copysign(0.5, values)).astype(np.int64)
+
+
+class EntityStore:
+    """
+    Almacén de entidades en arreglos de NumPy (struct-of-arrays).
+    Guarda posición, velocidad, tamaño, tipo y estado de cada poder o enemigo, y aplica
+    en bloque lo que antes hacía cada objeto en update(): el avance horizontal, la gravedad
+    de Personaje.aplicar_gravedad con su tope en el suelo, y la detección de los que salen
+    por la izquierda. Mientras se use el almacén, los arreglos mandan: las posiciones se
+    copian a los objetos solo cuando alguien las necesita (sync y overlapping).
+    :param capacity: Número inicial de huecos; crece solo si hace falta.
+    :param gravity_accel: Aceleración de caída de los enemigos (Personaje.gravedad).
+    """
+    def __init__(self, capacity=1024, gravity_accel=GRAVITY):
+        if np is None:
+            raise RuntimeError("EntityStore necesita NumPy (pip install numpy)")
+        self.gravity_accel = gravity_accel
+        self.capacity = 0
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.vx = np.zeros(0)
+        self.vy = np.zeros(0)
+        self.width = np.zeros(0, dtype=np.int64)
+        self.height = np.zeros(0, dtype=np.int64)
+        self.kind = np.zeros(0, dtype=np.int8)
+        self.gravity = np.zeros(0, dtype=bool)
+        self.grounded = np.zeros(0, dtype=bool)
+        self.alive = np.zeros(0, dtype=bool)
+        self.dirty = np.zeros(0, dtype=bool) # Objetos con posición desactualizada
+        self.order = np.zeros(0, dtype=np.int64) # Orden de llegada, como en las listas del juego
+        self._next_order = 0
+        self.objects = []
+        self._free = []
+        self._grow(capacity)
+
+    def __len__(self):
+        return self.capacity - len(self._free)
+
+    def _grow(self, capacity):
+        """Amplía los arreglos hasta capacity huecos, conservando el contenido."""
+        extra = capacity - self.capacity
+        for name in ("x", "y", "vx", "vy", "width", "height", "kind", "gravity", "grounded", "alive", "dirty", "order"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros(extra, dtype=array.dtype)]))
+        self.objects.extend([None] * extra)
+        # Los huecos libres se reparten desde el final de la lista, de menor a mayor índice
+        self._free = list(range(capacity - 1, self.capacity - 1, -1)) + self._free
+        self.capacity = capacity
+
+    def add(self, obj, kind):
+        """
+        Registra un poder o enemigo y devuelve su hueco en los arreglos.
+        :param kind: Lista del juego a la que pertenece (ver ENTITY_KINDS).
+        """
+        if not self._free:
+            self._grow(self.capacity * 2)
+        slot = self._free.pop()
+        has_gravity = hasattr(obj, "velocidad_x") # Enemigo: avanza a su velocidad y cae
+        self.x[slot] = obj.posicionX
+        self.y[slot] = obj.posicionY
+        self.vx[slot] = obj.velocidad_x if has_gravity else -OBJECT_SPEED
+        self.vy[slot] = obj.velocidadY if has_gravity else 0
+        self.width[slot] = obj.rect.width
+        self.height[slot] = obj.rect.height
+        self.kind[slot] = ENTITY_KINDS.index(kind)
+        self.gravity[slot] = has_gravity
+        self.grounded[slot] = obj.grounded if has_gravity else True
+        self.alive[slot] = True
+        self.dirty[slot] = False
+        self.order[slot] = self._next_order
+        self._next_order += 1
+        self.objects[slot] = obj
+        return slot
+
+    def remove(self, slot):
+        """Libera el hueco de una entidad (sincronizando antes su objeto)."""
+        if self.dirty[slot]:
+            self._sync_slots(np.array([slot]))
+        self.alive[slot] = False
+        self.objects[slot] = None
+        self._free.append(slot)
+
+    def step(self, floor_y):
+        """
+        Avanza un tick todas las entidades vivas.
+        :return: Diccionario {lista del juego: objetos fuera de pantalla} con las que haya que quitar.
+        """
+        alive = self.alive
+        self.x[alive] += self.vx[alive]
+
+        # Gravedad solo para las entidades que caen (mismo orden que aplicar_gravedad)
+        falling = alive & self.gravity & ~self.grounded
+        if falling.any():
+            self.vy[falling] += self.gravity_accel
+            self.y[falling] += self.vy[falling]
+            bottom = pygame_round(self.y) + self.height
+            landed = falling & (bottom >= floor_y)
+            self.y[landed] = floor_y - self.height[landed]
+            self.vy[landed] = 0
+            self.grounded[landed] = True
+        self.dirty |= alive
+
+        offscreen = np.flatnonzero(alive & (self.x <= -self.width))
+        culled = {}
+        if len(offscreen):
+            self._sync_slots(offscreen)
+            for slot, code in zip(offscreen.tolist(), self.kind[offscreen].tolist()):
+                culled.setdefault(ENTITY_KINDS[code], []).append(self.objects[slot])
+        return culled
+
+    def shift(self, dx):
+        """Desplaza en horizontal todas las entidades vivas (cuando avanza la cámara del nivel)."""
+        alive = self.alive
+        self.x[alive] += dx
+        self.dirty |= alive
+
+    def overlapping(self, kind, rect):
+        """
+        Objetos de una lista cuyo rect choca con rect, en orden de llegada y ya sincronizados.
+        Es la fase amplia de colisiones hecha en bloque sobre los arreglos.
+        """
+        left = pygame_round(self.x)
+        top = pygame_round(self.y)
+        hits = np.flatnonzero(self.alive & (self.kind == ENTITY_KINDS.index(kind)) &
+                              (left < rect.right) & (left + self.width > rect.left) &
+                              (top < rect.bottom) & (top + self.height > rect.top))
+        hits = hits[np.argsort(self.order[hits])]
+        self._sync_slots(hits)
+        return [self.objects[slot] for slot in hits.tolist()]
+
+    def sync(self):
+        """Copia a los objetos todas las posiciones pendientes (antes de dibujar o guardar estado)."""
+        self._sync_slots(np.flatnonzero(self.dirty & self.alive))
+
+    def _sync_slots(self, slots):
+        """Copia posición, rect y caída de los huecos indicados a sus objetos."""
+        slots = slots[self.dirty[slots]]
+        if not len(slots):
+            return
+        objects = self.objects
+        xs = self.x[slots].tolist()
+        ys = self.y[slots].tolist()
+        rect_xs = pygame_round(self.x[slots]).tolist()
+        rect_ys = pygame_round(self.y[slots]).tolist()
+        for slot, x, y, rect_x, rect_y in zip(slots.tolist(), xs, ys, rect_xs, rect_ys):
+            obj = objects[slot]
+            obj.posicionX = x
+            obj.posicionY = y
+            obj.rect.topleft = (rect_x, rect_y)
+
+        enemies = slots[self.gravity[slots]]
+        for slot, vy, grounded in zip(enemies.tolist(), self.vy[enemies].tolist(), self.grounded[enemies].tolist()):
+            obj = objects[slot]
+            obj.velocidadY = vy
+            obj.grounded = grounded
+        self.dirty[slots] = False
@@ -1,45 +1,126 @@
 import pygame
-import random
 import os
+import time
+import functools
+import operator
 import sys # Asegúrate de que sys esté importado si lo usas en otro lugar
 from pygame.locals import *
 
 from constants import *
 from character import Personaje, Enemigo, Goomba, Jugador
 from powerup import Poder, Hongo, Moneda, Estrella
+from inputs import FrameInput, read_frame_input
+from game_clock import GameClock
+from scheduler import Scheduler
+from spatial import SpatialHash
+from entity_store import EntityStore, np
+from pool import ObjectPool
+from render import RENDERERS, DirtyRectRenderer
+from hud import HUD
+from asset_cache import read_atlas, convert_surface, build_atlas
+from loader import AssetLoader
+from startup import init_subsystems, load_font
+from audio import SoundEffects, decode_effects, ensure_mixer
+from profiler import FrameProfiler, ProfilerGraph, NULL_PROFILER
+from level import Level
+from rewind import Rewind
+
+# Posición de dibujo de un sprite sin interpolación
+RECT = operator.attrgetter("rect")
+
+# Atributos de Game que se pueden cambiar por partida con el parámetro tuning
+TUNABLE_SETTINGS = ("goomba_speed", "gravity", "spawn_interval", "goomba_interval", "max_goombas", "max_total_goombas")
+
 
 class Game:
-    def __init__(self):
-        pygame.init()
-        pygame.mixer.init() # Inicializa el módulo de mezcla de sonido
+    def __init__(self, headless=False, seed=None, step_ms=None, entity_store=False, dirty_rects=False, use_atlas=True, startup=None, profile_path=None, tuning=None, level_path=None, renderer="direct", window_size=None, rewind=False):
+        """
+        :param headless: Si es True, no se abre ventana ni se inicia el audio, y el juego
+                         se avanza con step() tan rápido como permita la CPU.
+        :param seed: Semilla del generador aleatorio (aparición de objetos y enemigos).
+        :param step_ms: Milisegundos simulados por tick. Si es None, el juego usa tiempo real,
+                        salvo en modo headless, que avanza SIMULATION_STEP_MS por tick.
+        :param entity_store: Si es True (y NumPy está instalado), poderes y enemigos se mueven
+                             en bloque con un EntityStore en lugar de objeto por objeto.
+        :param dirty_rects: Si es True, durante la partida solo se redibujan y envían a la
+                            pantalla las zonas que cambian (para equipos con poca CPU).
+        :param use_atlas: Si es True, las imágenes se cargan desde el atlas binario cuando está al día.
+        :param startup: StartupProfiler que mide las fases del arranque hasta ver el menú.
+        :param profile_path: Archivo .csv o .jsonl donde guardar el tiempo de cada fase de cada
+                             frame. Sin él, el perfilador se activa solo al pulsar F3.
+        :param tuning: Diccionario con valores propios de los parámetros de dificultad
+                       (ver TUNABLE_SETTINGS), por ejemplo {"goomba_speed": 3}.
+        :param level_path: Archivo de nivel de casillas (ver level.py). Sin él, solo se ve el fondo.
+        :param renderer: Cómo se dibuja (ver render.py): "direct" en la pantalla, "scaled" en
+                         una superficie que se escala a la ventana, o "texture" con texturas de SDL2.
+        :param window_size: Tamaño inicial de la ventana con "scaled" y "texture".
+        :param rewind: Si es True, se guarda el estado de cada tick de los últimos REWIND_SECONDS
+                       y mantener Retroceso rebobina la partida (ver rewind.py). Necesita step_ms:
+                       sin él, ValueError.
+        """
+        self.headless = headless
+        if step_ms is None and headless:
+            step_ms = SIMULATION_STEP_MS
+        if rewind and step_ms is None:
+            raise ValueError("Para rebobinar, el juego debe usar un reloj de paso fijo (step_ms)")
+        # Reloj y azar del juego: toda la lógica temporal pasa por aquí
+        self.game_clock = GameClock(step_ms, seed)
+        self.rng = self.game_clock.rng
+        self.startup = startup
+        # Solo video y fuentes; el audio se inicia al cargar la música
+        init_subsystems(headless)
+        self.mark_startup("pygame")
         
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.renderer = RENDERERS[renderer](window_size)
+        self.screen = self.renderer.surface # Superficie lógica del juego (None con texturas)
         pygame.display.set_caption("Super Mario en Buenaventura")
+        self.mark_startup("ventana")
 
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont("Arial", 24)
-        self.small_font = pygame.font.SysFont("Arial", 16)
+        self.clock.tick() # Arranca el temporizador de SDL (antes lo hacía pygame.init())
+        self.font = load_font(24)
+        self.small_font = load_font(16)
+        self.hud = HUD(self.small_font)
+        self.mark_startup("fuentes")
+
+        # Medición por fases de cada frame (F3 muestra el gráfico)
+        self.profiler = FrameProfiler(profile_path) if profile_path else NULL_PROFILER
+        self.profiler_graph = None
+        self.show_profiler = False
+
+        # Grabación de la entrada (InputRecorder de replay.py), si se pidió
+        self.recorder = None
+
+        # Bucle a paso fijo (ver run): los sprites se dibujan entre su posición antes del
+        # último paso de física y la actual, según la fracción alpha de paso acumulada
+        self.interpolate = False
+        self.alpha = 1.0
+        self.previous_positions = {}
+        self.previous_camera_x = None
+        self.fps_limit = RENDER_FPS_LIMIT
+        self.physics_steps = 0
+        self.late_frames = 0   # Frames en los que se alcanzó MAX_PHYSICS_STEPS
+        self.dropped_ms = 0.0  # Tiempo real que no se llegó a simular
+
+        # Pantallas de menú y fin de juego: capas y textos se crean una vez, y el frame
+        # completo ya mezclado se guarda mientras la pantalla no cambia
+        self.overlays = {}
+        self.static_frame = None # (nombre de la pantalla, superficie)
 
         self.floor_y = SCREEN_HEIGHT - GROUND_LEVEL_OFFSET
 
-        # Cargar imágenes
-        self.imgs = {}
-        self.load_images()
-
-        # Cargar música de fondo
+        # Cargar imágenes y música de fondo en un hilo aparte: mientras tanto se muestra
+        # una pantalla de carga, y start_game espera solo a las imágenes de la partida
         # --- CAMBIO IMPORTANTE AQUÍ ---
         # Usa os.path.join para construir la ruta de manera segura
         # y asegúrate de que 'background_music.mp3' sea el nombre real de tu archivo de música.
         self.music_path = os.path.join(os.getcwd(), "assets", "sound", "background_music.mp3") 
-        
-        # Verifica si el archivo de música existe antes de cargarlo
-        if os.path.exists(self.music_path):
-            pygame.mixer.music.load(self.music_path)
-            # Reproduce la música en bucle (-1 para reproducir indefinidamente)
-            pygame.mixer.music.play(-1) 
-        else:
-            print(f"Advertencia: Archivo de música no encontrado en {self.music_path}. No se reproducirá la música.")
+        self.music_loaded = False
         # --- FIN DEL CAMBIO IMPORTANTE ---
+        self.sfx = SoundEffects() # Sin sonidos no hace nada, hasta que el hilo de carga los decodifica
+        self.imgs = {}
+        self.start_asset_loading(use_atlas, audio=not headless) # Sin audio en modo headless
+        self.mark_startup("hilo de carga")
 
         # Estados del juego
         self.game_running = False
@@ -53,149 +134,438 @@ class Game:
         self.estrella_activa = None
         self.enemigos_activos = []
         self.total_goombas_generados = 0
+        self.next_serial = 0 # Siguiente identificador de entidad (ver spawn_entity)
+        self.current_player = None
+
+        # Parámetros de dificultad (batch.py los cambia por partida para ajustar el balance)
+        self.goomba_speed = GOOMBA_SPEED
+        self.gravity = GRAVITY
+        self.spawn_interval = SPAWN_INTERVAL_MS
+        self.goomba_interval = GOOMBA_INTERVAL_MS
         self.max_goombas = 2
         self.max_total_goombas = 10
-        self.current_player = None
+        for name, value in (tuning or {}).items():
+            if name not in TUNABLE_SETTINGS:
+                raise ValueError(f"Parámetro de dificultad desconocido: {name}")
+            setattr(self, name, value)
+
+        # Nivel de casillas que se desplaza con la cámara (opcional)
+        self.level = Level.load(level_path) if level_path else None
+
+        # Dibujo por rectángulos sucios (opcional, solo dibujando directamente en la pantalla)
+        # (el fondo se le asigna cuando termina de cargarse)
+        dirty_rects = dirty_rects and self.renderer.name == "direct"
+        self.dirty_renderer = DirtyRectRenderer(self.screen, None) if dirty_rects else None
+
+        # Pools de objetos: las imágenes de self.imgs ya están escaladas, así que
+        # reutilizar un objeto no escala ni crea nada nuevo. Se llenan al terminar de
+        # cargar las imágenes (ver on_images_ready)
+        self.pools = {
+            Hongo: ObjectPool(lambda: self.create_pooled(Hongo(0, 0, 0, "crecimiento"), "hongo_crecimiento")),
+            Moneda: ObjectPool(lambda: self.create_pooled(Moneda(0, 0, 0), "moneda")),
+            Estrella: ObjectPool(lambda: self.create_pooled(Estrella(0, 0, 0), "estrella")),
+            Goomba: ObjectPool(lambda: self.create_pooled(Goomba(0, 0, 0), "goomba")),
+        }
+
+        # Almacén opcional en arreglos de NumPy para mover muchas entidades a la vez
+        self.entity_store = None
+        if entity_store:
+            if np is not None:
+                self.entity_store = EntityStore(gravity_accel=self.gravity)
+            else:
+                print("Advertencia: NumPy no está instalado. Las entidades se actualizarán una a una.")
+
+        # Fase amplia de colisiones: una rejilla por lista de entidades,
+        # activa solo cuando hay BROADPHASE_MIN_PLAYERS jugadores o más
+        self.broadphase_enabled = False
+        self.broadphase = {
+            "poderes_activos": SpatialHash(),
+            "monedas_activas": SpatialHash(),
+            "enemigos_activos": SpatialHash(),
+        }
+
+        # Temporizadores: apariciones, fin de la inmunidad y animación, en una sola cola
+        self.scheduler = Scheduler(self.game_clock)
+        self.goomba_pending = False # El temporizador venció pero había demasiados Goombas
+        self.immunity_timers = {} # id del jugador -> TimerHandle del fin de su inmunidad
+
+        # Rebobinado (opcional): mientras se mantiene Retroceso, cada tick deshace uno grabado
+        self.rewind = Rewind(self) if rewind else None
+        self.rewinding = False
+
+        # En modo headless no hay pantalla de carga: se espera a tenerlo todo
+        if headless:
+            self.asset_loader.wait()
+
+    def load_images(self, use_atlas=True):
+        """
+        Carga todas las imágenes del juego y espera a que estén listas.
+        Si el atlas binario (asset_cache.py) existe y está al día, las superficies salen de
+        ahí ya escaladas; si no, se cargan los PNG y se regenera el atlas para el próximo arranque.
+        :param use_atlas: Si es False, siempre se cargan los PNG.
+        """
+        self.start_asset_loading(use_atlas, audio=False)
+        self.asset_loader.wait()
+
+    def start_asset_loading(self, use_atlas=True, audio=True):
+        """Lanza el hilo de carga de imágenes (primero las del menú) y, si se pide, del sonido."""
+        self.use_atlas = use_atlas
+        keys = list(MENU_ASSETS) + [key for key in IMG_PATHS if key not in MENU_ASSETS]
+        self.images_ready = False
+        self.asset_errors = False
+        self.asset_source = "png"
+        self.asset_load_start = time.perf_counter()
+        self.asset_loader = AssetLoader(lambda: self.decode_assets(keys, use_atlas, audio),
+                                        keys + ["sonidos", "music"] if audio else keys, self.finish_asset)
+
+    def decode_assets(self, keys, use_atlas, audio):
+        """
+        Trabajo del hilo de carga: lee el atlas o decodifica los PNG, y carga los efectos y la música.
+        No toca la pantalla; la conversión y el escalado los hace finish_asset.
+        """
+        atlas = read_atlas() if use_atlas else None
+        for key in keys:
+            if atlas is not None:
+                yield key, ("atlas", atlas[key]), None
+                continue
+            try:
+                yield key, ("png", self.decode_image(IMG_PATHS[key])), None
+            except pygame.error as e:
+                yield key, None, e
+
+        if audio:
+            if not ensure_mixer():
+                yield "sonidos", None, None
+                yield "music", False, pygame.error("audio no disponible")
+                return
+            try:
+                yield "sonidos", decode_effects(), None
+            except pygame.error as e:
+                yield "sonidos", None, e
+            if not os.path.exists(self.music_path):
+                yield "music", False, None
+                return
+            try:
+                pygame.mixer.music.load(self.music_path)
+                yield "music", True, None
+            except pygame.error as e:
+                yield "music", False, e
+
+    def finish_asset(self, key, value, error):
+        """Termina de preparar en el hilo principal un recurso que el hilo de carga ya decodificó."""
+        if key == "sonidos":
+            if error is not None:
+                print(f"Advertencia: No se pudieron cargar los efectos de sonido: {error}")
+            elif value:
+                self.sfx.attach(value)
+            return
+        if key == "music":
+            if error is not None:
+                print(f"Advertencia: No se pudo cargar la música: {error}")
+            elif not value:
+                print(f"Advertencia: Archivo de música no encontrado en {self.music_path}. No se reproducirá la música.")
+            else:
+                self.music_loaded = True
+                if not self.game_over:
+                    # Reproduce la música en bucle (-1 para reproducir indefinidamente)
+                    pygame.mixer.music.play(-1)
+            return
 
-        # Temporizadores
-        self.spawn_timer = 0
-        self.goomba_timer = 0
-        self.immunity_timers = {}
+        if error is not None:
+            print(f"Error al cargar imágenes: {error}")
+            self.asset_errors = True
+            for fallback_key, surface in self.fallback_images().items():
+                self.imgs.setdefault(fallback_key, surface)
+        else:
+            source, data = value
+            self.asset_source = source
+            if source == "atlas":
+                self.imgs[key] = convert_surface(*data)
+            else:
+                self.imgs[key] = self.prepare_image(key, IMG_PATHS[key], data)
+
+        if key == "fondo" and self.dirty_renderer is not None:
+            self.dirty_renderer.background = self.imgs["fondo"]
+        if not self.images_ready and self.asset_loader.ready(IMG_PATHS):
+            self.images_ready = True
+            self.on_images_ready()
+
+    def on_images_ready(self):
+        """Se llama una vez, cuando todas las imágenes están listas."""
+        self.asset_load_ms = (time.perf_counter() - self.asset_load_start) * 1000
+        for cls, pool in self.pools.items():
+            pool.prefill(1 if cls is Estrella else OBJECT_POOL_SIZE)
+        if self.asset_source == "png" and self.use_atlas and not self.asset_errors:
+            try:
+                build_atlas(self.imgs)
+            except OSError as e:
+                print(f"Advertencia: No se pudo guardar el atlas de imágenes: {e}")
+
+    def fallback_images(self):
+        """Marcadores de posición para las imágenes esenciales cuando pygame no puede cargar alguna."""
+        imgs = {}
+        # Fallback para imágenes esenciales de Mario
+        imgs["fondo"] = self.placeholder_background()
+        
+        # Crear marcadores de posición para las imágenes esenciales del jugador
+        imgs["mario_normal"] = pygame.Surface(PLAYER_NORMAL_SIZE, pygame.SRCALPHA); imgs["mario_normal"].fill((0, 255, 0, 128))
+        imgs["mario_normal_izquierda"] = pygame.transform.flip(imgs["mario_normal"], True, False)
+        imgs["mario_corriendo_derecha_1"] = imgs["mario_normal"]
+        imgs["mario_corriendo_izquierda_1"] = imgs["mario_normal_izquierda"]
+        imgs["mario_agachado"] = pygame.Surface(PLAYER_DUCK_SIZE, pygame.SRCALPHA); imgs["mario_agachado"].fill((0, 0, 255, 128))
+        
+        imgs["goomba"] = pygame.Surface(GOOMBA_SIZE, pygame.SRCALPHA); imgs["goomba"].fill((128, 0, 128, 128))
+        imgs["hongo_crecimiento"] = pygame.Surface(MUSHROOM_SIZE, pygame.SRCALPHA); imgs["hongo_crecimiento"].fill((255, 0, 255, 128))
+        imgs["hongo_vida"] = pygame.Surface(MUSHROOM_SIZE, pygame.SRCALPHA); imgs["hongo_vida"].fill((0, 255, 255, 128))
+        imgs["moneda"] = pygame.Surface(COIN_SIZE, pygame.SRCALPHA); imgs["moneda"].fill((255, 255, 0, 128))
+        imgs["estrella"] = pygame.Surface(STAR_SIZE, pygame.SRCALPHA); imgs["estrella"].fill((255, 255, 100, 128))
+        return imgs
+
+    def decode_image(self, path):
+        """Decodifica una imagen sin convertirla (seguro en el hilo de carga). None si no existe."""
+        full_path = os.path.join(os.getcwd(), path)
+        if not os.path.exists(full_path):
+            return None
+        return pygame.image.load(full_path)
+
+    def prepare_image(self, key, path, img):
+        """
+        Deja una imagen decodificada escalada y en el formato de la pantalla.
+        :param img: Superficie de decode_image, o None si el archivo no existe.
+        """
+        if img is None:
+            full_path = os.path.join(os.getcwd(), path)
+            print(f"Error: Imagen no encontrada en {full_path}. Usando marcador de posición.")
+            if key == "fondo":
+                return self.placeholder_background()
+
+            size = (30,30)
+            if "mario_normal" in key or "mario_corriendo" in key or "mario_agachado" in key: size = PLAYER_NORMAL_SIZE
+            elif "goomba" in key: size = GOOMBA_SIZE
+            elif "hongo" in key: size = MUSHROOM_SIZE
+            elif "moneda" in key: size = COIN_SIZE
+            elif "estrella" in key: size = STAR_SIZE
+
+            placeholder_img = pygame.Surface(size)
+            placeholder_img.fill(RED) 
+            pygame.draw.rect(placeholder_img, BLACK, placeholder_img.get_rect(), 1)
+            return placeholder_img.convert()
+
+        img = img.convert_alpha()
+        if key == "fondo":
+            return pygame.transform.scale(img, (SCREEN_WIDTH, SCREEN_HEIGHT))
+        # Las imágenes de Mario no se escalan aquí al cargar, solo se almacenan
+        # para ser escaladas una vez por la clase Jugador
+        elif key.startswith("mario_"):
+            return img
+        elif key == "hongo_crecimiento" or key == "hongo_vida":
+            return pygame.transform.scale(img, MUSHROOM_SIZE)
+        elif key == "moneda":
+            return pygame.transform.scale(img, COIN_SIZE)
+        elif key == "estrella":
+            return pygame.transform.scale(img, STAR_SIZE)
+        elif key == "goomba":
+            return pygame.transform.scale(img, GOOMBA_SIZE)
+        return img
+
+    def placeholder_background(self):
+        """Fondo de reemplazo: cielo y suelo de colores, ya en el formato de la pantalla."""
+        background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        background.fill(SKY_BLUE)
+        pygame.draw.rect(background, BROWN, (0, self.floor_y, SCREEN_WIDTH, SCREEN_HEIGHT - self.floor_y))
+        return background.convert()
+
+
+    def create_pooled(self, entity, image_key):
+        """Prepara un objeto nuevo para un pool: le asigna su imagen ya escalada, sin volver a escalar."""
+        entity.set_image(self.imgs[image_key])
+        if isinstance(entity, Personaje):
+            entity.gravedad = self.gravity
+        return entity
+
+    def spawn_entity(self, cls, id, x, y, **kwargs):
+        """
+        Saca una entidad del pool de su clase y la reinicia en (x, y).
+        :param kwargs: Argumentos extra para reset() (por ejemplo tipo e image en los hongos).
+        """
+        entity = self.pools[cls].acquire()
+        entity.reset(id, x, y, **kwargs)
+        entity.serial = self.next_serial # Identifica la entidad aunque el objeto se reutilice (red)
+        self.next_serial = (self.next_serial + 1) & 0xFFFF
+        return entity
+
+    def release_entity(self, entity):
+        """Devuelve una entidad a su pool, si salió de uno."""
+        pool = self.pools.get(type(entity))
+        if pool is not None:
+            pool.release(entity)
+
+    def pool_stats(self):
+        """Tamaño, tasa de aciertos y máximo en uso de cada pool, para ajustarlos."""
+        return {cls.__name__: pool.stats() for cls, pool in self.pools.items()}
+
+    def start_game(self, local_player=True):
+        """
+        Inicia el juego principal.
+        :param local_player: Si es False no se crea el jugador local (el servidor de red añade los suyos).
+        """
+        # La partida necesita todas las imágenes, pero no la música
+        self.asset_loader.wait(IMG_PATHS)
+
+        # Devolver a los pools lo que quedó de la partida anterior
+        for kind in ("poderes_activos", "monedas_activas", "enemigos_activos"):
+            for entity in getattr(self, kind):
+                self.release_entity(entity)
+        if self.estrella_activa:
+            self.release_entity(self.estrella_activa)
 
-    def load_images(self):
-        """Carga todas las imágenes del juego."""
-        try:
-            for key, path in IMG_PATHS.items():
-                full_path = os.path.join(os.getcwd(), path)
-                if not os.path.exists(full_path):
-                    print(f"Error: Imagen no encontrada en {full_path}. Usando marcador de posición.")
-                    if key == "fondo":
-                        self.imgs[key] = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-                        self.imgs[key].fill(SKY_BLUE)
-                        pygame.draw.rect(self.imgs[key], BROWN, (0, self.floor_y, SCREEN_WIDTH, SCREEN_HEIGHT - self.floor_y))
-                    else:
-                        size = (30,30)
-                        if "mario_normal" in key or "mario_corriendo" in key or "mario_agachado" in key: size = PLAYER_NORMAL_SIZE
-                        elif "goomba" in key: size = GOOMBA_SIZE
-                        elif "hongo" in key: size = MUSHROOM_SIZE
-                        elif "moneda" in key: size = COIN_SIZE
-                        elif "estrella" in key: size = STAR_SIZE
-
-                        placeholder_img = pygame.Surface(size)
-                        placeholder_img.fill(RED) 
-                        pygame.draw.rect(placeholder_img, BLACK, placeholder_img.get_rect(), 1)
-                        self.imgs[key] = placeholder_img
-                    continue
-
-                img = pygame.image.load(full_path).convert_alpha()
-                if key == "fondo":
-                    self.imgs[key] = pygame.transform.scale(img, (SCREEN_WIDTH, SCREEN_HEIGHT))
-                # Las imágenes de Mario no se escalan aquí al cargar, solo se almacenan
-                # para ser escaladas dinámicamente por la clase Jugador
-                elif key.startswith("mario_"): # Solo para las imágenes de Mario, no las escalamos aquí
-                    self.imgs[key] = img
-                elif key == "hongo_crecimiento" or key == "hongo_vida":
-                    self.imgs[key] = pygame.transform.scale(img, MUSHROOM_SIZE)
-                elif key == "moneda":
-                    self.imgs[key] = pygame.transform.scale(img, COIN_SIZE)
-                elif key == "estrella":
-                    self.imgs[key] = pygame.transform.scale(img, STAR_SIZE)
-                elif key == "goomba":
-                    self.imgs[key] = pygame.transform.scale(img, GOOMBA_SIZE)
-
-
-        except pygame.error as e:
-            print(f"Error al cargar imágenes: {e}")
-            # Fallback para imágenes esenciales de Mario
-            self.imgs["fondo"] = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            self.imgs["fondo"].fill(SKY_BLUE)
-            pygame.draw.rect(self.imgs["fondo"], BROWN, (0, self.floor_y, SCREEN_WIDTH, SCREEN_HEIGHT - self.floor_y))
-            
-            # Crear marcadores de posición para las imágenes esenciales del jugador
-            self.imgs["mario_normal"] = pygame.Surface(PLAYER_NORMAL_SIZE, pygame.SRCALPHA); self.imgs["mario_normal"].fill((0, 255, 0, 128))
-            self.imgs["mario_normal_izquierda"] = pygame.transform.flip(self.imgs["mario_normal"], True, False)
-            self.imgs["mario_corriendo_derecha_1"] = self.imgs["mario_normal"]
-            self.imgs["mario_corriendo_izquierda_1"] = self.imgs["mario_normal_izquierda"]
-            self.imgs["mario_agachado"] = pygame.Surface(PLAYER_DUCK_SIZE, pygame.SRCALPHA); self.imgs["mario_agachado"].fill((0, 0, 255, 128))
-            
-            self.imgs["goomba"] = pygame.Surface(GOOMBA_SIZE, pygame.SRCALPHA); self.imgs["goomba"].fill((128, 0, 128, 128))
-            self.imgs["hongo_crecimiento"] = pygame.Surface(MUSHROOM_SIZE, pygame.SRCALPHA); self.imgs["hongo_crecimiento"].fill((255, 0, 255, 128))
-            self.imgs["hongo_vida"] = pygame.Surface(MUSHROOM_SIZE, pygame.SRCALPHA); self.imgs["hongo_vida"].fill((0, 255, 255, 128))
-            self.imgs["moneda"] = pygame.Surface(COIN_SIZE, pygame.SRCALPHA); self.imgs["moneda"].fill((255, 255, 0, 128))
-            self.imgs["estrella"] = pygame.Surface(STAR_SIZE, pygame.SRCALPHA); self.imgs["estrella"].fill((255, 255, 100, 128))
-
-
-    def start_game(self):
-        """Inicia el juego principal."""
         self.players = []
         self.poderes_activos = []
         self.monedas_activas = []
         self.estrella_activa = None
         self.enemigos_activos = []
         self.total_goombas_generados = 0
+        self.next_serial = 0
+        self.scheduler.clear()
+        self.goomba_pending = False
         self.immunity_timers = {}
+        self.static_frame = None
+        if self.rewind is not None:
+            self.rewind.clear()
+        if self.level is not None:
+            self.level.reset()
+        if self.entity_store is not None:
+            self.entity_store = EntityStore(self.entity_store.capacity, self.gravity)
+        self.refresh_broadphase()
 
         self.in_menu = False
         self.game_running = True
         self.game_over = False
 
-        p1 = Jugador(1, "Mario", SCREEN_WIDTH // 4, self.floor_y - PLAYER_NORMAL_SIZE[1])
-        p1.load_player_images(self.imgs) 
-        self.players.append(p1)
-        self.current_player = p1
-        self.current_player.set_current_animation_frame() 
+        self.current_player = None
+        if local_player:
+            p1 = Jugador(1, "Mario", SCREEN_WIDTH // 4, self.floor_y - PLAYER_NORMAL_SIZE[1],
+                         clock=self.game_clock, scheduler=self.scheduler)
+            self.add_player(p1)
+            self.current_player = p1
+            self.current_player.set_current_animation_frame() 
 
-        self.spawn_timer = pygame.time.get_ticks()
-        self.goomba_timer = pygame.time.get_ticks()
+        self.schedule_spawn()
+        self.schedule_goomba()
 
         # Si la música se detuvo al reiniciar, la vuelves a reproducir
-        if pygame.mixer.music.get_busy() == 0:
-            if os.path.exists(self.music_path):
-                pygame.mixer.music.play(-1) 
-            else:
-                print(f"Advertencia: Archivo de música no encontrado en {self.music_path} al intentar reiniciar.")
+        if self.music_loaded and pygame.mixer.music.get_busy() == 0:
+            pygame.mixer.music.play(-1) 
+
+    def add_player(self, player):
+        """Añade un jugador a la partida y activa la rejilla de colisiones si ya compensa."""
+        player.load_player_images(self.imgs)
+        player.gravedad = self.gravity
+        self.players.append(player)
+        self.refresh_broadphase()
+
+    def refresh_broadphase(self):
+        """
+        Activa o desactiva la rejilla de colisiones según el número de jugadores.
+        Al activarla se reconstruye a partir de las listas de entidades.
+        """
+        # Con el EntityStore la fase amplia ya se hace en bloque sobre sus arreglos
+        self.broadphase_enabled = self.entity_store is None and len(self.players) >= BROADPHASE_MIN_PLAYERS
+        for kind, grid in self.broadphase.items():
+            grid.clear()
+            for obj in getattr(self, kind):
+                obj.broadphase_handle = grid.insert(obj, obj.rect) if self.broadphase_enabled else None
+
+    def schedule_spawn(self):
+        """Programa la aparición del siguiente objeto tras una espera al azar en spawn_interval."""
+        self.scheduler.after(self.rng.randint(*self.spawn_interval), self.spawn_objects)
+
+    def schedule_goomba(self):
+        """Programa el siguiente Goomba tras una espera al azar en goomba_interval."""
+        self.scheduler.after(self.rng.randint(*self.goomba_interval), self.spawn_goomba)
 
     def spawn_objects(self):
-        """Genera objetos (hongos, monedas, estrellas) en el juego."""
-        current_time = pygame.time.get_ticks()
-        if current_time - self.spawn_timer > random.randint(3000, 7000):
-            self.spawn_timer = current_time
-
-            object_type = random.choice(["hongo_crecimiento", "hongo_vida", "moneda", "estrella"])
-            x_pos = SCREEN_WIDTH + 50
-
-            if object_type.startswith("hongo"):
-                y_pos = self.floor_y - MUSHROOM_SIZE[1] 
-                tipo = object_type.split("_")[1]
-                hongo = Hongo(len(self.poderes_activos), x_pos, y_pos, tipo)
-                hongo.set_image(self.imgs[object_type], MUSHROOM_SIZE)
-                self.poderes_activos.append(hongo)
-            elif object_type == "moneda":
-                y_pos = self.floor_y - random.randint(50, 150) 
-                moneda = Moneda(len(self.monedas_activas), x_pos, y_pos)
-                moneda.set_image(self.imgs["moneda"], COIN_SIZE)
-                self.monedas_activas.append(moneda)
-            elif object_type == "estrella" and not self.estrella_activa:
-                y_pos = self.floor_y - random.randint(80, 200)
-                estrella = Estrella(1, x_pos, y_pos)
-                estrella.set_image(self.imgs["estrella"], STAR_SIZE)
-                self.estrella_activa = estrella
+        """Genera un objeto (hongo, moneda o estrella) y programa el siguiente."""
+        self.schedule_spawn()
+        object_type = self.rng.choice(["hongo_crecimiento", "hongo_vida", "moneda", "estrella"])
+        x_pos = SCREEN_WIDTH + 50
+
+        if object_type.startswith("hongo"):
+            y_pos = self.floor_y - MUSHROOM_SIZE[1] 
+            tipo = object_type.split("_")[1]
+            hongo = self.spawn_entity(Hongo, len(self.poderes_activos), x_pos, y_pos,
+                                      tipo=tipo, image=self.imgs[object_type])
+            self.add_entity("poderes_activos", hongo)
+        elif object_type == "moneda":
+            y_pos = self.floor_y - self.rng.randint(50, 150) 
+            moneda = self.spawn_entity(Moneda, len(self.monedas_activas), x_pos, y_pos)
+            self.add_entity("monedas_activas", moneda)
+        elif object_type == "estrella" and not self.estrella_activa:
+            y_pos = self.floor_y - self.rng.randint(80, 200)
+            self.estrella_activa = self.spawn_entity(Estrella, 1, x_pos, y_pos)
 
     def spawn_goomba(self):
-        """Genera enemigos (Goombas) en el juego."""
-        current_time = pygame.time.get_ticks()
-        if (current_time - self.goomba_timer > random.randint(2000, 5000)) and \
-           (len(self.enemigos_activos) < self.max_goombas) and \
-           (self.total_goombas_generados < self.max_total_goombas):
-
-            self.goomba_timer = current_time
-            x_pos = SCREEN_WIDTH + 50
-            y_pos = self.floor_y - GOOMBA_SIZE[1] 
-
-            goomba = Goomba(len(self.enemigos_activos), x_pos, y_pos)
-            goomba.set_image(self.imgs["goomba"], GOOMBA_SIZE) 
-            self.enemigos_activos.append(goomba)
-            self.total_goombas_generados += 1
+        """
+        Genera un Goomba cuando vence su temporizador y programa el siguiente.
+        Si ya hay max_goombas en pantalla, queda pendiente y aparece en cuanto haya sitio.
+        """
+        if self.total_goombas_generados >= self.max_total_goombas:
+            self.goomba_pending = False
+            return
+        if len(self.enemigos_activos) >= self.max_goombas:
+            self.goomba_pending = True
+            return
+        self.goomba_pending = False
+
+        x_pos = SCREEN_WIDTH + 50
+        y_pos = self.floor_y - GOOMBA_SIZE[1] 
+
+        goomba = self.spawn_entity(Goomba, len(self.enemigos_activos), x_pos, y_pos,
+                                   velocidad_x=-self.goomba_speed)
+        self.add_entity("enemigos_activos", goomba)
+        self.total_goombas_generados += 1
+        if self.total_goombas_generados < self.max_total_goombas:
+            self.schedule_goomba()
+
+    def add_entity(self, kind, entity):
+        """
+        Añade una entidad a una de las listas del juego y, si está activa, a su rejilla de colisiones.
+        :param kind: "poderes_activos", "monedas_activas" o "enemigos_activos".
+        """
+        getattr(self, kind).append(entity)
+        if self.entity_store is not None:
+            entity.store_slot = self.entity_store.add(entity, kind)
+        if self.broadphase_enabled:
+            entity.broadphase_handle = self.broadphase[kind].insert(entity, entity.rect)
+
+    def despawn(self, kind, entity):
+        """
+        Quita una entidad de la rejilla de colisiones y del almacén, y la devuelve a su pool.
+        La lista se filtra aparte.
+        """
+        if entity.store_slot is not None:
+            self.entity_store.remove(entity.store_slot)
+            entity.store_slot = None
+        if entity.broadphase_handle is not None:
+            self.broadphase[kind].remove(entity.broadphase_handle)
+            entity.broadphase_handle = None
+        self.release_entity(entity)
+
+    def cull_offscreen(self, kind):
+        """Elimina de una lista las entidades que ya salieron por la izquierda de la pantalla."""
+        entities = getattr(self, kind)
+        alive = [obj for obj in entities if obj.posicionX > -obj.rect.width]
+        if len(alive) != len(entities):
+            for obj in entities:
+                if obj.posicionX <= -obj.rect.width:
+                    self.despawn(kind, obj)
+            setattr(self, kind, alive)
+
+    def remove_entities(self, kind, removed):
+        """Quita de una lista, en una sola pasada, las entidades recogidas o eliminadas en este tick."""
+        for obj in removed:
+            self.despawn(kind, obj)
+        setattr(self, kind, [obj for obj in getattr(self, kind) if obj not in removed])
 
     def check_collision(self, rect1, rect2):
         """Verifica si dos rectángulos están colisionando."""
@@ -203,24 +573,49 @@ class Game:
             return rect1.colliderect(rect2)
         return False
 
-    def handle_collisions(self):
-        """Maneja todas las colisiones del jugador."""
-        player = self.current_player
-        if not player or not player.rect:
-            return
+    def collision_candidates(self, kind, rect):
+        """Entidades de una lista que podrían chocar con rect, en el orden de la lista."""
+        if self.entity_store is not None:
+            return self.entity_store.overlapping(kind, rect)
+        if self.broadphase_enabled:
+            return self.broadphase[kind].query(rect)
+        return getattr(self, kind)
 
+    def handle_collisions(self):
+        """
+        Maneja todas las colisiones de los jugadores. Las entidades eliminadas se quitan
+        de sus listas una sola vez al final, sin importar cuántos jugadores haya.
+        """
+        removed = {kind: set() for kind in self.broadphase}
+        for player in self.players:
+            if player.rect and player.estado != "Muerto":
+                self.handle_player_collisions(player, removed)
+
+        for kind, entities in removed.items():
+            if entities:
+                self.remove_entities(kind, entities)
+
+    def handle_player_collisions(self, player, removed):
+        """
+        Maneja las colisiones de un jugador. Con la rejilla activa solo se comprueban
+        las entidades cercanas al jugador en lugar de recorrer todas.
+        :param removed: Conjuntos de entidades ya eliminadas en este tick, por lista.
+        """
         # Colisión con hongos
-        for hongo in list(self.poderes_activos):
-            if self.check_collision(player.rect, hongo.rect):
+        removed_hongos = removed["poderes_activos"]
+        for hongo in self.collision_candidates("poderes_activos", player.rect):
+            if hongo not in removed_hongos and self.check_collision(player.rect, hongo.rect):
                 old_player_size = player.tamaño # Guarda el tamaño actual antes de cambiarlo
                 
                 if hongo.tipo == "crecimiento":
                     player.tamaño = "grande"
                     player.puntos += 100
+                    self.sfx.play("crecer")
                 elif hongo.tipo == "vida":
                     player.vidas += 1
                     player.tamaño = "grande" 
                     player.puntos += 200
+                    self.sfx.play("vida")
 
                 # Solo ajusta la posición Y si el tamaño realmente cambió a grande
                 if old_player_size != "grande" and player.tamaño == "grande":
@@ -230,44 +625,52 @@ class Game:
                     player.rect.y = player.posicionY 
                     player.set_current_animation_frame() # Actualiza la imagen y el rect después del ajuste de tamaño
 
-                self.poderes_activos.remove(hongo)
+                removed_hongos.add(hongo)
 
         # Colisión con monedas
-        for moneda in list(self.monedas_activas):
-            if self.check_collision(player.rect, moneda.rect):
+        removed_monedas = removed["monedas_activas"]
+        for moneda in self.collision_candidates("monedas_activas", player.rect):
+            if moneda not in removed_monedas and self.check_collision(player.rect, moneda.rect):
                 player.monedas += 1
                 player.puntos += 100
-                self.monedas_activas.remove(moneda)
+                removed_monedas.add(moneda)
                 if player.monedas >= 10:
                     player.vidas += 1
                     player.monedas = 0
                     player.puntos += 500
+                    self.sfx.play("vida")
+                else:
+                    self.sfx.play("moneda")
 
         # Colisión con estrella
         if self.estrella_activa and self.check_collision(player.rect, self.estrella_activa.rect):
             player.puntos += 500
-            player.inmune = True
-            self.immunity_timers[player.id] = pygame.time.get_ticks()
+            self.start_immunity(player)
+            self.sfx.play("estrella")
+            self.release_entity(self.estrella_activa)
             self.estrella_activa = None
 
         # Colisión con Goombas
-        for goomba in list(self.enemigos_activos):
-            if self.check_collision(player.rect, goomba.rect):
+        removed_goombas = removed["enemigos_activos"]
+        for goomba in self.collision_candidates("enemigos_activos", player.rect):
+            if goomba not in removed_goombas and self.check_collision(player.rect, goomba.rect):
                 if player.velocidadY > 0 and player.rect.bottom - player.velocidadY <= goomba.rect.centery:
                     player.puntos += 100
-                    self.enemigos_activos.remove(goomba)
+                    removed_goombas.add(goomba)
                     player.velocidadY = -JUMP_STRENGTH_MIN 
                     player.grounded = False 
                     player.is_jumping = True 
+                    self.sfx.play("pisoton")
 
                 elif player.inmune:
                     player.puntos += 200
-                    self.enemigos_activos.remove(goomba)
+                    removed_goombas.add(goomba)
+                    self.sfx.play("pisoton")
                 else: # Mario es golpeado
                     if player.tamaño == "grande":
                         player.tamaño = "normal"
-                        player.inmune = True
-                        self.immunity_timers[player.id] = pygame.time.get_ticks()
+                        self.start_immunity(player)
+                        self.sfx.play("dano")
                         # Al encogerse, ajusta la posición Y para que la base siga en el suelo
                         # La altura de Mario grande menos la altura de Mario normal
                         height_diff = PLAYER_BIG_SIZE[1] - PLAYER_NORMAL_SIZE[1]
@@ -276,205 +679,467 @@ class Game:
                         player.set_current_animation_frame() 
                     else:
                         player.vidas -= 1
-                        if player.vidas <= 0:
-                            player.estado = "Muerto"
-                            self.game_over = True
-                            self.game_running = False
-                            pygame.mixer.music.stop() # Detener la música al terminar el juego
+                        if player.vidas > 0:
+                            self.start_immunity(player)
+                            self.sfx.play("dano")
                         else:
-                            player.inmune = True
-                            self.immunity_timers[player.id] = pygame.time.get_ticks()
-                    self.enemigos_activos.remove(goomba) 
-
-    def update_immunity(self):
-        """Actualiza el estado de inmunidad de los jugadores."""
-        current_time = pygame.time.get_ticks()
-        for player_id, start_time in list(self.immunity_timers.items()):
-            if current_time - start_time > IMMUNITY_DURATION:
-                for player in self.players:
-                    if player.id == player_id:
-                        player.inmune = False
-                del self.immunity_timers[player_id]
+                            player.estado = "Muerto"
+                            self.sfx.play("muerte")
+                            # La partida termina cuando no queda ningún jugador vivo
+                            if all(other.estado == "Muerto" for other in self.players):
+                                self.game_over = True
+                                self.game_running = False
+                                if self.music_loaded:
+                                    pygame.mixer.music.stop() # Detener la música al terminar el juego
+                    removed_goombas.add(goomba)
+
+    def start_immunity(self, player):
+        """Hace inmune a un jugador durante IMMUNITY_DURATION; si ya lo era, el plazo vuelve a empezar."""
+        player.inmune = True
+        timer = self.immunity_timers.get(player.id)
+        if timer is not None:
+            timer.cancel()
+        self.immunity_timers[player.id] = self.scheduler.after(IMMUNITY_DURATION, functools.partial(self.end_immunity, player))
+
+    def end_immunity(self, player):
+        player.inmune = False
+        del self.immunity_timers[player.id]
+
+    def step_player(self, player):
+        """Avanza un tick la física y la animación de un jugador (el cliente de red lo usa para predecir)."""
+        player.update() 
+        player.aplicar_gravedad() 
+        
+        player.posicionX = max(0, min(player.posicionX, SCREEN_WIDTH - player.rect.width))
+        player.rect.x = player.posicionX 
+        if self.level is not None:
+            self.level.collide(player)
+
+        player.set_current_animation_frame() 
+
+    def follow(self, player):
+        """
+        Avanza la cámara del nivel cuando el jugador pasa de CAMERA_LEAD_X: el jugador se queda
+        ahí y todo lo demás (el nivel, los objetos y los enemigos, que están en coordenadas de
+        pantalla) se desplaza a la izquierda lo mismo. La cámara solo avanza, en píxeles enteros.
+        """
+        shift = int(player.posicionX) - CAMERA_LEAD_X
+        if shift <= 0:
+            return
+        self.level.scroll(shift)
+        for other in self.players:
+            other.mover(dx=-shift)
+        if self.entity_store is not None:
+            self.entity_store.shift(-shift)
+        else:
+            for entities in (self.poderes_activos, self.monedas_activas, self.enemigos_activos):
+                for entity in entities:
+                    entity.mover(dx=-shift)
+        if self.estrella_activa:
+            self.estrella_activa.mover(dx=-shift)
 
     def update(self):
         """Actualiza el estado del juego."""
+        if self.rewinding and not self.in_menu:
+            # Antes de mirar game_running: también se puede deshacer el fin de la partida
+            if self.rewind.step_back() and self.game_running and self.music_loaded and not pygame.mixer.music.get_busy():
+                pygame.mixer.music.play(-1)
+            self.profiler.lap("rebobinado")
+            return
+        self.game_clock.tick()
         if not self.game_running:
             return
+        profiler = self.profiler
 
-        # Actualizar jugador
-        if self.current_player:
-            self.current_player.update() 
-            self.current_player.aplicar_gravedad() 
-            
-            self.current_player.posicionX = max(0, min(self.current_player.posicionX, SCREEN_WIDTH - self.current_player.rect.width))
-            self.current_player.rect.x = self.current_player.posicionX 
+        # Actualizar jugadores (en red, el servidor simula a todos)
+        for player in self.players:
+            if player.estado != "Muerto":
+                self.step_player(player)
 
-            self.current_player.set_current_animation_frame() 
+        # Con nivel, la cámara sigue al jugador
+        if self.level is not None and self.current_player is not None:
+            self.follow(self.current_player)
+        profiler.lap("jugador")
 
-        # Generar objetos y enemigos
-        self.spawn_objects()
-        self.spawn_goomba()
+        # Disparar los temporizadores que vencieron (apariciones, fin de la inmunidad, animación)
+        self.scheduler.run_due()
+        if self.goomba_pending:
+            self.spawn_goomba()
+        profiler.lap("temporizadores")
 
         # Actualizar posición de objetos y enemigos
-        for hongo in self.poderes_activos:
-            hongo.update()
+        if self.entity_store is not None:
+            # Movimiento y detección de salidas en bloque
+            offscreen = self.entity_store.step(self.floor_y)
+        else:
+            offscreen = None
+            for hongo in self.poderes_activos:
+                hongo.update()
 
-        for moneda in self.monedas_activas:
-            moneda.update()
+            for moneda in self.monedas_activas:
+                moneda.update()
+
+            for goomba in self.enemigos_activos:
+                goomba.update()
 
         if self.estrella_activa:
             self.estrella_activa.update()
 
-        for goomba in self.enemigos_activos:
-            goomba.update()
+        # Mover las entidades de celda en la rejilla de colisiones
+        if self.broadphase_enabled:
+            for kind, grid in self.broadphase.items():
+                for obj in getattr(self, kind):
+                    grid.update(obj.broadphase_handle, obj.rect)
+        profiler.lap("entidades")
 
         # Eliminar objetos fuera de pantalla
-        self.poderes_activos = [obj for obj in self.poderes_activos if obj.posicionX > -obj.rect.width]
-        self.monedas_activas = [obj for obj in self.monedas_activas if obj.posicionX > -obj.rect.width]
+        if offscreen is not None:
+            for kind, entities in offscreen.items():
+                self.remove_entities(kind, set(entities))
+        else:
+            self.cull_offscreen("poderes_activos")
+            self.cull_offscreen("monedas_activas")
+            self.cull_offscreen("enemigos_activos")
         if self.estrella_activa and self.estrella_activa.posicionX < -self.estrella_activa.rect.width:
+            self.release_entity(self.estrella_activa)
             self.estrella_activa = None
-        self.enemigos_activos = [obj for obj in self.enemigos_activos if obj.posicionX > -obj.rect.width]
+        profiler.lap("limpieza")
 
         # Manejar colisiones
         self.handle_collisions()
+        profiler.lap("colisiones")
 
-        # Actualizar inmunidad
-        self.update_immunity()
+        if self.rewind is not None:
+            self.rewind.record()
+            profiler.lap("rebobinado")
 
     def draw(self):
         """Dibuja todos los elementos del juego."""
-        if "fondo" in self.imgs:
-            self.screen.blit(self.imgs["fondo"], (0, 0))
+        if not self.asset_loader.ready(MENU_ASSETS):
+            self.draw_loading()
+            return
+        if self.startup is not None and not self.startup.reported:
+            self.draw_menu_first_frame()
+            return
+
+        # El menú y el fin de juego no cambian mientras se muestran: basta un blit del frame guardado
+        screen_name = "menu" if self.in_menu else "game_over" if self.game_over else None
+        if screen_name and self.static_frame and self.static_frame[0] == screen_name:
+            self.renderer.blit(self.static_frame[1], (0, 0))
+            self.renderer.present()
+            return
+
+        if self.entity_store is not None:
+            self.entity_store.sync()
+
+        # Los menús cubren toda la pantalla, y un nivel que se desplaza cambia la pantalla
+        # entera: en esos casos se dibuja siempre el frame completo
+        dirty = self.dirty_renderer is not None and self.game_running and self.level is None
+        position = self.draw_position if self.interpolate else RECT
+        if dirty:
+            self.dirty_renderer.begin()
+            blit = self.dirty_renderer.blit
         else:
-            self.screen.fill(SKY_BLUE)
-            pygame.draw.rect(self.screen, BROWN, (0, self.floor_y, SCREEN_WIDTH, SCREEN_HEIGHT - self.floor_y))
+            blit = self.renderer.blit
+            if "fondo" in self.imgs:
+                blit(self.imgs["fondo"], (0, 0))
+            else:
+                self.renderer.fill(SKY_BLUE)
+                self.renderer.fill(BROWN, (0, self.floor_y, SCREEN_WIDTH, SCREEN_HEIGHT - self.floor_y))
+            if self.level is not None:
+                self.level.draw(self.renderer, self.camera_position())
 
         for hongo in self.poderes_activos:
             if hongo.image and hongo.rect:
-                self.screen.blit(hongo.image, hongo.rect)
+                blit(hongo.image, position(hongo))
 
         for moneda in self.monedas_activas:
             if moneda.image and moneda.rect:
-                self.screen.blit(moneda.image, moneda.rect)
+                blit(moneda.image, position(moneda))
 
         if self.estrella_activa and self.estrella_activa.image and self.estrella_activa.rect:
-            self.screen.blit(self.estrella_activa.image, self.estrella_activa.rect)
+            blit(self.estrella_activa.image, position(self.estrella_activa))
 
         for goomba in self.enemigos_activos:
             if goomba.image and goomba.rect:
-                self.screen.blit(goomba.image, goomba.rect)
+                blit(goomba.image, position(goomba))
 
-        if self.current_player and self.current_player.image and self.current_player.rect:
-            if self.current_player.inmune and pygame.time.get_ticks() % 200 < 100:
-                pass 
-            else:
-                self.screen.blit(self.current_player.image, self.current_player.rect)
+        for player in self.players:
+            # En red, los jugadores muertos desaparecen mientras los demás siguen jugando
+            if player.image and player.rect and (player.estado != "Muerto" or not self.game_running):
+                if player.inmune and self.game_clock.now() % 200 < 100:
+                    pass 
+                else:
+                    blit(player.image, position(player))
 
         if self.current_player:
-            stats = [
-                f"Vidas: {self.current_player.vidas}",
-                f"Monedas: {self.current_player.monedas}",
-                f"Puntos: {self.current_player.puntos}",
-                f"Tamaño: {self.current_player.tamaño}",
-                f"Inmune: {'Sí' if self.current_player.inmune else 'No'}"
-            ]
-
-            for i, stat in enumerate(stats):
-                text = self.small_font.render(stat, True, BLACK)
-                self.screen.blit(text, (10, 10 + i * 20))
+            self.hud.draw(blit, self.current_player)
+        if self.show_profiler:
+            self.profiler_graph.draw(blit, self.profiler)
 
         if self.in_menu:
             self.draw_menu()
         elif self.game_over:
             self.draw_game_over()
+        if screen_name and self.screen is not None:
+            self.static_frame = (screen_name, self.screen.copy())
 
-        pygame.display.flip()
+        if dirty:
+            self.dirty_renderer.present()
+        else:
+            self.renderer.present()
+            if self.dirty_renderer is not None:
+                self.dirty_renderer.invalidate() # Al volver a la partida hay que redibujar todo
+
+    def snapshot_positions(self):
+        """Guarda dónde está cada sprite antes de un paso de física, para interpolar al dibujar."""
+        if self.entity_store is not None:
+            self.entity_store.sync()
+        positions = {}
+        for entities in (self.poderes_activos, self.monedas_activas, self.enemigos_activos, self.players):
+            for entity in entities:
+                if entity.rect:
+                    positions[entity] = entity.rect.topleft
+        if self.estrella_activa and self.estrella_activa.rect:
+            positions[self.estrella_activa] = self.estrella_activa.rect.topleft
+        self.previous_positions = positions
+        self.previous_camera_x = self.level.camera_x if self.level is not None else None
+
+    def draw_position(self, entity):
+        """Posición de un sprite entre el paso anterior y el actual, según self.alpha."""
+        rect = entity.rect
+        previous = self.previous_positions.get(entity)
+        if previous is None:
+            return rect
+        dx = rect.x - previous[0]
+        dy = rect.y - previous[1]
+        if (not dx and not dy) or abs(dx) > INTERPOLATION_MAX_PX or abs(dy) > INTERPOLATION_MAX_PX:
+            return rect
+        return (round(previous[0] + dx * self.alpha), round(previous[1] + dy * self.alpha))
+
+    def camera_position(self):
+        """Cámara del nivel interpolada como los sprites (salvo al dar la vuelta al nivel)."""
+        camera_x = self.level.camera_x
+        previous = self.previous_camera_x
+        if not self.interpolate or previous is None or not 0 <= camera_x - previous <= INTERPOLATION_MAX_PX:
+            return camera_x
+        return previous + (camera_x - previous) * self.alpha
+
+    def get_overlay(self, name):
+        """
+        Devuelve (y crea la primera vez) la capa de una pantalla: el velo semitransparente
+        y sus textos ya renderizados con su posición.
+        """
+        if name not in self.overlays:
+            veil = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+            veil.fill((0, 0, 0, 128))
+
+            if name == "menu":
+                title = self.font.render("MARIO EN BUENAVENTURA", True, WHITE)
+                subtitle = self.small_font.render("Presiona ESPACIO para iniciar", True, WHITE)
+                title_y = SCREEN_HEIGHT // 2 - 50
+            else:
+                title = self.font.render("GAME OVER", True, RED)
+                subtitle = self.small_font.render("Presiona R para reiniciar", True, WHITE)
+                title_y = SCREEN_HEIGHT // 2 - 30
+
+            self.overlays[name] = [
+                (veil, (0, 0)),
+                (title, (SCREEN_WIDTH // 2 - title.get_width() // 2, title_y)),
+                (subtitle, (SCREEN_WIDTH // 2 - subtitle.get_width() // 2, SCREEN_HEIGHT // 2 + 20)),
+            ]
+        return self.overlays[name]
+
+    def mark_startup(self, phase):
+        if self.startup is not None:
+            self.startup.mark(phase)
+
+    def draw_menu_first_frame(self):
+        """Dibuja el primer frame del menú y cierra la medición del arranque."""
+        self.startup.mark("imágenes del menú")
+        self.startup.reported = True # draw() no debe volver a entrar aquí
+        self.draw()
+        self.startup.mark("primer frame")
+        self.startup.report()
+
+    def draw_loading(self):
+        """Dibuja la pantalla de carga con el progreso del hilo de carga."""
+        self.renderer.fill(BLACK)
+        bar = pygame.Rect(0, 0, SCREEN_WIDTH // 2, 20)
+        bar.center = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20)
+        self.renderer.fill(WHITE, bar, 2)
+        progress = bar.inflate(-6, -6)
+        progress.width = int(progress.width * self.asset_loader.progress)
+        self.renderer.fill(WHITE, progress)
+        text = self.small_font.render("Cargando...", True, WHITE)
+        self.renderer.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2 - 20))
+        self.renderer.present()
 
     def draw_menu(self):
         """Dibuja el menú principal."""
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 128))
-        self.screen.blit(overlay, (0, 0))
-
-        title = self.font.render("MARIO EN BUENAVENTURA", True, WHITE)
-        start_text = self.small_font.render("Presiona ESPACIO para iniciar", True, WHITE)
-
-        self.screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, SCREEN_HEIGHT // 2 - 50))
-        self.screen.blit(start_text, (SCREEN_WIDTH // 2 - start_text.get_width() // 2, SCREEN_HEIGHT // 2 + 20))
+        self.renderer.blits(self.get_overlay("menu"))
 
     def draw_game_over(self):
         """Dibuja la pantalla de fin de juego."""
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 128))
-        self.screen.blit(overlay, (0, 0))
-
-        game_over_text = self.font.render("GAME OVER", True, RED)
-        restart_text = self.small_font.render("Presiona R para reiniciar", True, WHITE)
-
-        self.screen.blit(game_over_text, (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2, SCREEN_HEIGHT // 2 - 30))
-        self.screen.blit(restart_text, (SCREEN_WIDTH // 2 - restart_text.get_width() // 2, SCREEN_HEIGHT // 2 + 20))
+        self.renderer.blits(self.get_overlay("game_over"))
 
     def handle_events(self):
         """Maneja los eventos del juego."""
-        keys = pygame.key.get_pressed()
-        running = True
-
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                running = False
-
-            if event.type == KEYDOWN:
-                if self.in_menu and event.key == K_SPACE:
+        return self.apply_input(read_frame_input())
+
+    def apply_input(self, frame_input):
+        """
+        Aplica la entrada de un tick al juego (pulsaciones y teclas mantenidas).
+        :param frame_input: FrameInput con la entrada del tick.
+        :return: False si se pidió cerrar el juego.
+        """
+        if self.recorder is not None:
+            self.recorder.record(frame_input)
+        running = not frame_input.quit
+
+        for pressed, key in frame_input.events:
+            if pressed:
+                if key == K_F3:
+                    self.toggle_profiler()
+                elif self.in_menu and key == K_SPACE:
                     self.start_game()
-                elif self.game_over and event.key == K_r:
+                elif self.game_over and key == K_r:
                     self.start_game()
                 elif self.game_running and self.current_player:
-                    if event.key in (K_LSHIFT, K_RSHIFT):
-                        self.current_player.is_running = True
-                    elif event.key == K_UP:
-                        self.current_player.try_jump()
-                    elif event.key == K_DOWN:
-                        self.current_player.is_ducking = True
-            if event.type == KEYUP and self.current_player:
-                if event.key in (K_LSHIFT, K_RSHIFT):
-                    self.current_player.is_running = False
-                elif event.key == K_UP:
-                    self.current_player.end_jump_key()
-                elif event.key == K_DOWN:
-                    self.current_player.is_ducking = False
-
-        # Movimiento continuo basado en las teclas mantenidas
+                    self.apply_player_key(self.current_player, True, key)
+            elif self.current_player:
+                self.apply_player_key(self.current_player, False, key)
+
         if self.game_running and self.current_player:
-            if not self.current_player.is_ducking:
-                speed = PASO_X * (RUNNING_MULTIPLIER if self.current_player.is_running else 1)
-                self.current_player.is_moving = False 
-
-                if keys[K_RIGHT]:
-                    self.current_player.direccion = "right"
-                    self.current_player.mover(dx=speed)
-                    self.current_player.is_moving = True
-                elif keys[K_LEFT]:
-                    self.current_player.direccion = "left"
-                    self.current_player.mover(dx=-speed)
-                    self.current_player.is_moving = True
-            else:
-                self.current_player.is_moving = False 
-            
-            # ¡Importante! Aquí ya no va la carga de música, eso va en __init__
-            # y en start_game si necesitas reiniciarla.
-            # La línea que tenías aquí se eliminó:
-            # pygame.mixer.music.load("C:\Users\Jose\proyectomarioversion2\assets\sound")
-            # pygame.mixer.music.play(-1)
+            self.apply_player_held(self.current_player, frame_input.held)
+        self.rewinding = self.rewind is not None and K_BACKSPACE in frame_input.held
 
         return running
 
+    def apply_player_input(self, player, frame_input):
+        """
+        Aplica a un jugador concreto solo la parte de la entrada que lo mueve (sin menús ni F3).
+        El servidor de red la usa con cada cliente y el cliente para predecir su jugador.
+        """
+        if player.estado == "Muerto":
+            return
+        for pressed, key in frame_input.events:
+            if self.game_running or not pressed:
+                self.apply_player_key(player, pressed, key)
+        if self.game_running:
+            self.apply_player_held(player, frame_input.held)
+
+    def apply_player_key(self, player, pressed, key):
+        """Aplica a un jugador una pulsación o liberación de tecla."""
+        if pressed:
+            if key in (K_LSHIFT, K_RSHIFT):
+                player.is_running = True
+            elif key == K_UP:
+                player.try_jump()
+            elif key == K_DOWN:
+                player.is_ducking = True
+        else:
+            if key in (K_LSHIFT, K_RSHIFT):
+                player.is_running = False
+            elif key == K_UP:
+                player.end_jump_key()
+            elif key == K_DOWN:
+                player.is_ducking = False
+
+    def apply_player_held(self, player, held):
+        """Movimiento continuo de un jugador basado en las teclas mantenidas."""
+        if not player.is_ducking:
+            speed = PASO_X * (RUNNING_MULTIPLIER if player.is_running else 1)
+            player.is_moving = False 
+
+            if K_RIGHT in held:
+                player.direccion = "right"
+                player.mover(dx=speed)
+                player.is_moving = True
+            elif K_LEFT in held:
+                player.direccion = "left"
+                player.mover(dx=-speed)
+                player.is_moving = True
+        else:
+            player.is_moving = False 
+
+    def toggle_profiler(self):
+        """Muestra u oculta el gráfico de tiempos por fase (activa el perfilador si hacía falta)."""
+        if not self.profiler.enabled:
+            self.profiler = FrameProfiler()
+        if self.profiler_graph is None:
+            self.profiler_graph = ProfilerGraph(self.small_font)
+            self.renderer.mark_dynamic(self.profiler_graph.graph) # Se desplaza en el sitio cada frame
+        self.show_profiler = not self.show_profiler
+        self.static_frame = None # El menú guardado no tiene (o sí tiene) el gráfico
+        if self.dirty_renderer is not None:
+            self.dirty_renderer.invalidate()
+
+    def fall_behind(self, dropped_ms):
+        """Cuenta un frame de la partida en el que no dio tiempo a simular todo (avisa la primera vez)."""
+        if not self.game_running:
+            return # Las cargas y los menús pueden tardar sin que importe
+        self.late_frames += 1
+        self.dropped_ms += dropped_ms
+        if self.late_frames == 1:
+            print(f"Advertencia: el equipo no alcanza {PHYSICS_HZ} pasos de física por segundo; "
+                  "el juego irá más lento")
+
+    def step(self, inputs=None):
+        """
+        Avanza un tick de simulación sin dibujar ni esperar al reloj.
+        Pensado para el modo headless: pruebas de larga duración, ajuste de balance y bots.
+        :param inputs: FrameInput con la entrada del tick. Si es None, no se pulsa nada.
+        :return: False si la entrada pidió cerrar el juego.
+        """
+        self.profiler.begin_frame()
+        running = self.apply_input(inputs if inputs is not None else FrameInput())
+        self.profiler.lap("eventos")
+        self.update()
+        self.profiler.end_frame()
+        return running
+
     def run(self):
-        """Bucle principal del juego."""
+        """
+        Bucle principal del juego. Un acumulador de tiempo real avanza la física en pasos
+        fijos de SIMULATION_STEP_MS, y se dibuja tan a menudo como permita fps_limit,
+        con los sprites interpolados entre los dos últimos pasos. Si el equipo no da abasto,
+        cada frame da como mucho MAX_PHYSICS_STEPS pasos y descarta el resto del tiempo:
+        el juego se ralentiza en lugar de quedarse atascado recuperando pasos.
+        """
+        self.interpolate = True
         running = True
+        accumulator = 0.0
+        previous = time.perf_counter()
         while running:
-            running = self.handle_events()
-            self.update()
+            profiler = self.profiler # F3 puede cambiarlo a mitad de frame
+            profiler.begin_frame()
+            self.asset_loader.poll() # Preparar lo que el hilo de carga ya terminó
+            now = time.perf_counter()
+            accumulator += (now - previous) * 1000
+            previous = now
+
+            steps = 0
+            while running and accumulator >= SIMULATION_STEP_MS:
+                if steps == MAX_PHYSICS_STEPS:
+                    self.fall_behind(accumulator - accumulator % SIMULATION_STEP_MS)
+                    accumulator %= SIMULATION_STEP_MS
+                    break
+                if accumulator < 2 * SIMULATION_STEP_MS:
+                    self.snapshot_positions() # Último paso del frame: de aquí parte la interpolación
+                running = self.handle_events()
+                profiler.lap("eventos")
+                self.update()
+                accumulator -= SIMULATION_STEP_MS
+                steps += 1
+            self.physics_steps += steps
+            self.alpha = min(accumulator / SIMULATION_STEP_MS, 1.0)
+
             self.draw()
-            self.clock.tick(60) 
+            profiler.lap("dibujo")
+            self.clock.tick(self.fps_limit)
+            profiler.lap("espera")
+            profiler.end_frame()
+        self.profiler.close()
 
         pygame.quit()
\ No newline at end of file
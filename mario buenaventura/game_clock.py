@@ -0,0 +1,36 @@
+import random
+import pygame
+
+
+class GameClock:
+    """
+    Reloj y generador aleatorio del juego.
+    En tiempo real lee pygame.time.get_ticks(); en modo simulado avanza un paso fijo
+    en cada tick, de modo que una partida con la misma semilla se repite exactamente.
+    :param step_ms: Milisegundos por tick en modo simulado. Si es None, se usa tiempo real.
+    :param seed: Semilla del generador aleatorio. Si es None, se elige una y se guarda en self.seed.
+    """
+    def __init__(self, step_ms=None, seed=None):
+        self.step_ms = step_ms
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.sim_time = 0.0
+
+    @property
+    def simulated(self):
+        return self.step_ms is not None
+
+    def now(self):
+        """Tiempo actual del juego en milisegundos."""
+        if self.step_ms is None:
+            return pygame.time.get_ticks()
+        return int(self.sim_time)
+
+    def tick(self):
+        """Avanza un tick del reloj simulado. En tiempo real no hace nada."""
+        if self.step_ms is not None:
+            self.sim_time += self.step_ms
+
+    def advance(self, ms):
+        """Adelanta el reloj simulado una cantidad arbitraria de milisegundos."""
+        self.sim_time += ms
@@ -0,0 +1,53 @@
+import pygame
+from constants import *
+
+
+class HUD:
+    """
+    Marcador del jugador (vidas, monedas, puntos, tamaño e inmunidad) con caché.
+    Cada línea se vuelve a renderizar solo cuando cambia su valor, y las cinco se componen
+    en una única superficie, de modo que un frame normal cuesta un solo blit.
+    :param font: Fuente para el texto.
+    :param position: Esquina superior izquierda del marcador en la pantalla.
+    :param line_height: Separación vertical entre líneas.
+    """
+    LABELS = ("Vidas", "Monedas", "Puntos", "Tamaño", "Inmune")
+
+    def __init__(self, font, color=BLACK, position=(10, 10), line_height=20):
+        self.font = font
+        self.color = color
+        self.position = position
+        self.line_height = line_height
+        self.values = (None,) * len(self.LABELS)
+        self.lines = [None] * len(self.LABELS)
+        self.surface = None
+
+    def update(self, player):
+        """
+        Actualiza el marcador con los datos del jugador.
+        :return: True si algo cambió y la superficie se volvió a componer.
+        """
+        values = (player.vidas, player.monedas, player.puntos, player.tamaño, player.inmune)
+        if values == self.values:
+            return False
+
+        for i, (label, value, old_value) in enumerate(zip(self.LABELS, values, self.values)):
+            if value != old_value:
+                text = ("Sí" if value else "No") if label == "Inmune" else value
+                self.lines[i] = self.font.render(f"{label}: {text}", True, self.color)
+        self.values = values
+        self._compose()
+        return True
+
+    def _compose(self):
+        width = max(line.get_width() for line in self.lines)
+        height = self.line_height * (len(self.lines) - 1) + self.lines[-1].get_height()
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        for i, line in enumerate(self.lines):
+            # BLEND_RGBA_MAX copia el texto tal cual sobre la superficie transparente
+            self.surface.blit(line, (0, i * self.line_height), special_flags=pygame.BLEND_RGBA_MAX)
+
+    def draw(self, blit, player):
+        """Dibuja el marcador con la función de blit dada (la de la pantalla o la de rectángulos sucios)."""
+        self.update(player)
+        return blit(self.surface, self.position)
@@ -0,0 +1,39 @@
+import pygame
+from pygame.locals import *
+
+# Teclas que usa el juego; las demás se ignoran al leer la entrada
+TRACKED_KEYS = (K_LEFT, K_RIGHT, K_UP, K_DOWN, K_LSHIFT, K_RSHIFT, K_SPACE, K_r, K_F3, K_BACKSPACE)
+
+
+class FrameInput:
+    """
+    Entrada de un tick del juego.
+    :param held: Teclas mantenidas durante el tick (por ejemplo K_RIGHT).
+    :param events: Pulsaciones y liberaciones en orden, como tuplas (pulsada, tecla).
+    :param quit: True si se pidió cerrar la ventana.
+    """
+    def __init__(self, held=(), events=(), quit=False):
+        self.held = frozenset(held)
+        self.events = tuple(events)
+        self.quit = quit
+
+    def __repr__(self):
+        return f"FrameInput(held={sorted(self.held)}, events={list(self.events)}, quit={self.quit})"
+
+
+def read_frame_input():
+    """Lee la entrada real de Pygame (cola de eventos y teclado) y la convierte en un FrameInput."""
+    keys = pygame.key.get_pressed()
+    held = [key for key in TRACKED_KEYS if keys[key]]
+    events = []
+    quit = False
+
+    for event in pygame.event.get():
+        # Con texturas (render.py) hay una ventana oculta además de la del juego, y cerrar
+        # esta no genera QUIT
+        if event.type in (QUIT, WINDOWCLOSE):
+            quit = True
+        elif event.type in (KEYDOWN, KEYUP) and event.key in TRACKED_KEYS:
+            events.append((event.type == KEYDOWN, event.key))
+
+    return FrameInput(held, events, quit)
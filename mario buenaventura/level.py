@@ -0,0 +1,176 @@
+from collections import OrderedDict
+
+import pygame
+from constants import *
+
+# Caracteres del archivo de nivel y cómo se dibuja cada uno
+EMPTY_TILE = "."
+TILE_STYLES = {
+    "#": (BROWN, (101, 50, 14)),      # Suelo
+    "B": ((178, 34, 34), (120, 20, 20)), # Ladrillo
+    "?": (GOLD, (184, 134, 11)),      # Bloque de pregunta
+    "X": ((128, 128, 128), (80, 80, 80)), # Bloque sólido
+    "P": (GREEN, (0, 120, 0)),        # Tubería
+}
+COLORKEY = (255, 0, 255) # Color de los huecos vacíos en las superficies de los trozos
+FLOOR_Y = SCREEN_HEIGHT - GROUND_LEVEL_OFFSET # Suelo de la física de los personajes
+
+
+class Level:
+    """
+    Nivel de desplazamiento lateral hecho de casillas.
+    Todas las casillas son sólidas: collide() saca de ellas al jugador, que puede apoyarse
+    encima, darse con la cabeza o chocar de lado. La cámara la mueve el juego siguiendo al
+    jugador (ver Game.follow).
+    El mapa se divide en trozos de LEVEL_CHUNK_TILES columnas; cada trozo se dibuja una sola
+    vez en su propia superficie y se guarda en una caché LRU de como mucho LEVEL_CHUNK_CACHE
+    trozos. Al avanzar la cámara se dibujan los trozos visibles (dos o tres blits) y los que
+    quedan atrás salen de la caché, así que un nivel largo cuesta por frame y en memoria lo
+    mismo que uno corto. Al llegar al final, el nivel vuelve a empezar.
+    :param rows: Filas del mapa (cadenas de igual longitud); la última fila queda al pie de la pantalla.
+    """
+    def __init__(self, rows):
+        width = max(len(row) for row in rows)
+        self.rows = [row.ljust(width, EMPTY_TILE) for row in rows]
+        self.columns = width
+        self.chunk_width = LEVEL_CHUNK_TILES * TILE_SIZE
+        self.chunk_count = -(-width // LEVEL_CHUNK_TILES)
+        self.width = self.chunk_count * self.chunk_width
+
+        # Las superficies solo cubren desde la fila más alta que tiene algo hasta el suelo
+        filled = [i for i, row in enumerate(self.rows) if row.strip(EMPTY_TILE)]
+        self.top_row = filled[0] if filled else len(self.rows)
+        self.top = SCREEN_HEIGHT - (len(self.rows) - self.top_row) * TILE_SIZE
+        self.base = SCREEN_HEIGHT - len(self.rows) * TILE_SIZE # y de la primera fila
+        self.wrap_columns = self.chunk_count * LEVEL_CHUNK_TILES # Columnas hasta dar la vuelta
+
+        self.camera_x = 0.0
+        self.chunks = OrderedDict() # índice del trozo -> superficie, del menos al más usado
+        self.rendered = 0 # Trozos dibujados desde cero (fallos de la caché)
+        self.evicted = 0
+
+    @classmethod
+    def load(cls, path):
+        """Lee un nivel de un archivo de texto (las líneas que empiezan por ; son comentarios)."""
+        with open(path, encoding="utf-8") as f:
+            rows = [line.rstrip("\n") for line in f if not line.startswith(";")]
+        while rows and not rows[-1].strip():
+            rows.pop()
+        if not rows:
+            raise ValueError(f"El nivel {path} está vacío")
+        return cls(rows)
+
+    def reset(self):
+        self.camera_x = 0.0
+
+    def scroll(self, dx):
+        """Avanza la cámara dx píxeles, volviendo al principio al pasar el final."""
+        self.camera_x = (self.camera_x + dx) % self.width
+
+    def solid_tiles(self, rect):
+        """Rects en pantalla (con la cámara actual) de las casillas sólidas que toca rect."""
+        camera_x = int(self.camera_x)
+        first_row = max((rect.top - self.base) // TILE_SIZE, self.top_row)
+        last_row = min((rect.bottom - 1 - self.base) // TILE_SIZE, len(self.rows) - 1)
+        first_column = (rect.left + camera_x) // TILE_SIZE
+        last_column = (rect.right - 1 + camera_x) // TILE_SIZE
+        tiles = []
+        for row_index in range(first_row, last_row + 1):
+            row = self.rows[row_index]
+            for column in range(first_column, last_column + 1):
+                index = column % self.wrap_columns
+                if index < self.columns and row[index] != EMPTY_TILE:
+                    tiles.append(pygame.Rect(column * TILE_SIZE - camera_x, self.base + row_index * TILE_SIZE,
+                                             TILE_SIZE, TILE_SIZE))
+        return tiles
+
+    def collide(self, player):
+        """
+        Saca al jugador de las casillas sólidas en las que se metió en este tick, por donde
+        menos se metió: si caía sobre una, se apoya encima (su suelo_y pasa a ser esa casilla);
+        si subía, se da con la cabeza; si no, choca de lado. Si estaba apoyado en una casilla
+        y ya no tiene ninguna debajo, empieza a caer.
+        """
+        if not player.grounded:
+            player.suelo_y = FLOOR_Y
+        rect = player.rect
+        for tile in self.solid_tiles(rect):
+            if not rect.colliderect(tile):
+                continue # Ya lo sacó otra casilla
+            overlap_x = min(rect.right - tile.left, tile.right - rect.left)
+            overlap_y = min(rect.bottom - tile.top, tile.bottom - rect.top)
+            falling = player.velocidadY >= 0
+            if overlap_y <= overlap_x and (rect.centery < tile.centery) == falling:
+                if falling:
+                    rect.bottom = tile.top
+                    player.grounded = True
+                    player.is_jumping = False
+                    player.suelo_y = tile.top
+                else:
+                    rect.top = tile.bottom
+                player.velocidadY = 0
+                player.posicionY = rect.y
+            else:
+                if rect.centerx < tile.centerx:
+                    rect.right = tile.left
+                else:
+                    rect.left = tile.right
+                player.posicionX = rect.x
+
+        if player.grounded and player.suelo_y < FLOOR_Y and not self.solid_tiles(rect.move(0, 1)):
+            player.grounded = False
+            player.suelo_y = FLOOR_Y
+
+    def render_chunk(self, index):
+        """Dibuja un trozo del mapa en una superficie nueva."""
+        height = SCREEN_HEIGHT - self.top
+        surface = pygame.Surface((self.chunk_width, max(height, 1)))
+        surface.fill(COLORKEY)
+        first_column = index * LEVEL_CHUNK_TILES
+        for row_index in range(self.top_row, len(self.rows)):
+            row = self.rows[row_index][first_column:first_column + LEVEL_CHUNK_TILES]
+            y = (row_index - self.top_row) * TILE_SIZE
+            for column, tile in enumerate(row):
+                style = TILE_STYLES.get(tile)
+                if style is None:
+                    continue
+                rect = (column * TILE_SIZE, y, TILE_SIZE, TILE_SIZE)
+                surface.fill(style[0], rect)
+                pygame.draw.rect(surface, style[1], rect, 2)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.set_colorkey(COLORKEY, pygame.RLEACCEL)
+        return surface
+
+    def get_chunk(self, index):
+        """Superficie de un trozo, desde la caché o dibujándola (y expulsando la menos usada)."""
+        surface = self.chunks.get(index)
+        if surface is not None:
+            self.chunks.move_to_end(index)
+            return surface
+        surface = self.chunks[index] = self.render_chunk(index)
+        self.rendered += 1
+        if len(self.chunks) > LEVEL_CHUNK_CACHE:
+            self.chunks.popitem(last=False)
+            self.evicted += 1
+        return surface
+
+    def visible_chunks(self, camera_x=None):
+        """Pares (superficie, posición) de los trozos que se ven con la cámara actual (o con camera_x)."""
+        camera_x = int(self.camera_x if camera_x is None else camera_x)
+        first = camera_x // self.chunk_width
+        last = (camera_x + SCREEN_WIDTH - 1) // self.chunk_width
+        return [(self.get_chunk(i % self.chunk_count), (i * self.chunk_width - camera_x, self.top))
+                for i in range(first, last + 1)]
+
+    def draw(self, target, camera_x=None):
+        """Dibuja los trozos visibles en una superficie o en un renderizador de render.py."""
+        target.blits(self.visible_chunks(camera_x), doreturn=False)
+
+    def stats(self):
+        return {
+            "chunks": self.chunk_count,
+            "resident": len(self.chunks),
+            "rendered": self.rendered,
+            "evicted": self.evicted,
+        }
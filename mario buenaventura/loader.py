@@ -0,0 +1,69 @@
+import queue
+import threading
+
+
+class AssetLoader:
+    """
+    Carga de recursos en un hilo aparte.
+    El hilo ejecuta producer(), que va entregando (clave, valor, error) en el orden en que
+    conviene tenerlos (primero lo que necesita el menú). El hilo principal recoge los
+    resultados con poll() o wait() y termina de prepararlos con finish(clave, valor, error),
+    porque convertir superficies al formato de la pantalla debe hacerse en ese hilo.
+    :param producer: Generador que decodifica los recursos; no debe tocar la pantalla.
+    :param keys: Todas las claves que entregará producer (para medir el progreso).
+    :param finish: Función del hilo principal que recibe cada recurso ya decodificado.
+    """
+    def __init__(self, producer, keys, finish):
+        self.producer = producer
+        self.keys = tuple(keys)
+        self.finish = finish
+        self.done = set()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="AssetLoader", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        delivered = set()
+        try:
+            for key, value, error in self.producer():
+                delivered.add(key)
+                self.results.put((key, value, error))
+        except Exception as e:
+            # Un fallo inesperado no debe dejar al hilo principal esperando para siempre
+            for key in self.keys:
+                if key not in delivered:
+                    self.results.put((key, None, e))
+
+    def _finish_one(self, result):
+        key, value, error = result
+        if key in self.done:
+            return
+        self.done.add(key)
+        self.finish(key, value, error)
+
+    def poll(self):
+        """Prepara todo lo que el hilo ya terminó, sin esperar. Se llama una vez por frame."""
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                return
+            self._finish_one(result)
+
+    def wait(self, keys=None):
+        """Bloquea hasta tener preparados los recursos indicados (todos si keys es None)."""
+        needed = set(self.keys if keys is None else keys)
+        while not needed <= self.done:
+            self._finish_one(self.results.get())
+
+    def ready(self, keys):
+        return set(keys) <= self.done
+
+    @property
+    def progress(self):
+        """Fracción de recursos ya preparados (0 a 1)."""
+        return len(self.done) / len(self.keys) if self.keys else 1.0
+
+    @property
+    def finished(self):
+        return len(self.done) == len(self.keys)
@@ -1,7 +1,59 @@
-from game import Game
-import pygame
+import time
+START = time.perf_counter() # Inicio del arranque, antes de importar pygame
+import argparse
 
 if __name__ == "__main__":
-    game = Game()
+    parser = argparse.ArgumentParser(description="Super Mario en Buenaventura")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="Redibuja solo las zonas que cambian (equipos con poca CPU)")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Muestra el tiempo de cada fase del arranque hasta el primer frame")
+    parser.add_argument("--profile-out", metavar="ARCHIVO",
+                        help="Guarda el tiempo de cada fase de cada frame en un .csv o .jsonl (F3 muestra el gráfico)")
+    parser.add_argument("--alloc-report", action="store_true",
+                        help="Cuenta las asignaciones de memoria por fase y línea y las muestra al salir "
+                             "(el juego va mucho más lento; ver alloc_tracker.py)")
+    parser.add_argument("--record", metavar="ARCHIVO",
+                        help="Graba la entrada de la partida para reproducirla con replay.py")
+    parser.add_argument("--seed", type=int, help="Semilla del generador aleatorio")
+    parser.add_argument("--level", metavar="ARCHIVO",
+                        help="Nivel de casillas que se desplaza (por ejemplo levels/nivel1.txt)")
+    parser.add_argument("--fps", type=int, metavar="N",
+                        help="Frames dibujados por segundo como máximo (0: sin límite); la física va siempre a 60 pasos")
+    parser.add_argument("--renderer", choices=["direct", "scaled", "texture"], default="direct",
+                        help="Dibujo directo en la pantalla, en una superficie escalada a la ventana "
+                             "o con texturas de SDL2 (SDL_RENDER_DRIVER=software para no usar la GPU)")
+    parser.add_argument("--window-size", type=int, nargs=2, metavar=("ANCHO", "ALTO"),
+                        help="Tamaño inicial de la ventana con --renderer scaled o texture")
+    parser.add_argument("--rewind", action="store_true",
+                        help="Guarda los últimos segundos de la partida y mantener Retroceso los rebobina")
+    args = parser.parse_args()
+
+    # pygame y el juego se importan después de leer los argumentos (así --help es inmediato)
+    from startup import StartupProfiler
+    profiler = StartupProfiler(start=START, verbose=args.startup_profile)
+    import pygame
+    from game import Game
+    from constants import SIMULATION_STEP_MS
+    profiler.mark("importaciones")
+
+    # La física avanza en pasos fijos y el reloj del juego los cuenta: cualquier partida se puede grabar y repetir
+    game = Game(dirty_rects=args.dirty_rects, startup=profiler, profile_path=args.profile_out,
+                seed=args.seed, step_ms=SIMULATION_STEP_MS, level_path=args.level,
+                renderer=args.renderer, window_size=args.window_size, rewind=args.rewind)
+    if args.alloc_report:
+        from alloc_tracker import AllocationTracker
+        game.profiler.close()
+        game.profiler = AllocationTracker(args.profile_out)
+    if args.fps is not None:
+        game.fps_limit = args.fps
+    if args.record:
+        from replay import InputRecorder
+        game.recorder = InputRecorder(game.game_clock, rewind=game.rewind is not None)
     game.run()
-    pygame.quit() # Asegura que Pygame se cierre correctamente al finalizar el juegote
\ No newline at end of file
+    if args.record:
+        game.recorder.save(args.record, game)
+        print(f"Partida grabada en {args.record} ({game.recorder.count} ticks)")
+    if args.alloc_report:
+        game.profiler.report()
+    pygame.quit() # Asegura que Pygame se cierre correctamente al finalizar el juego
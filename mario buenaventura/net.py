@@ -0,0 +1,908 @@
+"""
+Multijugador en red local sobre UDP.
+
+El servidor es la autoridad: simula la partida con todos los jugadores (Game headless, con
+reloj de paso fijo) y cada NET_SNAPSHOT_INTERVAL ticks envía a cada cliente una instantánea
+cuantizada de jugadores, enemigos y objetos. Cada instantánea se codifica como diferencia
+respecto a la última que ese cliente confirmó: solo viajan los campos que cambiaron.
+
+El cliente es ligero: envía su entrada de cada tick (repitiendo las que aún no se confirmaron,
+por si se pierden), predice su propio jugador con la misma física que el servidor y lo corrige
+al llegar cada instantánea, y dibuja a los demás interpolando entre instantáneas con
+NET_INTERP_DELAY_MS de retraso.
+
+Uso (desde la carpeta del juego):
+    python net.py server [--port 5555]
+    python net.py client 192.168.1.10[:5555]
+    python net.py loopback --clients 2 --latency 50 --jitter 10 --loss 0.05 --seconds 20
+"""
+import argparse
+import heapq
+import math
+import random
+import socket
+import struct
+import sys
+import time
+from collections import deque
+
+from pygame.locals import K_r
+
+from constants import *
+from character import Jugador, Goomba
+from powerup import Hongo, Moneda, Estrella
+from inputs import FrameInput, read_frame_input, TRACKED_KEYS
+from replay import encode_input, decode_inputs
+
+PROTOCOL_VERSION = 2 # 2: Retroceso en TRACKED_KEYS (cambian la máscara y los códigos de evento)
+MAX_PACKET = 1400
+MSG_HELLO, MSG_WELCOME, MSG_INPUT, MSG_SNAPSHOT, MSG_BYE = range(1, 6)
+
+HELLO = struct.Struct("<BB")               # tipo, versión del protocolo
+WELCOME = struct.Struct("<BBI")            # tipo, id del jugador, tick del servidor
+BYE = struct.Struct("<B")
+INPUT_HEADER = struct.Struct("<BIIB")      # tipo, última instantánea recibida, primera secuencia, entradas
+SNAPSHOT_HEADER = struct.Struct("<BIIIB")  # tipo, tick, tick base (0: completa), última entrada aplicada, estado
+COUNT = struct.Struct("<H")
+
+STATUS_RUNNING = 1
+STATUS_GAME_OVER = 2
+
+# Cuantización: posiciones en cuartos de píxel y velocidades en 1/64 de píxel por tick (int16)
+POSITION_SCALE = 4
+VELOCITY_SCALE = 64
+
+# Banderas de un jugador: un bit por atributo, más dirección, tamaño y si está muerto
+PLAYER_FLAGS = ("grounded", "is_jumping", "jump_key_held", "is_running", "is_ducking", "is_moving", "inmune")
+FLAG_LEFT = 1 << 7
+FLAG_BIG = 1 << 8
+FLAG_DEAD = 1 << 9
+
+ENTITY_KINDS = ("hongo_crecimiento", "hongo_vida", "moneda", "estrella", "goomba")
+KIND_INDEX = {name: index for index, name in enumerate(ENTITY_KINDS)}
+
+INPUT_BACKLOG = 2 # Entradas en cola a partir de las cuales el servidor aplica más de una por tick
+
+
+class RecordFormat:
+    """
+    Codificación de un tipo de registro (jugadores o entidades) en una instantánea.
+    Cada registro es una clave, una máscara con un bit por campo y solo los campos cuyo bit
+    está activo. Contra una base, solo se envían los registros y campos que cambiaron, y al
+    final las claves que desaparecieron.
+    :param key_format: Formato struct de la clave.
+    :param field_formats: Formato struct de cada campo, en orden.
+    """
+    def __init__(self, key_format, field_formats):
+        self.header = struct.Struct("<" + key_format + "B")
+        self.key = struct.Struct("<" + key_format)
+        self.fields = [struct.Struct("<" + field) for field in field_formats]
+        self.empty = (0,) * len(field_formats)
+
+    def encode(self, out, current, baseline):
+        changed = []
+        for key, values in current.items():
+            old = baseline.get(key)
+            mask = 0
+            for i, value in enumerate(values):
+                if old is None or old[i] != value:
+                    mask |= 1 << i
+            if mask:
+                changed.append((key, mask, values))
+
+        out += COUNT.pack(len(changed))
+        for key, mask, values in changed:
+            out += self.header.pack(key, mask)
+            for i, field in enumerate(self.fields):
+                if mask & (1 << i):
+                    out += field.pack(values[i])
+        removed = [key for key in baseline if key not in current]
+        out += COUNT.pack(len(removed))
+        for key in removed:
+            out += self.key.pack(key)
+
+    def decode(self, data, offset, baseline):
+        """:return: (estado reconstruido, posición tras los registros)."""
+        state = dict(baseline)
+        (count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        for _ in range(count):
+            key, mask = self.header.unpack_from(data, offset)
+            offset += self.header.size
+            values = list(state.get(key, self.empty))
+            for i, field in enumerate(self.fields):
+                if mask & (1 << i):
+                    (values[i],) = field.unpack_from(data, offset)
+                    offset += field.size
+            state[key] = tuple(values)
+        (count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        for _ in range(count):
+            (key,) = self.key.unpack_from(data, offset)
+            offset += self.key.size
+            state.pop(key, None)
+        return state, offset
+
+
+PLAYER_RECORD = RecordFormat("B", "hhhHBBI") # x, y, velocidad Y, banderas, vidas, monedas, puntos
+ENTITY_RECORD = RecordFormat("H", "Bhh")     # tipo, x, y
+EMPTY_STATE = ({}, {})
+
+
+def quantize(value, scale):
+    return max(-32768, min(32767, round(value * scale)))
+
+
+def player_record(player):
+    flags = 0
+    for bit, name in enumerate(PLAYER_FLAGS):
+        if getattr(player, name):
+            flags |= 1 << bit
+    if player.direccion == "left":
+        flags |= FLAG_LEFT
+    if player.tamaño == "grande":
+        flags |= FLAG_BIG
+    if player.estado == "Muerto":
+        flags |= FLAG_DEAD
+    return (quantize(player.posicionX, POSITION_SCALE), quantize(player.posicionY, POSITION_SCALE),
+            quantize(player.velocidadY, VELOCITY_SCALE), flags,
+            max(0, min(player.vidas, 255)), min(player.monedas, 255), player.puntos & 0xFFFFFFFF)
+
+
+def apply_player_record(player, values):
+    """Copia en un jugador el estado de un registro (al corregir la predicción o al dibujar a otros)."""
+    x, y, velocidad_y, flags, vidas, monedas, puntos = values
+    player.posicionX = x / POSITION_SCALE
+    player.posicionY = y / POSITION_SCALE
+    player.velocidadY = velocidad_y / VELOCITY_SCALE
+    for bit, name in enumerate(PLAYER_FLAGS):
+        setattr(player, name, bool(flags & (1 << bit)))
+    player.direccion = "left" if flags & FLAG_LEFT else "right"
+    player.tamaño = "grande" if flags & FLAG_BIG else "normal"
+    player.estado = "Muerto" if flags & FLAG_DEAD else "Vivo"
+    player.vidas, player.monedas, player.puntos = vidas, monedas, puntos
+    player.set_current_animation_frame()
+
+
+def capture_state(game):
+    """Estado cuantizado de la partida: ({id de jugador: registro}, {serie de entidad: registro})."""
+    if game.entity_store is not None:
+        game.entity_store.sync()
+    players = {player.id: player_record(player) for player in game.players}
+    entities = {}
+    for hongo in game.poderes_activos:
+        entities[hongo.serial] = (KIND_INDEX["hongo_" + hongo.tipo], quantize(hongo.posicionX, POSITION_SCALE),
+                                  quantize(hongo.posicionY, POSITION_SCALE))
+    for kind, group in (("moneda", game.monedas_activas), ("goomba", game.enemigos_activos),
+                        ("estrella", [game.estrella_activa] if game.estrella_activa else [])):
+        for entity in group:
+            entities[entity.serial] = (KIND_INDEX[kind], quantize(entity.posicionX, POSITION_SCALE),
+                                       quantize(entity.posicionY, POSITION_SCALE))
+    return players, entities
+
+
+def encode_snapshot(tick, baseline_tick, ack_seq, status, state, baseline):
+    out = bytearray(SNAPSHOT_HEADER.pack(MSG_SNAPSHOT, tick, baseline_tick, ack_seq, status))
+    PLAYER_RECORD.encode(out, state[0], baseline[0])
+    ENTITY_RECORD.encode(out, state[1], baseline[1])
+    return bytes(out)
+
+
+def decode_snapshot(data, baselines):
+    """
+    :param baselines: Instantáneas ya recibidas, por tick.
+    :return: (tick, última entrada aplicada, estado de la partida, estado) o None si falta la base.
+    Si el paquete está cortado o nombra un tipo de entidad que no existe, ValueError.
+    """
+    try:
+        _, tick, baseline_tick, ack_seq, status = SNAPSHOT_HEADER.unpack_from(data)
+        baseline = EMPTY_STATE if baseline_tick == 0 else baselines.get(baseline_tick)
+        if baseline is None:
+            return None
+        players, offset = PLAYER_RECORD.decode(data, SNAPSHOT_HEADER.size, baseline[0])
+        entities, _ = ENTITY_RECORD.decode(data, offset, baseline[1])
+    except struct.error as e:
+        raise ValueError("Instantánea cortada") from e
+    if any(record[0] >= len(ENTITY_KINDS) for record in entities.values()):
+        raise ValueError("Instantánea con un tipo de entidad desconocido")
+    return tick, ack_seq, status, (players, entities)
+
+
+def interpolate(a, b, t, x_index):
+    """Registro a desplazado una fracción t hacia b (solo la posición; el resto es el de a)."""
+    if b is None or t <= 0:
+        return a
+    values = list(a)
+    for i in (x_index, x_index + 1):
+        values[i] = round(a[i] + (b[i] - a[i]) * t)
+    return tuple(values)
+
+
+def wall_clock_ms():
+    return time.perf_counter() * 1000
+
+
+class VirtualClock:
+    """Reloj que solo avanza cuando se le pide: la prueba en loopback corre sin esperar."""
+    def __init__(self):
+        self.ms = 0.0
+
+    def __call__(self):
+        return self.ms
+
+    def advance(self, ms):
+        self.ms += ms
+
+
+class Link:
+    """
+    Envía paquetes por un socket UDP, opcionalmente simulando una red peor: retrasa cada
+    paquete latency_ms (± jitter_ms, así que pueden llegar desordenados) y descarta una
+    fracción loss de ellos. Sin parámetros, envía directamente.
+    """
+    def __init__(self, sock, clock, latency_ms=0, jitter_ms=0, loss=0.0, seed=0):
+        self.sock = sock
+        self.clock = clock
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.queue = [] # Montículo de (momento de envío, orden, datos, dirección)
+        self.counter = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def sendto(self, data, address):
+        self.sent += 1
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        if not self.latency_ms and not self.jitter_ms:
+            self.sock.sendto(data, address)
+            return
+        delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms))
+        heapq.heappush(self.queue, (self.clock() + delay, self.counter, data, address))
+        self.counter += 1
+
+    def flush(self):
+        """Envía los paquetes retrasados cuyo momento ya llegó."""
+        now = self.clock()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, data, address = heapq.heappop(self.queue)
+            self.sock.sendto(data, address)
+
+
+def open_socket(address):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(address)
+    sock.setblocking(False)
+    return sock
+
+
+def receive_all(sock):
+    """Todos los paquetes que esperan en el socket, sin bloquear."""
+    packets = []
+    while True:
+        try:
+            packets.append(sock.recvfrom(MAX_PACKET))
+        except BlockingIOError:
+            break
+        except ConnectionResetError:
+            continue # Windows avisa así de un paquete anterior que no se pudo entregar
+    return packets
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ClientSlot:
+    """Lo que el servidor sabe de un cliente conectado."""
+    def __init__(self, address, player, now):
+        self.address = address
+        self.player = player
+        self.inputs = {}       # secuencia -> FrameInput recibido y aún sin aplicar
+        self.next_seq = None   # Siguiente entrada que toca aplicar
+        self.repeat = FrameInput() # Lo que se aplica si la entrada del tick aún no llegó
+        self.ack_tick = 0      # Última instantánea que el cliente confirmó (base de las diferencias)
+        self.joined = self.last_heard = now
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.snapshots = 0
+        self.full_snapshots = 0
+        self.full_bytes = 0    # Lo que habrían ocupado las instantáneas sin diferencias
+
+
+class NetServer:
+    """
+    Servidor autoritativo: simula la partida y envía instantáneas a cada cliente.
+    :param address: Dirección (host, puerto) donde escuchar.
+    :param seed: Semilla de la partida.
+    :param clock: Función que devuelve el tiempo en milisegundos.
+    :param shim: Parámetros de Link para simular latencia y pérdida (opcional).
+    """
+    def __init__(self, address=("0.0.0.0", NET_PORT), seed=None, clock=wall_clock_ms, shim=None):
+        from game import Game
+
+        self.game = Game(headless=True, seed=seed, step_ms=SIMULATION_STEP_MS)
+        self.game.start_game(local_player=False)
+        self.clock = clock
+        self.sock = open_socket(address)
+        self.link = Link(self.sock, clock, **(shim or {}))
+        self.clients = {} # dirección -> ClientSlot
+        self.tick_count = 0
+        self.history = {} # tick -> estado enviado, base de las diferencias
+        self.departed = [] # ClientSlot de los que se fueron, para el informe
+        self.malformed = 0 # Paquetes de entrada mal formados que se descartaron
+
+    @property
+    def address(self):
+        return self.sock.getsockname()
+
+    def new_player(self, player_id):
+        game = self.game
+        x = SCREEN_WIDTH // 4 + (player_id - 1) * 40 % (SCREEN_WIDTH // 2)
+        player = Jugador(player_id, f"Mario {player_id}", x, game.floor_y - PLAYER_NORMAL_SIZE[1],
+                         clock=game.game_clock, scheduler=game.scheduler)
+        game.add_player(player)
+        player.set_current_animation_frame()
+        return player
+
+    def join(self, address, now):
+        used = {client.player.id for client in self.clients.values()}
+        player_id = next((i for i in range(1, 256) if i not in used), None)
+        if player_id is None:
+            return None
+        client = self.clients[address] = ClientSlot(address, self.new_player(player_id), now)
+        print(f"Jugador {player_id} conectado desde {address[0]}:{address[1]}")
+        return client
+
+    def leave(self, client):
+        game = self.game
+        player = client.player
+        timer = game.immunity_timers.pop(player.id, None)
+        if timer is not None:
+            timer.cancel()
+        if player.run_timer is not None:
+            player.run_timer.cancel()
+        if player in game.players:
+            game.players.remove(player)
+            game.refresh_broadphase()
+        del self.clients[client.address]
+        self.departed.append(client)
+        print(f"Jugador {player.id} desconectado")
+
+    def restart(self):
+        """Nueva partida con los mismos clientes (cuando alguien pulsa R tras el game over)."""
+        self.game.start_game(local_player=False)
+        for client in self.clients.values():
+            client.player = self.new_player(client.player.id)
+
+    def receive(self):
+        now = self.clock()
+        for data, address in receive_all(self.sock):
+            if not data:
+                continue
+            client = self.clients.get(address)
+            if data[0] == MSG_HELLO:
+                if len(data) < HELLO.size or HELLO.unpack_from(data)[1] != PROTOCOL_VERSION:
+                    continue
+                if client is None:
+                    client = self.join(address, now)
+                    if client is None:
+                        continue
+                # Se responde a cada saludo por si la bienvenida anterior se perdió
+                self.send(client, WELCOME.pack(MSG_WELCOME, client.player.id, self.tick_count))
+            if client is None:
+                continue
+            client.last_heard = now
+            client.bytes_received += len(data)
+            if data[0] == MSG_INPUT:
+                self.receive_input(client, data)
+            elif data[0] == MSG_BYE:
+                self.leave(client)
+
+        for client in list(self.clients.values()):
+            if now - client.last_heard > NET_TIMEOUT_MS:
+                self.leave(client)
+
+    def receive_input(self, client, data):
+        # Un paquete cortado o basura se descarta: no puede tumbar la partida de los demás
+        if len(data) < INPUT_HEADER.size:
+            self.malformed += 1
+            return
+        _, ack_tick, first_seq, count = INPUT_HEADER.unpack_from(data)
+        if count > NET_INPUT_REDUNDANCY:
+            self.malformed += 1
+            return
+        try:
+            inputs = decode_inputs(data[INPUT_HEADER.size:], count)
+        except ValueError:
+            self.malformed += 1
+            return
+        client.ack_tick = max(client.ack_tick, ack_tick)
+        if client.next_seq is None:
+            client.next_seq = first_seq
+        for offset, frame_input in enumerate(inputs):
+            if first_seq + offset >= client.next_seq:
+                client.inputs.setdefault(first_seq + offset, frame_input)
+
+    def next_input(self, client):
+        """Siguiente entrada del cliente, o la repetición de sus teclas si aún no llegó."""
+        if client.next_seq not in client.inputs and client.inputs and min(client.inputs) > client.next_seq:
+            # Cada paquete repite todas las entradas sin confirmar: si falta una, ya no llegará
+            client.next_seq = min(client.inputs)
+        frame_input = client.inputs.pop(client.next_seq, None)
+        if frame_input is None:
+            return None
+        client.next_seq += 1
+        client.repeat = FrameInput(frame_input.held) if frame_input.events else frame_input
+        return frame_input
+
+    def apply_inputs(self):
+        game = self.game
+        for client in list(self.clients.values()):
+            frame_input = self.next_input(client)
+            applied = [frame_input if frame_input is not None else client.repeat]
+            # Si las entradas se acumulan (el cliente va por delante), se aplican de más en este tick
+            while len(client.inputs) > INPUT_BACKLOG and frame_input is not None:
+                frame_input = self.next_input(client)
+                if frame_input is not None:
+                    applied.append(frame_input)
+            for frame_input in applied:
+                if game.game_over and (True, K_r) in frame_input.events:
+                    self.restart()
+                game.apply_player_input(client.player, frame_input)
+
+    def tick(self):
+        """Un tick del servidor: recibir, aplicar entradas, simular y, si toca, enviar instantáneas."""
+        self.receive()
+        self.apply_inputs()
+        self.game.update()
+        self.tick_count += 1
+        if self.tick_count % NET_SNAPSHOT_INTERVAL == 0:
+            self.send_snapshots()
+        self.link.flush()
+
+    def send(self, client, data):
+        self.link.sendto(data, client.address)
+        client.bytes_sent += len(data)
+
+    def send_snapshots(self):
+        game = self.game
+        tick = self.tick_count
+        state = self.history[tick] = capture_state(game)
+        cutoff = tick - NET_HISTORY
+        while next(iter(self.history)) < cutoff:
+            del self.history[next(iter(self.history))]
+
+        status = (STATUS_RUNNING if game.game_running else 0) | (STATUS_GAME_OVER if game.game_over else 0)
+        full_size = None
+        for client in self.clients.values():
+            ack_seq = client.next_seq - 1 if client.next_seq is not None else 0
+            baseline = self.history.get(client.ack_tick) if client.ack_tick else None
+            data = encode_snapshot(tick, client.ack_tick if baseline else 0, ack_seq, status,
+                                   state, baseline or EMPTY_STATE)
+            if baseline is None:
+                client.full_snapshots += 1
+                full_size = len(data)
+            elif full_size is None:
+                full_size = len(encode_snapshot(tick, 0, ack_seq, status, state, EMPTY_STATE))
+            client.full_bytes += full_size
+            client.snapshots += 1
+            self.send(client, data)
+
+    def client_stats(self, client):
+        """Ancho de banda y compresión de un cliente."""
+        seconds = max(self.clock() - client.joined, 1) / 1000
+        return {
+            "id": client.player.id,
+            "bajada_kBps": client.bytes_sent / seconds / 1024,
+            "subida_kBps": client.bytes_received / seconds / 1024,
+            "instantaneas": client.snapshots,
+            "completas": client.full_snapshots,
+            "compresion": client.bytes_sent / client.full_bytes if client.full_bytes else 1.0,
+        }
+
+    def serve_forever(self, report_every_s=10):
+        """Bucle en tiempo real a 60 ticks por segundo, con un informe cada report_every_s segundos."""
+        next_tick = next_report = self.clock()
+        print(f"Servidor escuchando en {self.address[0]}:{self.address[1]}")
+        while True:
+            self.tick()
+            next_tick += SIMULATION_STEP_MS
+            now = self.clock()
+            if next_tick > now:
+                time.sleep((next_tick - now) / 1000)
+            elif now - next_tick > 250:
+                next_tick = now # Muy atrasado: no intentar recuperar los ticks perdidos
+            if report_every_s and now >= next_report + report_every_s * 1000:
+                next_report = now
+                for client in self.clients.values():
+                    stats = self.client_stats(client)
+                    print(f"Jugador {stats['id']}: bajada {stats['bajada_kBps']:.2f} kB/s, "
+                          f"subida {stats['subida_kBps']:.2f} kB/s, compresión {stats['compresion']:.0%}")
+
+
+class NetClient:
+    """
+    Cliente ligero: envía la entrada, predice su jugador y dibuja el resto interpolado.
+    :param server_address: Dirección (host, puerto) del servidor.
+    :param clock: Función que devuelve el tiempo en milisegundos.
+    :param shim: Parámetros de Link para simular latencia y pérdida (opcional).
+    :param headless: Sin ventana (pruebas en loopback).
+    """
+    HELLO_RETRY_MS = 500
+
+    def __init__(self, server_address, clock=wall_clock_ms, shim=None, headless=False):
+        from game import Game
+
+        self.game = Game(headless=headless, step_ms=SIMULATION_STEP_MS)
+        self.game.asset_loader.wait(IMG_PATHS)
+        self.game.in_menu = False
+        self.server_address = (socket.gethostbyname(server_address[0]), server_address[1])
+        self.clock = clock
+        self.sock = open_socket(("0.0.0.0", 0))
+        self.link = Link(self.sock, clock, **(shim or {}))
+        self.interp_ticks = max(1, round(NET_INTERP_DELAY_MS / SIMULATION_STEP_MS))
+
+        self.player_id = None
+        self.player = None
+        self.next_seq = 1
+        self.pending = deque() # (secuencia, FrameInput, momento de envío, bytes) sin confirmar
+        self.snapshots = {}    # tick -> estado recibido (bases de las diferencias e interpolación)
+        self.latest_tick = 0
+        self.render_tick = None
+        self.remote_players = {} # id -> Jugador dibujado con el estado interpolado
+        self.entities = {}       # serie -> (tipo, entidad dibujada)
+        self.last_hello = -math.inf
+
+        # Estadísticas
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.snapshot_count = 0
+        self.malformed = 0 # Paquetes del servidor mal formados que se descartaron
+        self.confirm_latency = []  # ms desde que se envía una entrada hasta que el servidor la confirma
+        self.visible_latency = []  # ms hasta que su efecto aparece en la vista interpolada
+        self.corrections = []      # Píxeles que se movió el jugador predicho al corregirlo
+        self.awaiting_visible = deque() # (tick del servidor, momento de envío)
+
+    def send(self, data):
+        self.link.sendto(data, self.server_address)
+        self.bytes_sent += len(data)
+
+    def tick(self, frame_input):
+        """Un tick del cliente con la entrada dada."""
+        now = self.clock()
+        self.receive(now)
+        if self.player is None:
+            if now - self.last_hello >= self.HELLO_RETRY_MS:
+                self.send(HELLO.pack(MSG_HELLO, PROTOCOL_VERSION))
+                self.last_hello = now
+            self.link.flush()
+            return
+
+        # Predicción: la entrada se aplica ya al jugador local, sin esperar al servidor
+        seq = self.next_seq
+        self.next_seq += 1
+        self.pending.append((seq, frame_input, now, encode_input(frame_input)))
+        self.predict(frame_input)
+
+        unconfirmed = list(self.pending)[-NET_INPUT_REDUNDANCY:]
+        self.send(INPUT_HEADER.pack(MSG_INPUT, self.latest_tick, unconfirmed[0][0], len(unconfirmed)) +
+                  b"".join(entry[3] for entry in unconfirmed))
+
+        game = self.game
+        game.game_clock.tick()
+        game.scheduler.run_due()
+        self.advance_view(now)
+        self.link.flush()
+
+    def predict(self, frame_input):
+        game = self.game
+        game.apply_player_input(self.player, frame_input)
+        if self.player.estado != "Muerto":
+            game.step_player(self.player)
+
+    def receive(self, now):
+        for data, address in receive_all(self.sock):
+            if address != self.server_address or not data:
+                continue
+            self.bytes_received += len(data)
+            if data[0] == MSG_WELCOME and self.player is None:
+                if len(data) < WELCOME.size:
+                    self.malformed += 1
+                    continue
+                _, player_id, _ = WELCOME.unpack_from(data)
+                self.join(player_id)
+            elif data[0] == MSG_SNAPSHOT and self.player is not None:
+                self.receive_snapshot(data, now)
+
+    def join(self, player_id):
+        game = self.game
+        self.player_id = player_id
+        self.player = Jugador(player_id, "Mario", SCREEN_WIDTH // 4, game.floor_y - PLAYER_NORMAL_SIZE[1],
+                              clock=game.game_clock, scheduler=game.scheduler)
+        self.player.load_player_images(game.imgs)
+        game.players.append(self.player)
+        game.current_player = self.player
+        game.game_running = True
+
+    def receive_snapshot(self, data, now):
+        # Como en NetServer.receive_input: un paquete cortado o basura se descarta
+        if len(data) < SNAPSHOT_HEADER.size:
+            self.malformed += 1
+            return
+        if SNAPSHOT_HEADER.unpack_from(data)[1] <= self.latest_tick:
+            return # Repetida o más vieja que la última (llegó desordenada)
+        try:
+            decoded = decode_snapshot(data, self.snapshots)
+        except ValueError:
+            self.malformed += 1
+            return
+        if decoded is None:
+            return # Falta la base; el servidor mandará una completa si no confirmamos nada
+        tick, ack_seq, status, state = decoded
+        self.snapshots[tick] = state
+        while next(iter(self.snapshots)) < tick - NET_HISTORY:
+            del self.snapshots[next(iter(self.snapshots))]
+        self.latest_tick = tick
+        self.snapshot_count += 1
+
+        game = self.game
+        game.game_running = bool(status & STATUS_RUNNING)
+        game.game_over = bool(status & STATUS_GAME_OVER)
+        self.reconcile(tick, ack_seq, state, now)
+
+    def reconcile(self, tick, ack_seq, state, now):
+        """Corrige el jugador predicho con el del servidor y vuelve a aplicar las entradas sin confirmar."""
+        while self.pending and self.pending[0][0] <= ack_seq:
+            _, _, sent, _ = self.pending.popleft()
+            self.confirm_latency.append(now - sent)
+            self.awaiting_visible.append((tick, sent))
+
+        record = state[0].get(self.player_id)
+        if record is None:
+            return
+        player = self.player
+        predicted = (player.posicionX, player.posicionY)
+        apply_player_record(player, record)
+        for _, frame_input, _, _ in self.pending:
+            self.predict(frame_input)
+        self.corrections.append(math.hypot(player.posicionX - predicted[0], player.posicionY - predicted[1]))
+
+    def advance_view(self, now):
+        """Avanza un tick la vista interpolada de los demás jugadores y las entidades."""
+        if not self.snapshots:
+            return
+        target = self.latest_tick - self.interp_ticks
+        if self.render_tick is None or self.render_tick < target - self.interp_ticks:
+            self.render_tick = target # Al empezar, o si se quedó muy atrás, se salta al retraso previsto
+        else:
+            self.render_tick = min(self.render_tick + 1, self.latest_tick)
+
+        # Instantáneas a ambos lados del tick que se dibuja
+        before = after = None
+        for tick in self.snapshots:
+            if tick <= self.render_tick:
+                before = tick
+            else:
+                after = tick
+                break
+        if before is None:
+            before, after = after, None
+        players, entities = self.snapshots[before]
+        next_players, next_entities = self.snapshots[after] if after is not None else EMPTY_STATE
+        t = (self.render_tick - before) / (after - before) if after is not None else 0.0
+
+        self.update_remote_players({player_id: interpolate(values, next_players.get(player_id), t, 0)
+                                    for player_id, values in players.items() if player_id != self.player_id})
+        self.update_entities({serial: interpolate(values, next_entities.get(serial), t, 1)
+                              for serial, values in entities.items()})
+
+        while self.awaiting_visible and self.awaiting_visible[0][0] <= self.render_tick:
+            _, sent = self.awaiting_visible.popleft()
+            self.visible_latency.append(now - sent)
+
+    def update_remote_players(self, records):
+        game = self.game
+        for player_id, values in records.items():
+            player = self.remote_players.get(player_id)
+            if player is None:
+                player = self.remote_players[player_id] = Jugador(
+                    player_id, f"Mario {player_id}", 0, 0, clock=game.game_clock, scheduler=game.scheduler)
+                player.load_player_images(game.imgs)
+                game.players.append(player)
+            apply_player_record(player, values)
+        for player_id in [player_id for player_id in self.remote_players if player_id not in records]:
+            player = self.remote_players.pop(player_id)
+            if player.run_timer is not None:
+                player.run_timer.cancel()
+            game.players.remove(player)
+
+    def update_entities(self, records):
+        for serial, values in records.items():
+            kind, x, y = values
+            entry = self.entities.get(serial)
+            if entry is None or entry[0] != kind:
+                if entry is not None:
+                    self.remove_entity(entry)
+                entry = self.entities[serial] = (kind, self.spawn_entity(kind))
+            entity = entry[1]
+            entity.posicionX = x / POSITION_SCALE
+            entity.posicionY = y / POSITION_SCALE
+            entity.rect.x = entity.posicionX
+            entity.rect.y = entity.posicionY
+        for serial in [serial for serial in self.entities if serial not in records]:
+            self.remove_entity(self.entities.pop(serial))
+
+    def spawn_entity(self, kind):
+        """Entidad que solo se dibuja, sacada de los pools del juego."""
+        game = self.game
+        name = ENTITY_KINDS[kind]
+        if name.startswith("hongo"):
+            entity = game.spawn_entity(Hongo, 0, 0, 0, tipo=name.split("_")[1], image=game.imgs[name])
+            game.poderes_activos.append(entity)
+        elif name == "moneda":
+            entity = game.spawn_entity(Moneda, 0, 0, 0)
+            game.monedas_activas.append(entity)
+        elif name == "estrella":
+            entity = game.estrella_activa = game.spawn_entity(Estrella, 1, 0, 0)
+        else:
+            entity = game.spawn_entity(Goomba, 0, 0, 0, velocidad_x=0)
+            game.enemigos_activos.append(entity)
+        return entity
+
+    def remove_entity(self, entry):
+        kind, entity = entry
+        game = self.game
+        name = ENTITY_KINDS[kind]
+        if name == "estrella":
+            if game.estrella_activa is entity:
+                game.estrella_activa = None
+        else:
+            group = (game.poderes_activos if name.startswith("hongo") else
+                     game.monedas_activas if name == "moneda" else game.enemigos_activos)
+            group.remove(entity)
+        game.release_entity(entity)
+
+    def render(self):
+        self.game.draw()
+
+    def close(self):
+        if self.player is not None:
+            self.send(BYE.pack(MSG_BYE))
+            self.link.flush()
+        self.sock.close()
+
+    def run(self):
+        """Bucle con ventana a 60 frames por segundo hasta cerrar la ventana."""
+        running = True
+        while running:
+            frame_input = read_frame_input()
+            running = not frame_input.quit
+            self.tick(frame_input)
+            self.render()
+            self.game.clock.tick(60)
+        self.close()
+
+
+def run_loopback(args):
+    """
+    Servidor y clientes en el mismo proceso, por sockets UDP en 127.0.0.1, con un reloj virtual
+    y la red simulada por Link. Los clientes juegan con la política aleatoria de batch.py.
+    """
+    from batch import RandomPolicy
+
+    clock = VirtualClock()
+    shim = {"latency_ms": args.latency, "jitter_ms": args.jitter, "loss": args.loss}
+    server = NetServer(("127.0.0.1", 0), seed=args.seed, clock=clock, shim=dict(shim, seed=args.seed))
+    clients = [NetClient(server.address, clock=clock, shim=dict(shim, seed=args.seed + i + 1), headless=True)
+               for i in range(args.clients)]
+    policies = [RandomPolicy(args.seed + i) for i in range(args.clients)]
+    restart = FrameInput(events=[(True, K_r)])
+    malformed = (bytes((MSG_INPUT, 0, 0)),
+                 INPUT_HEADER.pack(MSG_INPUT, 0, 0, 255),
+                 INPUT_HEADER.pack(MSG_INPUT, 0, 0, 1) + bytes((0, 0, 1, len(TRACKED_KEYS))),
+                 INPUT_HEADER.pack(MSG_INPUT, 0, 0, 2) + bytes((0, 0, 0)))
+    # Y al revés: instantáneas cortadas o con un tipo de entidad que no existe, para los clientes
+    unknown_kind = bytearray(SNAPSHOT_HEADER.pack(MSG_SNAPSHOT, 0xFFFFFFFF, 0, 0, STATUS_RUNNING))
+    PLAYER_RECORD.encode(unknown_kind, {}, {})
+    ENTITY_RECORD.encode(unknown_kind, {1: (len(ENTITY_KINDS), 0, 0)}, {})
+    bad_snapshots = (bytes((MSG_SNAPSHOT, 0, 0)), bytes(unknown_kind[:-3]), bytes(unknown_kind))
+
+    start = time.perf_counter()
+    ticks = int(args.seconds * 1000 / SIMULATION_STEP_MS)
+    ticks_before = 0
+    snapshots_before = [0] * len(clients)
+    for tick in range(ticks):
+        for client, policy in zip(clients, policies):
+            # Al terminar la partida, los jugadores de prueba piden otra
+            client.tick(restart if client.game.game_over else policy(tick))
+            if args.draw:
+                client.render()
+        if tick == ticks // 2:
+            # Paquetes mal formados (cortados, con demasiadas entradas o una tecla que no existe):
+            # el servidor y los clientes deben descartarlos y seguir
+            for client in clients:
+                for data in malformed:
+                    client.sock.sendto(data, server.address)
+                for data in bad_snapshots:
+                    server.sock.sendto(data, ("127.0.0.1", client.sock.getsockname()[1]))
+            ticks_before = server.tick_count
+            snapshots_before = [client.snapshot_count for client in clients]
+        server.tick()
+        clock.advance(SIMULATION_STEP_MS)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.clients} clientes, {args.seconds:g} s de juego en {elapsed:.1f} s | latencia {args.latency:g} ms "
+          f"± {args.jitter:g} en cada sentido, pérdida {args.loss:.0%}")
+    print(f"Servidor: {server.tick_count} ticks, {server.link.dropped} de {server.link.sent} paquetes perdidos, "
+          f"{server.malformed} de {len(malformed) * len(clients)} mal formados descartados "
+          f"(siguió {server.tick_count - ticks_before} ticks después)")
+    for client, received_before in zip(clients, snapshots_before):
+        slot = next((slot for slot in server.clients.values() if slot.player.id == client.player_id), None)
+        stats = server.client_stats(slot) if slot is not None else None
+        print(f"Jugador {client.player_id}:")
+        if stats is not None:
+            print(f"  ancho de banda: bajada {stats['bajada_kBps']:.2f} kB/s, subida {stats['subida_kBps']:.2f} kB/s | "
+                  f"instantáneas {stats['instantaneas']} ({stats['completas']} completas), "
+                  f"tamaño frente a completas {stats['compresion']:.0%}")
+        print(f"  instantáneas recibidas {client.snapshot_count}, paquetes de entrada perdidos "
+              f"{client.link.dropped} de {client.link.sent} | {client.malformed} de {len(bad_snapshots)} "
+              f"mal formados descartados (siguió con {client.snapshot_count - received_before} instantáneas)")
+        print(f"  entrada -> confirmada por el servidor: mediana {percentile(client.confirm_latency, 0.5):.0f} ms, "
+              f"p95 {percentile(client.confirm_latency, 0.95):.0f} ms")
+        print(f"  entrada -> visible en la vista interpolada: mediana {percentile(client.visible_latency, 0.5):.0f} ms, "
+              f"p95 {percentile(client.visible_latency, 0.95):.0f} ms (el jugador propio se ve al instante, predicho)")
+        print(f"  corrección de la predicción: mediana {percentile(client.corrections, 0.5):.2f} px, "
+              f"p95 {percentile(client.corrections, 0.95):.2f} px")
+    for client in clients:
+        client.close()
+    dropped = server.malformed == len(malformed) * len(clients) and all(
+        client.malformed == len(bad_snapshots) for client in clients)
+    return 0 if dropped else 1
+
+
+def parse_address(text):
+    host, _, port = text.partition(":")
+    return host, int(port) if port else NET_PORT
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multijugador en red local")
+    commands = parser.add_subparsers(dest="command", required=True)
+    server_parser = commands.add_parser("server", help="Servidor autoritativo")
+    server_parser.add_argument("--host", default="0.0.0.0")
+    server_parser.add_argument("--port", type=int, default=NET_PORT)
+    server_parser.add_argument("--seed", type=int, help="Semilla de la partida")
+    client_parser = commands.add_parser("client", help="Cliente con ventana")
+    client_parser.add_argument("server", help="Dirección del servidor, como HOST[:PUERTO]")
+    loopback_parser = commands.add_parser("loopback", help="Servidor y clientes de prueba en este equipo")
+    loopback_parser.add_argument("--clients", type=int, default=2)
+    loopback_parser.add_argument("--seconds", type=float, default=20)
+    loopback_parser.add_argument("--latency", type=float, default=50, help="Latencia en cada sentido, en ms")
+    loopback_parser.add_argument("--jitter", type=float, default=10, help="Variación de la latencia, en ms")
+    loopback_parser.add_argument("--loss", type=float, default=0.05, help="Fracción de paquetes perdidos")
+    loopback_parser.add_argument("--seed", type=int, default=0)
+    loopback_parser.add_argument("--draw", action="store_true", help="Dibujar también los clientes")
+    args = parser.parse_args()
+
+    if args.command == "server":
+        server = NetServer((args.host, args.port), seed=args.seed)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if args.command == "client":
+        NetClient(parse_address(args.server)).run()
+        return 0
+    return run_loopback(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
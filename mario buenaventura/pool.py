@@ -0,0 +1,54 @@
+class ObjectPool:
+    """
+    Pool de objetos reutilizables (hongos, monedas, estrellas, goombas).
+    acquire() devuelve un objeto libre o, si no queda ninguno, crea uno con factory;
+    release() lo devuelve para la próxima aparición. Quien lo saca debe reiniciarlo (reset).
+    :param factory: Función sin argumentos que crea un objeto nuevo, con su imagen ya asignada.
+    :param size: Objetos a crear de antemano.
+    """
+    def __init__(self, factory, size=0):
+        self.factory = factory
+        self.free = []
+        self.created = 0    # Objetos creados en total (tamaño del pool)
+        self.acquired = 0   # Veces que se pidió un objeto
+        self.hits = 0       # Veces que se pudo reutilizar uno libre
+        self.in_use = 0
+        self.high_water = 0 # Máximo de objetos en uso a la vez
+        self.prefill(size)
+
+    def prefill(self, size):
+        """Crea objetos libres hasta que el pool tenga al menos size en total."""
+        while self.created < size:
+            self.free.append(self.factory())
+            self.created += 1
+
+    def acquire(self):
+        self.acquired += 1
+        if self.free:
+            self.hits += 1
+            obj = self.free.pop()
+        else:
+            obj = self.factory()
+            self.created += 1
+        self.in_use += 1
+        self.high_water = max(self.high_water, self.in_use)
+        return obj
+
+    def release(self, obj):
+        self.in_use -= 1
+        self.free.append(obj)
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.acquired if self.acquired else 1.0
+
+    def stats(self):
+        """Estadísticas para ajustar el tamaño del pool."""
+        return {
+            "size": self.created,
+            "free": len(self.free),
+            "in_use": self.in_use,
+            "high_water": self.high_water,
+            "acquired": self.acquired,
+            "hit_rate": self.hit_rate,
+        }
@@ -2,28 +2,50 @@ import pygame
 from constants import * # Importa todas las constantes
 
 class Poder:
-    def __init__(self, id, nombre, descripcion, x, y, estado="activo"):
+    # Atributos fijos en __slots__ (sin __dict__ por instancia); el nombre y la descripción
+    # son de cada clase y no se guardan en cada objeto
+    __slots__ = ("id", "posicionX", "posicionY", "estado", "image", "rect", "broadphase_handle", "store_slot", "serial")
+    nombre = "Poder"
+    descripcion = ""
+
+    def __init__(self, id, x, y, estado="activo"):
         self.id = id
-        self.nombre = nombre
-        self.descripcion = descripcion
         self.posicionX = x
         self.posicionY = y
         self.estado = estado
         self.image = None
         self.rect = None
-        self.original_image = None
+        self.broadphase_handle = None # Handle en la rejilla de colisiones del juego
+        self.store_slot = None # Hueco en el EntityStore del juego, si se usa
+        self.serial = None # Identificador que le da Game.spawn_entity (ver net.py)
         
     def set_image(self, image, size=None):
-        self.original_image = image
         if size:
-            self.image = pygame.transform.scale(self.original_image, size)
+            self.image = pygame.transform.scale(image, size)
         else:
-            self.image = self.original_image
+            self.image = image
             
         if self.image:
             self.rect = self.image.get_rect()
             self.rect.x = self.posicionX
             self.rect.y = self.posicionY
+
+    def reset(self, id, x, y, estado="activo", image=None):
+        """
+        Reinicia un poder reutilizado (de un pool) en una nueva posición sin crear objetos.
+        :param image: Imagen ya escalada para el poder. Si es None, conserva la actual.
+        """
+        self.id = id
+        self.posicionX = x
+        self.posicionY = y
+        self.estado = estado
+        self.broadphase_handle = None
+        self.store_slot = None
+        if image is not None:
+            self.image = image
+        if self.rect is not None:
+            self.rect.x = self.posicionX
+            self.rect.y = self.posicionY
             
     def update(self):
         self.mover(dx=-OBJECT_SPEED) # Todos los power-ups se mueven hacia la izquierda
@@ -36,16 +58,47 @@ class Poder:
             self.rect.y = self.posicionY
 
 class Hongo(Poder):
+    __slots__ = ("tipo",)
+    # Nombre y descripción de cada tipo de hongo
+    TIPOS = {
+        "crecimiento": ("Hongo de crecimiento", "Hace crecer al jugador"),
+        "vida": ("Hongo de vida", "Da una vida extra"),
+    }
+
     def __init__(self, id, x, y, tipo, estado="activo"):
-        nombre = "Hongo de crecimiento" if tipo == "crecimiento" else "Hongo de vida"
-        descripcion = "Hace crecer al jugador" if tipo == "crecimiento" else "Da una vida extra"
-        super().__init__(id, nombre, descripcion, x, y, estado)
+        super().__init__(id, x, y, estado)
         self.tipo = tipo
 
+    @property
+    def nombre(self):
+        return self.TIPOS[self.tipo][0]
+
+    @property
+    def descripcion(self):
+        return self.TIPOS[self.tipo][1]
+
+    def reset(self, id, x, y, tipo, estado="activo", image=None):
+        self.tipo = tipo
+        super().reset(id, x, y, estado, image)
+
 class Moneda(Poder):
+    __slots__ = ()
+    nombre = "Moneda"
+    descripcion = "Otorga puntos y contribuye a una vida extra"
+
     def __init__(self, id, x, y, estado="activa"):
-        super().__init__(id, "Moneda", "Otorga puntos y contribuye a una vida extra", x, y, estado)
+        super().__init__(id, x, y, estado)
+
+    def reset(self, id, x, y, estado="activa", image=None):
+        super().reset(id, x, y, estado, image)
 
 class Estrella(Poder):
+    __slots__ = ()
+    nombre = "Estrella"
+    descripcion = "Otorga inmunidad temporal"
+
     def __init__(self, id, x, y, estado="activa"):
-        super().__init__(id, "Estrella", "Otorga inmunidad temporal", x, y, estado)
+        super().__init__(id, x, y, estado)
+
+    def reset(self, id, x, y, estado="activa", image=None):
+        super().reset(id, x, y, estado, image)
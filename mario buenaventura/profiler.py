@@ -0,0 +1,163 @@
+import csv
+import json
+import time
+from collections import deque
+
+import pygame
+from constants import *
+
+# Fases de un frame, en el orden en que ocurren (las de update() van de "jugador" a "rebobinado")
+PROFILE_PHASES = ("eventos", "jugador", "temporizadores", "entidades", "limpieza", "colisiones", "rebobinado",
+                  "dibujo", "espera")
+PHASE_COLORS = {
+    "eventos": (200, 200, 200),
+    "jugador": RED,
+    "temporizadores": (255, 140, 0),
+    "entidades": YELLOW,
+    "limpieza": (160, 82, 45),
+    "colisiones": GREEN,
+    "rebobinado": (186, 85, 211),
+    "dibujo": (100, 149, 237),
+    "espera": (90, 90, 90),
+}
+
+
+class NullProfiler:
+    """Perfilador desactivado: los métodos no hacen nada, así que medir no cuesta casi nada."""
+    enabled = False
+
+    def begin_frame(self):
+        pass
+
+    def lap(self, name):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class FrameProfiler:
+    """
+    Mide cuánto tarda cada fase de cada frame.
+    begin_frame() inicia el frame, cada lap(nombre) cierra una fase con el tiempo desde la
+    anterior y end_frame() guarda el registro en el historial y, si se pidió, en un archivo.
+    :param export_path: Archivo .csv o .jsonl donde escribir un registro por frame (opcional).
+    :param history: Frames que se guardan en memoria para el gráfico.
+    """
+    enabled = True
+
+    def __init__(self, export_path=None, history=PROFILE_HISTORY):
+        self.history = deque(maxlen=history)
+        self.frame = 0
+        self.current = {}
+        self.start = self.last = time.perf_counter()
+        self.file = None
+        self.writer = None
+        if export_path:
+            self.file = open(export_path, "w", newline="", encoding="utf-8")
+            if export_path.endswith(".csv"):
+                self.writer = csv.writer(self.file)
+                self.writer.writerow(("frame", "total") + PROFILE_PHASES)
+
+    def begin_frame(self):
+        self.current = {}
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.current[name] = self.current.get(name, 0.0) + (now - self.last) * 1000
+        self.last = now
+
+    def end_frame(self):
+        record = {"frame": self.frame, "total": (self.last - self.start) * 1000}
+        record.update(self.current)
+        self.history.append(record)
+        self.frame += 1
+
+        if self.writer is not None:
+            self.writer.writerow([record["frame"], f"{record['total']:.3f}"] +
+                                 [f"{self.current.get(phase, 0.0):.3f}" for phase in PROFILE_PHASES])
+        elif self.file is not None:
+            self.file.write(json.dumps({key: round(value, 3) if isinstance(value, float) else value
+                                        for key, value in record.items()}) + "\n")
+
+    def averages(self):
+        """Milisegundos medios de cada fase en el historial."""
+        if not self.history:
+            return {}
+        return {phase: sum(record.get(phase, 0.0) for record in self.history) / len(self.history)
+                for phase in PROFILE_PHASES + ("total",)}
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class ProfilerGraph:
+    """
+    Gráfico en pantalla de los últimos frames: una barra apilada por frame, con un color por
+    fase y una línea en el presupuesto de 60 fps. La superficie se desplaza y solo se pinta
+    la barra nueva, así que el gráfico cuesta poco más que un blit por frame.
+    :param font: Fuente de la leyenda.
+    :param position: Esquina superior izquierda del gráfico en la pantalla.
+    """
+    BAR_WIDTH = 2
+    HEIGHT = 100
+    PIXELS_PER_MS = 3 # 100 píxeles son unos 33 ms: dos frames a 60 fps
+
+    def __init__(self, font, position=(SCREEN_WIDTH - PROFILE_HISTORY * 2 - 10, 10)):
+        self.font = font
+        self.position = position
+        self.graph = pygame.Surface((PROFILE_HISTORY * self.BAR_WIDTH, self.HEIGHT), pygame.SRCALPHA)
+        self.graph.fill((0, 0, 0, 160))
+        self.legend = None
+        self.last_frame = -1
+
+    def update(self, profiler):
+        """Añade al gráfico los frames que el perfilador terminó desde la última vez."""
+        for record in profiler.history:
+            if record["frame"] <= self.last_frame:
+                continue
+            self.push(record)
+            self.last_frame = record["frame"]
+        if self.legend is None or profiler.frame % 30 == 0:
+            self.legend = self.render_legend(profiler.averages())
+
+    def push(self, record):
+        width = self.BAR_WIDTH
+        self.graph.scroll(-width, 0)
+        x = self.graph.get_width() - width
+        self.graph.fill((0, 0, 0, 160), (x, 0, width, self.HEIGHT))
+        bottom = self.HEIGHT
+        for phase in PROFILE_PHASES:
+            height = int(record.get(phase, 0.0) * self.PIXELS_PER_MS)
+            if height:
+                self.graph.fill(PHASE_COLORS[phase], (x, bottom - height, width, height))
+                bottom -= height
+        budget_y = self.HEIGHT - int(SIMULATION_STEP_MS * self.PIXELS_PER_MS)
+        self.graph.fill(WHITE, (x, budget_y, width, 1))
+
+    def render_legend(self, averages):
+        lines = [f"{phase}: {averages.get(phase, 0.0):.2f} ms" for phase in PROFILE_PHASES]
+        lines.append(f"total: {averages.get('total', 0.0):.2f} ms")
+        rendered = [self.font.render(line, True, PHASE_COLORS.get(line.split(":")[0], WHITE)) for line in lines]
+        line_height = rendered[0].get_height()
+        legend = pygame.Surface((max(line.get_width() for line in rendered), line_height * len(rendered)), pygame.SRCALPHA)
+        legend.fill((0, 0, 0, 160))
+        for i, line in enumerate(rendered):
+            legend.blit(line, (0, i * line_height))
+        return legend
+
+    def draw(self, blit, profiler):
+        """Dibuja el gráfico y su leyenda con la función de blit dada."""
+        self.update(profiler)
+        x, y = self.position
+        blit(self.graph, (x, y))
+        blit(self.legend, (x, y + self.HEIGHT + 4))
@@ -0,0 +1,194 @@
+import weakref
+
+import pygame
+from constants import *
+
+
+class DirtyRectRenderer:
+    """
+    Dibujo por rectángulos sucios.
+    En lugar de copiar el fondo completo y hacer flip() en cada frame, restaura el fondo solo
+    donde hubo algo dibujado en el frame anterior, dibuja los sprites y envía a la pantalla
+    únicamente los rectángulos anteriores y actuales con pygame.display.update(rects).
+    :param screen: Superficie de la pantalla.
+    :param background: Superficie de fondo del tamaño de la pantalla.
+    """
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self.previous = []       # Rectángulos dibujados en el frame anterior
+        self.current = []        # Rectángulos dibujados en este frame
+        self.full_redraw = True  # El próximo frame debe redibujar y enviar la pantalla completa
+
+    def invalidate(self):
+        """Fuerza un redibujado completo en el próximo frame (por ejemplo tras un menú)."""
+        self.full_redraw = True
+
+    def begin(self):
+        """Prepara el frame: restaura el fondo bajo lo dibujado antes (o entero si hace falta)."""
+        self.current = []
+        if self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                self.screen.blit(self.background, rect, rect)
+
+    def blit(self, image, position):
+        """Dibuja una superficie y recuerda la zona afectada."""
+        rect = self.screen.blit(image, position)
+        self.current.append(rect)
+        return rect
+
+    def present(self):
+        """Envía a la pantalla solo lo que cambió en este frame."""
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.previous + self.current)
+        self.previous = self.current
+
+
+class SurfaceRenderer:
+    """
+    Dibujo directo en la pantalla, del tamaño lógico del juego (el modo de siempre).
+    Todos los renderizadores tienen la misma interfaz: blit, blits, fill, present y
+    surface (la superficie lógica donde se dibuja, o None si no hay una).
+    """
+    name = "direct"
+
+    def __init__(self, window_size=None):
+        self.window = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.surface = self.window
+        # Los métodos de la superficie, sin capas en medio
+        self.blit = self.surface.blit
+        self.blits = self.surface.blits
+
+    def fill(self, color, rect=None, width=0):
+        """Rellena un rectángulo (o toda la pantalla); con width solo dibuja el borde."""
+        if width:
+            pygame.draw.rect(self.surface, color, rect, width)
+        else:
+            self.surface.fill(color, rect)
+
+    def mark_dynamic(self, surface):
+        """Avisa de una superficie que se modifica en el sitio (solo le importa a TextureRenderer)."""
+
+    def present(self):
+        pygame.display.flip()
+
+    def close(self):
+        pass
+
+
+class ScaledRenderer(SurfaceRenderer):
+    """
+    Dibuja en una superficie del tamaño lógico del juego y la escala una vez por frame a la
+    ventana, que se puede redimensionar. Las imágenes no se vuelven a escalar nunca; las
+    bandas que sobran para mantener la proporción quedan en negro.
+    :param window_size: Tamaño inicial de la ventana.
+    """
+    name = "scaled"
+
+    def __init__(self, window_size=None):
+        self.window = pygame.display.set_mode(window_size or (SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
+        self.surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        self.blit = self.surface.blit
+        self.blits = self.surface.blits
+        self.window_size = None
+        self.viewport = None
+        self.target = None
+
+    def fit(self, window):
+        """Calcula la zona de la ventana donde cabe el juego sin deformarse."""
+        width, height = window.get_size()
+        scale = min(width / SCREEN_WIDTH, height / SCREEN_HEIGHT)
+        self.viewport = pygame.Rect(0, 0, max(1, int(SCREEN_WIDTH * scale)), max(1, int(SCREEN_HEIGHT * scale)))
+        self.viewport.center = (width // 2, height // 2)
+        window.fill(BLACK)
+        self.target = window.subsurface(self.viewport)
+        self.window = window
+        self.window_size = (width, height)
+
+    def present(self):
+        # Con RESIZABLE, pygame cambia la superficie de la ventana al redimensionarla
+        window = pygame.display.get_surface()
+        if window is not self.window or window.get_size() != self.window_size:
+            self.fit(window)
+        if self.viewport.size == self.surface.get_size():
+            window.blit(self.surface, self.viewport)
+        else:
+            pygame.transform.scale(self.surface, self.viewport.size, self.target)
+        pygame.display.flip()
+
+
+class TextureRenderer:
+    """
+    Dibujo con texturas de SDL2 (pygame._sdl2.video): cada superficie se sube una sola vez
+    como textura y SDL la escala del tamaño lógico del juego al de la ventana al dibujarla.
+    Las texturas se olvidan cuando su superficie deja de existir; las superficies que se
+    modifican en el sitio (mark_dynamic) se vuelven a subir cada vez que se dibujan.
+    No hay superficie lógica (surface es None). Con SDL_RENDER_DRIVER=software funciona sin GPU.
+    :param window_size: Tamaño inicial de la ventana.
+    """
+    name = "texture"
+
+    def __init__(self, window_size=None):
+        from pygame._sdl2.video import Renderer, Texture, Window
+        self.texture_class = Texture
+        # convert() necesita un modo de video, aunque se dibuje en otra ventana
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        self.window = Window("Super Mario en Buenaventura", size=window_size or (SCREEN_WIDTH, SCREEN_HEIGHT),
+                             resizable=True)
+        self.renderer = Renderer(self.window)
+        self.renderer.logical_size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.surface = None
+        self.textures = weakref.WeakKeyDictionary()
+        self.dynamic = weakref.WeakSet()
+        self.uploads = 0
+
+    def texture(self, image):
+        """Textura de una superficie, subiéndola la primera vez."""
+        texture = self.textures.get(image)
+        if texture is None:
+            texture = self.textures[image] = self.texture_class.from_surface(self.renderer, image)
+            self.uploads += 1
+        elif image in self.dynamic:
+            texture.update(image)
+            self.uploads += 1
+        return texture
+
+    def blit(self, image, position):
+        rect = image.get_rect(topleft=(position[0], position[1]))
+        self.texture(image).draw(dstrect=rect)
+        return rect
+
+    def blits(self, sequence, doreturn=True):
+        rects = [self.blit(image, position) for image, position in sequence]
+        return rects if doreturn else None
+
+    def fill(self, color, rect=None, width=0):
+        renderer = self.renderer
+        renderer.draw_color = pygame.Color(color)
+        if rect is None:
+            renderer.clear()
+        elif width:
+            rect = pygame.Rect(rect)
+            for _ in range(width):
+                renderer.draw_rect(rect)
+                rect = rect.inflate(-2, -2)
+        else:
+            renderer.fill_rect(rect)
+
+    def mark_dynamic(self, surface):
+        self.dynamic.add(surface)
+
+    def present(self):
+        self.renderer.present()
+
+    def close(self):
+        self.textures.clear()
+        self.window.destroy()
+
+
+RENDERERS = {renderer.name: renderer for renderer in (SurfaceRenderer, ScaledRenderer, TextureRenderer)}
@@ -0,0 +1,199 @@
+"""
+Grabación y reproducción de partidas.
+
+Una grabación guarda la entrada de cada tick (teclas mantenidas y pulsaciones en orden),
+la semilla, el paso del reloj, si el rebobinado estaba activo y las constantes del juego. Al reproducirla, la entrada pasa
+por Game.step(), el mismo camino que la entrada real, en modo headless y sin esperar al reloj,
+así que sirve para medir el rendimiento y comparar versiones con la misma partida.
+
+Uso (desde la carpeta del juego):
+    python main.py --record partida.rep   # Jugar grabando
+    python replay.py partida.rep          # Reproducir y comprobar el resultado
+    python replay.py partida.rep --repeat 5
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+import zlib
+
+import constants
+from inputs import FrameInput, TRACKED_KEYS
+
+REPLAY_MAGIC = b"MBREPLAY"
+REPLAY_VERSION = 2 # 2: Retroceso en TRACKED_KEYS y el rebobinado en la cabecera
+QUIT_BIT = 1 << 15 # En la máscara de teclas, el bit de cerrar la ventana
+EVENT_PRESSED = 0x80 # En cada evento, el bit de pulsada (el resto es el índice de la tecla)
+
+
+def build_constants():
+    """Constantes del juego que cambian su comportamiento (para detectar versiones distintas)."""
+    values = {}
+    for name, value in vars(constants).items():
+        if name.isupper() and isinstance(value, (int, float, tuple)) and not name.startswith("K_"):
+            values[name] = list(value) if isinstance(value, tuple) else value
+    return values
+
+
+def encode_input(frame_input):
+    """Codifica la entrada de un tick: máscara de teclas (2 bytes), número de eventos y un byte por evento."""
+    mask = QUIT_BIT if frame_input.quit else 0
+    for i, key in enumerate(TRACKED_KEYS):
+        if key in frame_input.held:
+            mask |= 1 << i
+    data = struct.pack("<HB", mask, len(frame_input.events))
+    return data + bytes((EVENT_PRESSED if pressed else 0) | TRACKED_KEYS.index(key)
+                        for pressed, key in frame_input.events)
+
+
+def decode_inputs(data, count):
+    """
+    Decodifica count ticks de entrada.
+    Los ticks iguales (la mayoría) comparten el mismo FrameInput, así que reproducir no crea objetos.
+    Los datos pueden venir de la red: si están cortados o nombran una tecla que no existe, ValueError.
+    """
+    inputs = []
+    cache = {}
+    offset = 0
+    for _ in range(count):
+        if offset + 3 > len(data):
+            raise ValueError("Entrada cortada")
+        mask, event_count = struct.unpack_from("<HB", data, offset)
+        end = offset + 3 + event_count
+        if end > len(data):
+            raise ValueError("Entrada cortada")
+        raw = data[offset:end]
+        offset = end
+        frame_input = cache.get(raw)
+        if frame_input is None:
+            if any(code & ~EVENT_PRESSED >= len(TRACKED_KEYS) for code in raw[3:]):
+                raise ValueError("Evento de una tecla desconocida")
+            held = [key for i, key in enumerate(TRACKED_KEYS) if mask & (1 << i)]
+            events = [(bool(code & EVENT_PRESSED), TRACKED_KEYS[code & ~EVENT_PRESSED]) for code in raw[3:]]
+            frame_input = cache[raw] = FrameInput(held, events, bool(mask & QUIT_BIT))
+        inputs.append(frame_input)
+    return inputs
+
+
+def game_summary(game):
+    """Estado final de una partida, para comprobar que la reproducción coincide con lo grabado."""
+    player = game.current_player
+    return {
+        "tiempo_ms": game.game_clock.now(),
+        "puntos": player.puntos if player else 0,
+        "vidas": player.vidas if player else 0,
+        "monedas": player.monedas if player else 0,
+        "goombas": game.total_goombas_generados,
+        "x": round(player.posicionX, 2) if player else 0,
+        "game_over": game.game_over,
+    }
+
+
+class InputRecorder:
+    """
+    Graba la entrada de cada tick de una partida.
+    Game.apply_input() llama a record() con cada FrameInput; save() escribe el archivo.
+    :param game_clock: Reloj del juego; debe ser simulado (paso fijo) para que la partida se repita.
+    :param rewind: Si el juego graba para rebobinar (Retroceso deshace ticks en lugar de no hacer nada).
+    """
+    def __init__(self, game_clock, rewind=False):
+        if not game_clock.simulated:
+            raise ValueError("Para grabar, el juego debe usar un reloj de paso fijo (step_ms)")
+        self.seed = game_clock.seed
+        self.step_ms = game_clock.step_ms
+        self.rewind = rewind
+        self.data = bytearray()
+        self.count = 0
+
+    def record(self, frame_input):
+        self.data += encode_input(frame_input)
+        self.count += 1
+
+    def save(self, path, game=None):
+        """Escribe la grabación comprimida. Si se da game, guarda también su estado final."""
+        header = {
+            "version": REPLAY_VERSION,
+            "seed": self.seed,
+            "step_ms": self.step_ms,
+            "rewind": game.rewind is not None if game is not None else self.rewind,
+            "ticks": self.count,
+            "constants": build_constants(),
+            "result": game_summary(game) if game is not None else None,
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        payload = struct.pack("<I", len(header_bytes)) + header_bytes + bytes(self.data)
+        with open(path, "wb") as f:
+            f.write(REPLAY_MAGIC)
+            f.write(zlib.compress(payload, 9))
+
+
+def load_replay(path):
+    """
+    Lee una grabación.
+    :return: (cabecera, lista de FrameInput, uno por tick).
+    """
+    with open(path, "rb") as f:
+        if f.read(len(REPLAY_MAGIC)) != REPLAY_MAGIC:
+            raise ValueError(f"{path} no es una grabación del juego")
+        payload = zlib.decompress(f.read())
+    (header_length,) = struct.unpack_from("<I", payload)
+    header = json.loads(payload[4:4 + header_length].decode("utf-8"))
+    if header["version"] != REPLAY_VERSION:
+        raise ValueError(f"Versión de grabación no soportada: {header['version']}")
+    return header, decode_inputs(payload[4 + header_length:], header["ticks"])
+
+
+def replay(path, **game_kwargs):
+    """
+    Reproduce una grabación en modo headless tan rápido como se pueda.
+    :return: (juego al terminar, segundos que tardó la simulación).
+    """
+    from game import Game
+
+    header, inputs = load_replay(path)
+    game = Game(headless=True, seed=header["seed"], step_ms=header["step_ms"], rewind=header["rewind"],
+                **game_kwargs)
+    step = game.step
+    start = time.perf_counter()
+    for frame_input in inputs:
+        if not step(frame_input):
+            break
+    return game, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce una partida grabada con main.py --record")
+    parser.add_argument("path", help="Archivo de la grabación")
+    parser.add_argument("--repeat", type=int, default=1, help="Veces que se reproduce (para medir)")
+    parser.add_argument("--entity-store", action="store_true", help="Mover las entidades con NumPy")
+    args = parser.parse_args()
+
+    header, _ = load_replay(args.path)
+    current = build_constants()
+    changed = sorted(name for name in set(current) | set(header["constants"])
+                     if current.get(name) != header["constants"].get(name))
+    if changed:
+        print(f"Aviso: la grabación se hizo con otras constantes: {', '.join(changed)}")
+
+    timings = []
+    for _ in range(args.repeat):
+        game, elapsed = replay(args.path, entity_store=args.entity_store)
+        timings.append(elapsed)
+    ticks = header["ticks"]
+    best = min(timings)
+    print(f"{ticks} ticks en {best * 1000:.1f} ms ({ticks / best:.0f} ticks/s, mejor de {args.repeat})")
+
+    result = game_summary(game)
+    print(f"Resultado: {result}")
+    if header["result"] is not None:
+        if result == header["result"]:
+            print("Coincide con la partida grabada")
+        else:
+            print(f"NO coincide con la partida grabada: {header['result']}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,500 @@
+"""
+Rebobinado: los últimos segundos de la partida, guardados en memoria en binario.
+
+Después de cada tick, Rewind empaqueta el estado completo de la partida (reloj, estado del
+generador aleatorio, jugadores, poderes, enemigos y temporizadores) con struct, sin copiar
+objetos de Python, y lo guarda en un RewindBuffer: un bytearray reservado de antemano que
+se usa como anillo. Cada REWIND_KEYFRAME_INTERVAL ticks se guarda el estado entero
+(comprimido); entre medias, solo el XOR con el tick anterior, que es casi todo ceros y
+comprimido ocupa unas decenas de bytes. Como el XOR es simétrico, retroceder un tick es
+deshacer un XOR. La memoria no pasa de REWIND_BUFFER_BYTES: al llenarse, se descartan
+los ticks más antiguos.
+
+Uso (desde la carpeta del juego):
+    python rewind.py [--seconds N]
+juega una partida sin pantalla grabando, mide lo que cuesta cada instantánea, muestra la
+memoria usada y comprueba que volver atrás y repetir la misma entrada da el mismo estado, y
+que una grabación de replay.py en la que se rebobina se reproduce igual.
+"""
+import argparse
+import functools
+import math
+import os
+import statistics
+import struct
+import tempfile
+import time
+import zlib
+from collections import deque
+
+from constants import *
+from character import Goomba
+from powerup import Hongo, Moneda, Estrella
+
+KEYFRAME = 0
+DELTA = 1
+RECORD_HEADER = struct.Struct("<BII") # Tipo, largo del estado, largo del estado anterior
+
+# Partida: reloj, cámara del nivel, gauss_next del generador, goombas generados, siguiente serie,
+# banderas, y cuántos jugadores, hongos, monedas, goombas, estrellas y temporizadores siguen
+GAME_STATE = struct.Struct("<dddIHBHHHHBH")
+RNG_STATE = struct.Struct("<625I") # Estado del Mersenne Twister (624 palabras y la posición)
+# Jugador: id, posición, velocidad, banderas, tamaño, dirección, vidas, monedas, puntos,
+# frame de correr, último cambio de frame, imagen (índice en su caché), rect y altura en que se apoya
+PLAYER_STATE = struct.Struct("<HdddBBBiHIBdBhhhhh")
+# Entidad: tipo, serie, id, posición, velocidades, banderas y posición del rect
+ENTITY_STATE = struct.Struct("<BHHddddBhh")
+# Temporizador: vence, intervalo (NaN si no se repite), método y jugador (NO_PLAYER si no tiene)
+TIMER_STATE = struct.Struct("<ddBH")
+NO_PLAYER = 0xFFFF
+
+GAME_FLAGS = ("game_running", "game_over", "in_menu", "goomba_pending")
+PLAYER_FLAGS = ("grounded", "is_jumping", "jump_key_held", "is_running", "is_moving", "is_ducking", "inmune")
+DEAD_FLAG = 1 << len(PLAYER_FLAGS)
+SIZES = ("normal", "grande")
+DIRECTIONS = ("right", "left")
+# Tipos de entidad: (clase, lista del juego, argumentos de reset)
+ENTITY_KINDS = (
+    ("hongo_crecimiento", Hongo, "poderes_activos"),
+    ("hongo_vida", Hongo, "poderes_activos"),
+    ("moneda", Moneda, "monedas_activas"),
+    ("goomba", Goomba, "enemigos_activos"),
+    ("estrella", Estrella, None),
+)
+KIND_CODES = {kind[0]: code for code, kind in enumerate(ENTITY_KINDS)}
+# Callbacks que pueden estar programados: métodos del juego (end_immunity con su jugador)
+# y del jugador. Cualquier otro no se puede guardar y capture() lo rechaza.
+TIMER_METHODS = ("spawn_objects", "spawn_goomba", "end_immunity", "advance_run_frame")
+TIMER_CODES = {name: code for code, name in enumerate(TIMER_METHODS)}
+
+
+def xor_bytes(a, b):
+    """XOR de dos estados; el más corto se completa con ceros."""
+    size = max(len(a), len(b))
+    value = int.from_bytes(a, "little") ^ int.from_bytes(b, "little")
+    return value.to_bytes(size, "little")
+
+
+class RewindBuffer:
+    """
+    Anillo de estados binarios en un bytearray de tamaño fijo.
+    Cada registro es un fotograma clave (el estado comprimido) o la diferencia con el
+    anterior (el XOR comprimido). Siempre empieza por un fotograma clave: al expulsar uno,
+    se expulsan también las diferencias que dependían de él.
+    :param max_frames: Ticks que se guardan como mucho.
+    :param capacity: Bytes del anillo.
+    :param keyframe_interval: Ticks entre fotogramas clave.
+    """
+    def __init__(self, max_frames, capacity=REWIND_BUFFER_BYTES, keyframe_interval=REWIND_KEYFRAME_INTERVAL):
+        self.data = bytearray(capacity)
+        self.capacity = capacity
+        self.max_frames = max_frames
+        self.keyframe_interval = keyframe_interval
+        self.index = deque() # (posición, largo, tipo, largo del estado, largo del anterior)
+        self.head = 0        # Dónde se escribe el siguiente registro
+        self.used = 0        # Bytes ocupados por registros
+        self.latest = None   # Estado más reciente, sin comprimir
+        self.since_keyframe = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.index)
+
+    def clear(self):
+        self.index.clear()
+        self.head = 0
+        self.used = 0
+        self.latest = None
+        self.since_keyframe = 0
+
+    def push(self, state):
+        """Guarda el estado de un tick (bytes)."""
+        if self.latest is None or self.since_keyframe >= self.keyframe_interval - 1:
+            kind, payload, previous_size = KEYFRAME, zlib.compress(state, 1), 0
+            self.since_keyframe = 0
+        else:
+            kind, payload, previous_size = DELTA, zlib.compress(xor_bytes(state, self.latest), 1), len(self.latest)
+            self.since_keyframe += 1
+        self.write(RECORD_HEADER.pack(kind, len(state), previous_size), payload, kind, len(state), previous_size)
+        self.latest = state
+
+    def write(self, header, payload, kind, size, previous_size):
+        length = len(header) + len(payload)
+        if length > self.capacity:
+            raise ValueError(f"Un estado de {length} bytes no cabe en el anillo de rebobinado")
+        if self.head + length > self.capacity:
+            self.head = 0 # No cabe al final: se sigue desde el principio
+        while self.index and (len(self.index) >= self.max_frames or
+                              self.head <= self.index[0][0] < self.head + length):
+            self.evict()
+        start = self.head
+        self.data[start:start + len(header)] = header
+        self.data[start + len(header):start + length] = payload
+        self.index.append((start, length, kind, size, previous_size))
+        self.head = start + length
+        self.used += length
+
+    def evict(self):
+        """Expulsa el registro más antiguo y las diferencias que ya no tienen de dónde partir."""
+        self.used -= self.index.popleft()[1]
+        self.evicted += 1
+        while self.index and self.index[0][2] == DELTA:
+            self.used -= self.index.popleft()[1]
+            self.evicted += 1
+
+    def payload(self, entry):
+        start, length = entry[0], entry[1]
+        return zlib.decompress(memoryview(self.data)[start + RECORD_HEADER.size:start + length])
+
+    def state_at(self, position):
+        """Estado del registro position (0 es el más antiguo), desde su fotograma clave anterior."""
+        first = position
+        while self.index[first][2] != KEYFRAME:
+            first -= 1
+        state = self.payload(self.index[first])
+        for entry in list(self.index)[first + 1:position + 1]:
+            state = xor_bytes(state, self.payload(entry))[:entry[3]]
+        return state
+
+    def pop(self):
+        """
+        Descarta el tick más reciente y devuelve el estado anterior (None si no queda ninguno).
+        Desde una diferencia basta un XOR; desde un fotograma clave se reconstruye a partir
+        del fotograma clave anterior.
+        """
+        if len(self.index) < 2:
+            return None
+        entry = self.index.pop()
+        self.used -= entry[1]
+        if self.head == entry[0] + entry[1]:
+            self.head = entry[0]
+        if entry[2] == DELTA:
+            state = xor_bytes(self.latest, self.payload(entry))[:entry[4]]
+        else:
+            state = self.state_at(len(self.index) - 1)
+        self.latest = state
+        self.since_keyframe = 0
+        for position in range(len(self.index) - 1, -1, -1):
+            if self.index[position][2] == KEYFRAME:
+                break
+            self.since_keyframe += 1
+        return state
+
+    def stats(self):
+        keyframes = [entry[1] for entry in self.index if entry[2] == KEYFRAME]
+        deltas = [entry[1] for entry in self.index if entry[2] == DELTA]
+        return {
+            "frames": len(self.index),
+            "seconds": len(self.index) / PHYSICS_HZ,
+            "used": self.used,
+            "capacity": self.capacity,
+            "keyframes": len(keyframes),
+            "keyframe_bytes": sum(keyframes) / len(keyframes) if keyframes else 0,
+            "delta_bytes": sum(deltas) / len(deltas) if deltas else 0,
+            "state_bytes": len(self.latest) if self.latest else 0,
+            "evicted": self.evicted,
+        }
+
+
+class Rewind:
+    """
+    Graba el estado de una partida en cada tick (record) y lo restaura hacia atrás (step_back).
+    :param game: Juego cuyo estado se guarda.
+    :param seconds: Segundos de partida que se pueden rebobinar.
+    :param capacity: Bytes del anillo; si se llena antes, se rebobina menos.
+    """
+    def __init__(self, game, seconds=REWIND_SECONDS, capacity=REWIND_BUFFER_BYTES):
+        self.game = game
+        self.buffer = RewindBuffer(int(seconds * PHYSICS_HZ), capacity)
+        self.scratch = bytearray(4096) # Se reutiliza en cada tick; crece si hace falta
+        # id del jugador -> (caché de sprites, {id de la superficie: índice}, superficies por índice)
+        self.sprite_indexes = {}
+
+    def clear(self):
+        self.buffer.clear()
+
+    def record(self):
+        """Guarda el estado actual de la partida como el tick más reciente."""
+        self.buffer.push(self.capture())
+
+    def step_back(self):
+        """Vuelve al tick anterior. :return: False si no queda nada que rebobinar."""
+        state = self.buffer.pop()
+        if state is None:
+            return False
+        self.restore(state)
+        return True
+
+    def sprite_tables(self, player):
+        """({id de la superficie: índice}, superficies por índice) de la caché de sprites del jugador."""
+        cached = self.sprite_indexes.get(player.id)
+        if cached is None or cached[0] is not player.sprite_cache:
+            surfaces = list(player.sprite_cache.values())
+            cached = self.sprite_indexes[player.id] = (
+                player.sprite_cache, {id(surface): i for i, surface in enumerate(surfaces)}, surfaces)
+        return cached[1], cached[2]
+
+    def sprite_index(self, player):
+        """Índice de la imagen actual del jugador en su caché de sprites."""
+        return self.sprite_tables(player)[0].get(id(player.image), 0xFF)
+
+    def capture(self):
+        """Empaqueta el estado de la partida. :return: bytes."""
+        game = self.game
+        if game.entity_store is not None:
+            game.entity_store.sync()
+        star = [game.estrella_activa] if game.estrella_activa else []
+        timers = sorted(entry for entry in game.scheduler.queue if not entry[2].cancelled)
+        size = (GAME_STATE.size + RNG_STATE.size + PLAYER_STATE.size * len(game.players) + TIMER_STATE.size * len(timers) +
+                ENTITY_STATE.size * (len(game.poderes_activos) + len(game.monedas_activas) +
+                                     len(game.enemigos_activos) + len(star)))
+        if size > len(self.scratch):
+            self.scratch = bytearray(size * 2)
+        out = self.scratch
+
+        _, words, gauss = game.rng.getstate()
+        flags = sum(1 << i for i, name in enumerate(GAME_FLAGS) if getattr(game, name))
+        GAME_STATE.pack_into(out, 0, game.game_clock.sim_time,
+                             game.level.camera_x if game.level is not None else 0.0,
+                             math.nan if gauss is None else gauss, game.total_goombas_generados,
+                             game.next_serial, flags, len(game.players), len(game.poderes_activos),
+                             len(game.monedas_activas), len(game.enemigos_activos), len(star), len(timers))
+        offset = GAME_STATE.size
+        RNG_STATE.pack_into(out, offset, *words)
+        offset += RNG_STATE.size
+
+        for player in game.players:
+            flags = sum(1 << i for i, name in enumerate(PLAYER_FLAGS) if getattr(player, name))
+            if player.estado == "Muerto":
+                flags |= DEAD_FLAG
+            rect = player.rect
+            PLAYER_STATE.pack_into(out, offset, player.id, player.posicionX, player.posicionY, player.velocidadY,
+                                   flags, SIZES.index(player.tamaño), DIRECTIONS.index(player.direccion),
+                                   player.vidas, player.monedas, player.puntos, player.current_frame_index,
+                                   player.last_frame_update, self.sprite_index(player), *rect, player.suelo_y)
+            offset += PLAYER_STATE.size
+
+        for entity in game.poderes_activos:
+            offset = self.pack_entity(out, offset, KIND_CODES["hongo_" + entity.tipo], entity)
+        for entity in game.monedas_activas:
+            offset = self.pack_entity(out, offset, KIND_CODES["moneda"], entity)
+        for entity in game.enemigos_activos:
+            offset = self.pack_entity(out, offset, KIND_CODES["goomba"], entity)
+        for entity in star:
+            offset = self.pack_entity(out, offset, KIND_CODES["estrella"], entity)
+
+        for due, _, handle in timers:
+            method, player_id = self.timer_callback(handle.callback)
+            TIMER_STATE.pack_into(out, offset, due, math.nan if handle.interval is None else handle.interval,
+                                  method, player_id)
+            offset += TIMER_STATE.size
+        return bytes(out[:offset])
+
+    def pack_entity(self, out, offset, kind, entity):
+        enemy = kind == KIND_CODES["goomba"]
+        ENTITY_STATE.pack_into(out, offset, kind, entity.serial, entity.id, entity.posicionX, entity.posicionY,
+                               entity.velocidadY if enemy else 0.0, entity.velocidad_x if enemy else 0.0,
+                               (entity.grounded | entity.is_jumping << 1) if enemy else 0,
+                               entity.rect.x, entity.rect.y)
+        return offset + ENTITY_STATE.size
+
+    def timer_callback(self, callback):
+        """(método, id del jugador) de un callback programado."""
+        player = None
+        if isinstance(callback, functools.partial):
+            player = callback.args[0]
+            callback = callback.func
+        owner = getattr(callback, "__self__", None)
+        name = getattr(callback, "__name__", None)
+        if owner is not self.game:
+            player = owner
+        if name not in TIMER_CODES or (owner is not self.game and player not in self.game.players):
+            raise ValueError(f"Temporizador que no se puede guardar para rebobinar: {callback!r}")
+        return TIMER_CODES[name], player.id if player is not None else NO_PLAYER
+
+    def restore(self, state):
+        """Deja la partida exactamente como estaba en un estado empaquetado por capture()."""
+        game = self.game
+        (sim_time, camera_x, gauss, total_goombas, next_serial, flags, player_count, hongo_count, moneda_count,
+         goomba_count, star_count, timer_count) = GAME_STATE.unpack_from(state, 0)
+        offset = GAME_STATE.size
+        game.rng.setstate((3, RNG_STATE.unpack_from(state, offset), None if math.isnan(gauss) else gauss))
+        offset += RNG_STATE.size
+        game.game_clock.sim_time = sim_time
+        if game.level is not None:
+            game.level.camera_x = camera_x
+        for i, name in enumerate(GAME_FLAGS):
+            setattr(game, name, bool(flags & 1 << i))
+        game.total_goombas_generados = total_goombas
+
+        # Temporizadores: se vuelven a programar todos al final
+        game.scheduler.clear()
+        game.immunity_timers = {}
+
+        players = {player.id: player for player in game.players}
+        for _ in range(player_count):
+            (player_id, x, y, velocity, flags, size, direction, vidas, monedas, puntos, frame, last_frame,
+             sprite, *rect, floor_y) = PLAYER_STATE.unpack_from(state, offset)
+            offset += PLAYER_STATE.size
+            player = players[player_id]
+            player.posicionX, player.posicionY, player.velocidadY = x, y, velocity
+            for i, name in enumerate(PLAYER_FLAGS):
+                setattr(player, name, bool(flags & 1 << i))
+            player.estado = "Muerto" if flags & DEAD_FLAG else "Vivo"
+            player.tamaño, player.direccion = SIZES[size], DIRECTIONS[direction]
+            player.vidas, player.monedas, player.puntos = vidas, monedas, puntos
+            player.current_frame_index, player.last_frame_update = frame, last_frame
+            player.run_timer = None
+            if sprite != 0xFF:
+                player.image = self.sprite_tables(player)[1][sprite]
+            player.rect.update(rect)
+            player.suelo_y = floor_y
+
+        # Entidades: las actuales vuelven a sus pools y se sacan de nuevo en el mismo orden
+        for kind in ("poderes_activos", "monedas_activas", "enemigos_activos"):
+            for entity in getattr(game, kind):
+                game.despawn(kind, entity)
+            setattr(game, kind, [])
+        if game.estrella_activa:
+            game.release_entity(game.estrella_activa)
+            game.estrella_activa = None
+        for _ in range(hongo_count + moneda_count + goomba_count + star_count):
+            offset = self.unpack_entity(state, offset)
+        game.next_serial = next_serial
+
+        for _ in range(timer_count):
+            due, interval, method, player_id = TIMER_STATE.unpack_from(state, offset)
+            offset += TIMER_STATE.size
+            name = TIMER_METHODS[method]
+            player = players.get(player_id)
+            if name == "advance_run_frame":
+                player.run_timer = game.scheduler.at(due, player.advance_run_frame, interval)
+            elif name == "end_immunity":
+                game.immunity_timers[player.id] = game.scheduler.at(
+                    due, functools.partial(game.end_immunity, player), None if math.isnan(interval) else interval)
+            else:
+                game.scheduler.at(due, getattr(game, name), None if math.isnan(interval) else interval)
+
+        # Lo dibujado antes ya no vale
+        game.previous_positions = {}
+        game.static_frame = None
+        if game.dirty_renderer is not None:
+            game.dirty_renderer.invalidate()
+
+    def unpack_entity(self, state, offset):
+        game = self.game
+        kind, serial, entity_id, x, y, velocity_y, velocity_x, flags, rect_x, rect_y = \
+            ENTITY_STATE.unpack_from(state, offset)
+        name, cls, group = ENTITY_KINDS[kind]
+        if cls is Hongo:
+            entity = game.spawn_entity(cls, entity_id, x, y, tipo=name.split("_")[1], image=game.imgs[name])
+        elif cls is Goomba:
+            entity = game.spawn_entity(cls, entity_id, x, y, velocidad_x=velocity_x)
+            entity.velocidadY = velocity_y
+            entity.grounded = bool(flags & 1)
+            entity.is_jumping = bool(flags & 2)
+        else:
+            entity = game.spawn_entity(cls, entity_id, x, y)
+        entity.serial = serial
+        entity.rect.x, entity.rect.y = rect_x, rect_y
+        if group is None:
+            game.estrella_activa = entity
+        else:
+            game.add_entity(group, entity)
+        return offset + ENTITY_STATE.size
+
+    def stats(self):
+        return self.buffer.stats()
+
+
+def check_recorded_rewind(inputs, seed, rewind_at, rewind_ticks=60):
+    """
+    Graba con replay.py una partida con rebobinado en la que se mantiene Retroceso
+    rewind_ticks ticks a partir del tick rewind_at, y la reproduce.
+    :return: (resultado grabado, resultado reproducido).
+    """
+    import pygame
+    from game import Game
+    from inputs import FrameInput
+    from replay import InputRecorder, game_summary, replay
+
+    game = Game(headless=True, seed=seed, rewind=True)
+    game.recorder = InputRecorder(game.game_clock, rewind=True)
+    back = FrameInput([pygame.K_BACKSPACE])
+    for tick, frame_input in enumerate(inputs):
+        game.step(back if rewind_at <= tick < rewind_at + rewind_ticks else frame_input)
+    handle, path = tempfile.mkstemp(suffix=".rep")
+    os.close(handle)
+    try:
+        game.recorder.save(path, game)
+        replayed, _ = replay(path)
+    finally:
+        os.remove(path)
+    return game_summary(game), game_summary(replayed)
+
+
+def main():
+    import random
+    import pygame
+    from game import Game
+    from inputs import FrameInput
+
+    parser = argparse.ArgumentParser(description="Prueba del rebobinado en una partida sin pantalla")
+    parser.add_argument("--seconds", type=float, default=60, help="Segundos de partida")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de la partida")
+    args = parser.parse_args()
+
+    game = Game(headless=True, seed=args.seed)
+    game.max_total_goombas = 10 ** 9
+    rewind = Rewind(game)
+    rng = random.Random(args.seed)
+    ticks = int(args.seconds * PHYSICS_HZ)
+    inputs = []
+    for tick in range(ticks):
+        events = [(True, pygame.K_SPACE)] if tick == 0 else [(True, pygame.K_r)] if game.game_over else \
+            [(True, pygame.K_UP)] if tick % 45 == 0 else []
+        inputs.append(FrameInput([pygame.K_RIGHT] if rng.random() < 0.5 else [pygame.K_LEFT], events))
+
+    # Partida grabando: el tiempo de cada instantánea y el estado de cada tick, para comparar
+    capture_times, states = [], []
+    for frame_input in inputs:
+        game.step(frame_input)
+        start = time.perf_counter()
+        rewind.record()
+        capture_times.append(time.perf_counter() - start)
+        states.append(rewind.buffer.latest)
+
+    stats = rewind.stats()
+    ordered = sorted(capture_times)
+    print(f"Instantánea: mediana {statistics.median(ordered) * 1e6:.0f} us | "
+          f"p99 {ordered[int(len(ordered) * 0.99)] * 1e6:.0f} us | máximo {ordered[-1] * 1e6:.0f} us")
+    print(f"Memoria: {stats['used'] / 1024:.1f} KiB de {stats['capacity'] / 1024:.0f} KiB para {stats['frames']} ticks "
+          f"({stats['seconds']:.1f} s) | estado {stats['state_bytes']} B | fotograma clave {stats['keyframe_bytes']:.0f} B "
+          f"| diferencia {stats['delta_bytes']:.0f} B | expulsados {stats['evicted']}")
+
+    # Rebobinar hasta el principio del anillo comprobando cada tick
+    steps, start = 0, time.perf_counter()
+    ok = True
+    while rewind.step_back():
+        steps += 1
+        ok = ok and rewind.capture() == states[-1 - steps]
+    elapsed = time.perf_counter() - start
+    print(f"Rebobinados {steps} ticks en {elapsed * 1000:.1f} ms ({elapsed / max(steps, 1) * 1e6:.0f} us por tick) | "
+          f"estados iguales: {ok}")
+
+    # Desde ahí, la misma entrada debe llevar al mismo estado final
+    for frame_input in inputs[len(inputs) - 1 - steps + 1:]:
+        game.step(frame_input)
+    same = rewind.capture() == states[-1]
+    print(f"Repetir la entrada desde el punto rebobinado da el mismo estado final: {same}")
+
+    # Una grabación con Retroceso mantenido debe reproducirse igual (replay.py también rebobina)
+    recorded, replayed = check_recorded_rewind(inputs, args.seed, len(inputs) // 2)
+    replay_ok = recorded == replayed
+    print(f"Grabación rebobinando a mitad de partida: {recorded} | reproducción igual: {replay_ok}")
+    pygame.quit()
+    raise SystemExit(0 if ok and same and replay_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import heapq
+import itertools
+
+
+class TimerHandle:
+    """
+    Evento programado en un Scheduler. cancel() lo anula sin sacarlo del montículo
+    (se descarta cuando llega su turno).
+    """
+    def __init__(self, scheduler, due, callback, interval=None):
+        self.scheduler = scheduler
+        self.due = due
+        self.callback = callback
+        self.interval = interval # Milisegundos entre repeticiones, o None si solo ocurre una vez
+        self.cancelled = False
+
+    @property
+    def active(self):
+        return not self.cancelled
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self.scheduler.discard(self)
+
+
+class Scheduler:
+    """
+    Cola de prioridad de eventos con tiempo, ordenada por el momento en que vencen.
+    En cada frame run_due() solo saca los eventos que ya vencieron, así que el coste por frame
+    depende de cuántos temporizadores se disparan y no de cuántos hay programados.
+    Los eventos que vencen a la vez se disparan en el orden en que se programaron, de modo
+    que con un reloj simulado la partida se repite exactamente.
+    :param clock: GameClock del juego (se usa su now()).
+    """
+    COMPACT_MIN = 64 # Cancelados a partir de los cuales se reconstruye el montículo
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.queue = [] # Montículo de (vence, orden, handle)
+        self.counter = itertools.count()
+        self.cancelled = 0
+        self.fired = 0
+
+    def __len__(self):
+        """Eventos pendientes (sin contar los cancelados)."""
+        return len(self.queue) - self.cancelled
+
+    def at(self, due, callback, interval=None):
+        """Programa callback() para el instante due (en milisegundos del reloj del juego)."""
+        handle = TimerHandle(self, due, callback, interval)
+        heapq.heappush(self.queue, (due, next(self.counter), handle))
+        return handle
+
+    def after(self, delay, callback):
+        """Programa callback() dentro de delay milisegundos."""
+        return self.at(self.clock.now() + delay, callback)
+
+    def every(self, interval, callback):
+        """Programa callback() cada interval milisegundos, empezando dentro de interval."""
+        return self.at(self.clock.now() + interval, callback, interval)
+
+    def discard(self, handle):
+        """Cuenta un evento cancelado y, si hay muchos, los quita del montículo de una vez."""
+        self.cancelled += 1
+        if self.cancelled > self.COMPACT_MIN and self.cancelled * 2 > len(self.queue):
+            self.queue = [entry for entry in self.queue if not entry[2].cancelled]
+            heapq.heapify(self.queue)
+            self.cancelled = 0
+
+    def run_due(self, now=None):
+        """
+        Dispara, en orden, los eventos que vencen hasta now (por defecto, ahora).
+        Un evento puede programar otros; los que venzan ya también se disparan.
+        :return: Número de eventos disparados.
+        """
+        if now is None:
+            now = self.clock.now()
+        queue = self.queue
+        fired = 0
+        while queue and queue[0][0] <= now:
+            _, _, handle = heapq.heappop(queue)
+            if handle.cancelled:
+                self.cancelled -= 1
+                continue
+            if handle.interval is not None:
+                # Los repetidos mantienen su ritmo; si el juego se atrasó, no se disparan en ráfaga
+                handle.due = max(handle.due + handle.interval, now + 1)
+                heapq.heappush(queue, (handle.due, next(self.counter), handle))
+            else:
+                handle.cancelled = True # Ya ocurrió: cancelarlo después no hace nada
+            handle.callback()
+            fired += 1
+        self.fired += fired
+        return fired
+
+    def clear(self):
+        """Anula todos los eventos pendientes."""
+        for _, _, handle in self.queue:
+            handle.cancelled = True
+        self.queue = []
+        self.cancelled = 0
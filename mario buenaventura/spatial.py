@@ -0,0 +1,83 @@
+from constants import SPATIAL_CELL_SIZE
+
+
+class SpatialHash:
+    """
+    Rejilla uniforme para la fase amplia de colisiones.
+    Cada objeto se registra en las celdas que toca su rect y se identifica con un handle
+    entero, de modo que moverlo o quitarlo solo toca sus propias celdas, sin recorrer listas.
+    Las consultas devuelven los objetos en orden de inserción, igual que las listas del juego.
+    """
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}    # (columna, fila) -> {handle: objeto}
+        self.entries = {}  # handle -> (objeto, (x0, y0, x1, y1) celdas ocupadas)
+        self._next_handle = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def _add_to_cells(self, handle, obj, cell_range):
+        x0, y0, x1, y1 = cell_range
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    cell = self.cells[(cx, cy)] = {}
+                cell[handle] = obj
+
+    def _remove_from_cells(self, handle, cell_range):
+        x0, y0, x1, y1 = cell_range
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells[(cx, cy)]
+                del cell[handle]
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def insert(self, obj, rect):
+        """Registra un objeto con su rect y devuelve su handle."""
+        handle = self._next_handle
+        self._next_handle += 1
+        cell_range = self._cell_range(rect)
+        self.entries[handle] = (obj, cell_range)
+        self._add_to_cells(handle, obj, cell_range)
+        return handle
+
+    def update(self, handle, rect):
+        """Actualiza la posición de un objeto. Solo cambia de celdas si su rect cruzó un borde."""
+        # Se llama para cada entidad en cada tick: el cálculo de celdas va en línea
+        obj, old_range = self.entries[handle]
+        size = self.cell_size
+        cell_range = (rect.left // size, rect.top // size,
+                      (rect.right - 1) // size, (rect.bottom - 1) // size)
+        if cell_range != old_range:
+            self._remove_from_cells(handle, old_range)
+            self._add_to_cells(handle, obj, cell_range)
+            self.entries[handle] = (obj, cell_range)
+
+    def remove(self, handle):
+        """Quita un objeto por su handle. No hace nada si ya no estaba."""
+        entry = self.entries.pop(handle, None)
+        if entry is not None:
+            self._remove_from_cells(handle, entry[1])
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+
+    def query(self, rect):
+        """Devuelve los objetos de las celdas que toca rect (candidatos, sin comprobar el choque)."""
+        x0, y0, x1, y1 = self._cell_range(rect)
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        return [found[handle] for handle in sorted(found)]
@@ -0,0 +1,106 @@
+"""
+Arranque rápido: solo los módulos de pygame necesarios, fuentes sin recorrer el sistema
+y un perfilador que mide el tiempo hasta el primer frame por fases.
+"""
+import json
+import os
+import time
+
+import pygame
+from constants import *
+
+FONT_CACHE_PATH = os.path.join("assets", "cache", "fonts.json")
+
+
+def init_subsystems(headless=False):
+    """
+    Inicia solo video y fuentes, en lugar de pygame.init(), que también abre el audio y
+    busca mandos. El mezclador se inicia más tarde, la primera vez que se usa (audio.py).
+    """
+    if headless:
+        # Driver de video ficticio: la pantalla existe solo en memoria
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        # Sin ventana, SIGINT y SIGTERM deben cerrar el proceso como en cualquier script
+        # (SDL los convierte en un evento QUIT que nadie lee, y un Pool no podría terminarlo)
+        os.environ["SDL_NO_SIGNAL_HANDLERS"] = "1"
+    pygame.display.init()
+    pygame.font.init()
+
+
+def find_font(name):
+    """
+    Ruta del archivo de una fuente, sin recorrer las carpetas del sistema en cada arranque.
+    Usa la fuente incluida en assets/fonts si existe; si no, la ruta que se guardó en la
+    caché la última vez, y solo si no hay ninguna de las dos la busca con match_font.
+    Borrar assets/cache obliga a buscarla de nuevo.
+    :return: Ruta del .ttf, o None para usar la fuente por defecto de pygame.
+    """
+    if os.path.exists(FONT_PATH):
+        return FONT_PATH
+
+    try:
+        with open(FONT_CACHE_PATH, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if name in cache and (cache[name] is None or os.path.exists(cache[name])):
+        return cache[name]
+
+    cache[name] = pygame.font.match_font(name) # Recorre las fuentes del sistema (lento)
+    try:
+        os.makedirs(os.path.dirname(FONT_CACHE_PATH), exist_ok=True)
+        temp_path = f"{FONT_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(temp_path, FONT_CACHE_PATH)
+    except OSError:
+        pass # Sin caché: la próxima vez se vuelve a buscar
+    return cache[name]
+
+
+def load_font(size, name=FONT_NAME):
+    """Equivalente a pygame.font.SysFont(name, size), pero con la ruta ya resuelta."""
+    return pygame.font.Font(find_font(name), size)
+
+
+class StartupProfiler:
+    """
+    Mide el arranque por fases hasta el primer frame.
+    Cada mark() cierra una fase con el tiempo transcurrido desde la anterior; report()
+    imprime la tabla y avisa si el total pasa del presupuesto.
+    :param budget_ms: Presupuesto para el tiempo hasta el primer frame.
+    :param start: Instante de inicio (time.perf_counter()); por defecto, ahora.
+    :param verbose: Si es True, report() imprime la tabla de fases; si no, solo el aviso.
+    """
+    def __init__(self, budget_ms=STARTUP_BUDGET_MS, start=None, verbose=False):
+        self.budget_ms = budget_ms
+        self.verbose = verbose
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        self.phases = [] # (nombre, ms)
+        self.reported = False
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, (now - self.last) * 1000))
+        self.last = now
+
+    @property
+    def total_ms(self):
+        return (self.last - self.start) * 1000
+
+    def report(self):
+        """
+        Imprime el tiempo de cada fase (si verbose) y el aviso de presupuesto (siempre que se pase).
+        :return: True si el arranque cupo en el presupuesto.
+        """
+        self.reported = True
+        within_budget = self.total_ms <= self.budget_ms
+        if self.verbose:
+            print("Arranque hasta el primer frame:")
+            for name, ms in self.phases:
+                print(f"  {name:<20} {ms:8.1f} ms")
+            print(f"  {'total':<20} {self.total_ms:8.1f} ms (presupuesto {self.budget_ms:.0f} ms)")
+        if not within_budget:
+            print(f"Advertencia: El arranque tardó {self.total_ms:.0f} ms, más que el presupuesto de {self.budget_ms:.0f} ms.")
+        return within_budget